@@ -25,14 +25,25 @@ FIXES v6.0:
 """
 
 import os
+import json
+import hashlib
 import logging
 import time
 import threading
 import requests
 import pandas as pd
-import yfinance as yf
 from datetime import datetime, date, timedelta
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+from api_utils import (
+    NEWS_CACHE, AI_CACHE, IST, SingleFlight, CircuitBreaker, cached, get_http_session, get_httpx_client,
+    make_groq_client,
+)
+from config import (
+    CACHE_TTL_NEWS, CACHE_TTL_STOCK_NEWS, CACHE_TTL_INSIGHTS, CACHE_TTL_AI_PROMPT, CHAT_HISTORY_MAX_CHARS, AI_MAX_CONCURRENCY, AI_HEDGE_DELAY,
+    TIMEOUT_GEMINI, TIMEOUT_OPENAI, AI_SDK_MAX_RETRIES,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -51,26 +62,8 @@ def ai_available() -> bool:
 _groq_client     = None; _groq_key_used   = ""
 _gemini_model    = None; _gemini_key_used = ""
 _openai_client   = None; _openai_key_used = ""
-
-
-def _make_groq_client(api_key: str):
-    from groq import Groq
-    import functools
-    try:
-        return Groq(api_key=api_key)
-    except TypeError as e:
-        if "proxies" not in str(e):
-            raise
-        import httpx
-        _orig = httpx.Client.__init__
-        @functools.wraps(_orig)
-        def _patched(self, *a, **kw):
-            kw.pop("proxies", None)
-            _orig(self, *a, **kw)
-        httpx.Client.__init__ = _patched
-        client = Groq(api_key=api_key)
-        httpx.Client.__init__ = _orig
-        return client
+# FIX: guards first construction so 20 pool threads on a cold start build one client, not 20
+_CLIENT_LOCK     = threading.Lock()
 
 
 def _get_groq():
@@ -78,9 +71,13 @@ def _get_groq():
     key = _key("GROQ_API_KEY")
     if not key:
         return None
-    if _groq_client is None or key != _groq_key_used:
+    if _groq_client is not None and key == _groq_key_used:
+        return _groq_client
+    with _CLIENT_LOCK:
+        if _groq_client is not None and key == _groq_key_used:
+            return _groq_client
         try:
-            _groq_client   = _make_groq_client(key)
+            _groq_client   = make_groq_client(key)
             _groq_key_used = key
         except Exception as e:
             logger.error(f"GROQ init: {e}")
@@ -93,7 +90,11 @@ def _get_gemini():
     key = _key("GEMINI_API_KEY")
     if not key:
         return None
-    if _gemini_model is None or key != _gemini_key_used:
+    if _gemini_model is not None and key == _gemini_key_used:
+        return _gemini_model
+    with _CLIENT_LOCK:
+        if _gemini_model is not None and key == _gemini_key_used:
+            return _gemini_model
         try:
             import google.generativeai as genai
             genai.configure(api_key=key)
@@ -117,10 +118,15 @@ def _get_openai():
     key = _key("OPENAI_KEY")
     if not key:
         return None
-    if _openai_client is None or key != _openai_key_used:
+    if _openai_client is not None and key == _openai_key_used:
+        return _openai_client
+    with _CLIENT_LOCK:
+        if _openai_client is not None and key == _openai_key_used:
+            return _openai_client
         try:
             from openai import OpenAI
-            _openai_client   = OpenAI(api_key=key)
+            _openai_client   = OpenAI(api_key=key, timeout=TIMEOUT_OPENAI, max_retries=AI_SDK_MAX_RETRIES,
+                                      http_client=get_httpx_client(TIMEOUT_OPENAI))
             _openai_key_used = key
         except Exception as e:
             logger.error(f"OpenAI init: {e}")
@@ -134,7 +140,7 @@ def _call_askfuzz_ai(prompt: str, timeout: int = 8) -> tuple:
     if not api_key:
         return "", ""
     try:
-        resp = requests.post(
+        resp = get_http_session().post(
             "https://api.askfuzz.ai/v1/query",
             json={"question": prompt, "context": "NSE India stock market", "market": "IN"},
             headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
@@ -164,127 +170,296 @@ _GROQ_MODELS = [
 ]
 
 
-def _call_ai(messages: list, max_tokens: int = 500, system: str = "") -> tuple:
+# One breaker per provider: after 3 straight failures the provider is skipped
+# (30s, doubling per further failure) instead of timing out on every request.
+_BREAKERS = {name: CircuitBreaker(name) for name in ("GROQ", "Gemini", "OpenAI")}
+
+
+def _any_provider_ready() -> bool:
+    """True if some configured provider isn't circuit-broken (AskFuzz has no breaker)."""
+    return bool(_key("ASKFUZZ_API_KEY")) or any(
+        _key(env) and _BREAKERS[name].allow()
+        for name, env in (("GROQ", "GROQ_API_KEY"), ("Gemini", "GEMINI_API_KEY"), ("OpenAI", "OPENAI_KEY"))
+    )
+
+
+def _breaker_open(name: str, errors: list) -> bool:
+    br = _BREAKERS[name]
+    if br.allow():
+        return False
+    errors.append(f"{name}: failing repeatedly — skipped for {br.retry_in():.0f}s")
+    return True
+
+
+# Bounds in-flight LLM provider calls across all bot worker threads so a burst
+# of users queues here instead of tripping provider rate limits. Each provider
+# call (including a hedge leg) holds a slot for as long as it actually runs.
+_AI_SEMAPHORE = threading.BoundedSemaphore(AI_MAX_CONCURRENCY)
+
+
+def _leg(fn: Callable, *args) -> Any:
+    """One provider call, holding an _AI_SEMAPHORE slot for its whole duration."""
+    with _AI_SEMAPHORE:
+        return fn(*args)
+
+
+def _release_after(fn: Callable, *args) -> Any:
+    """Like _leg, for a slot the caller already acquired (the hedge leg)."""
+    try:
+        return fn(*args)
+    finally:
+        _AI_SEMAPHORE.release()
+
+
+def _prompt_key(messages: list, max_tokens: int, system: str) -> str:
+    """AI_CACHE key for one exact request — 128-bit blake2b of the full prompt."""
+    raw = json.dumps([system, max_tokens, messages], ensure_ascii=False, default=str)
+    return "prompt:" + hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+
+def _call_ai(messages: list, max_tokens: int = 500, system: str = "",
+             on_chunk: Optional[Callable[[str], None]] = None) -> tuple:
     """
-    Provider chain: GROQ → Gemini → OpenAI → AskFuzz
-    FIX 6.0: temperature=0.1 for strict structured outputs
-    FIX: GROQ now tries 3 models before giving up
-    FIX: Gemini prompt is clean text (not role-labelled string)
+    Run the provider chain with at most AI_MAX_CONCURRENCY provider calls in
+    flight (see _leg). With on_chunk, GROQ streams and on_chunk(text_so_far) is called as tokens
+    arrive (the caller throttles its own UI updates).
+    Answers are cached per exact prompt for CACHE_TTL_AI_PROMPT: the same card
+    data renders the same prompt, so repeat requests skip the LLM round-trip.
+    A cache hit skips on_chunk — the caller's final edit shows the text at once.
     """
-    errors = []
+    key = _prompt_key(messages, max_tokens, system)
+    text = AI_CACHE.get(key)
+    if text:
+        return text, ""
+    text, err = _call_ai_chain(messages, max_tokens=max_tokens, system=system, on_chunk=on_chunk)
+    if text:
+        AI_CACHE.set(key, text, ttl=CACHE_TTL_AI_PROMPT)
+    return text, err
 
-    # ── GROQ ───────────────────────────────────────────────────────────
-    groq_key = _key("GROQ_API_KEY")
-    if not groq_key:
+
+def _try_groq(messages: list, max_tokens: int, system: str, errors: list,
+              on_chunk: Optional[Callable[[str], None]] = None) -> str:
+    """GROQ leg of the chain — tries 3 models; returns text or "" (reasons appended to errors)."""
+    if not _key("GROQ_API_KEY"):
         errors.append("GROQ: GROQ_API_KEY not set (free at console.groq.com)")
-    else:
-        groq = _get_groq()
-        if not groq:
-            errors.append("GROQ: client init failed")
-        else:
-            msgs = ([{"role": "system", "content": system}] if system else []) + messages
-            for model in _GROQ_MODELS:
-                try:
-                    _max_tok = max_tokens if model == "llama-3.3-70b-versatile" else min(max_tokens, 350)
-                    r = groq.chat.completions.create(
-                        model=model, messages=msgs,
-                        max_tokens=_max_tok,
-                        temperature=0.1,
-                    )
-                    text = (r.choices[0].message.content or "").strip()
-                    if text:
-                        logger.info(f"GROQ OK [{model}]")
-                        return text, ""
-                    logger.warning(f"GROQ [{model}]: empty response, trying next model")
-                    errors.append(f"GROQ [{model}]: empty response")
-                    continue
-                except Exception as e:
-                    msg = str(e)
-                    if "429" in msg or "rate" in msg.lower() or "RateLimitError" in msg:
-                        errors.append(f"GROQ [{model}]: rate limited → trying next model/provider")
-                        continue
-                    elif "401" in msg or "invalid_api_key" in msg.lower() or "AuthenticationError" in msg:
-                        errors.append("GROQ: INVALID KEY — regenerate at console.groq.com")
-                        break
-                    elif "503" in msg or "unavailable" in msg.lower():
-                        errors.append(f"GROQ [{model}]: service unavailable → trying next provider")
-                        break
-                    else:
-                        errors.append(f"GROQ [{model}]: {msg[:120]}")
-                        break
-
-    # ── Gemini ──────────────────────────────────────────────────────────
-    gemini_key = _key("GEMINI_API_KEY")
-    if not gemini_key:
+        return ""
+    if _breaker_open("GROQ", errors):
+        return ""
+    groq = _get_groq()
+    if not groq:
+        errors.append("GROQ: client init failed")
+        return ""
+    msgs = ([{"role": "system", "content": system}] if system else []) + messages
+    for model in _GROQ_MODELS:
+        try:
+            _max_tok = max_tokens if model == "llama-3.3-70b-versatile" else min(max_tokens, 350)
+            if on_chunk is None:
+                r = groq.chat.completions.create(
+                    model=model, messages=msgs,
+                    max_tokens=_max_tok,
+                    temperature=0.1,
+                )
+                text = (r.choices[0].message.content or "").strip()
+            else:
+                text = _stream_groq(groq, model, msgs, _max_tok, on_chunk)
+            if text:
+                logger.info(f"GROQ OK [{model}]")
+                _BREAKERS["GROQ"].record_success()
+                return text
+            logger.warning(f"GROQ [{model}]: empty response, trying next model")
+            errors.append(f"GROQ [{model}]: empty response")
+            continue
+        except Exception as e:
+            msg = str(e)
+            if "429" in msg or "rate" in msg.lower() or "RateLimitError" in msg:
+                errors.append(f"GROQ [{model}]: rate limited → trying next model/provider")
+                continue
+            elif "401" in msg or "invalid_api_key" in msg.lower() or "AuthenticationError" in msg:
+                errors.append("GROQ: INVALID KEY — regenerate at console.groq.com")
+                break
+            elif "503" in msg or "unavailable" in msg.lower():
+                errors.append(f"GROQ [{model}]: service unavailable → trying next provider")
+                break
+            else:
+                errors.append(f"GROQ [{model}]: {msg[:120]}")
+                break
+    _BREAKERS["GROQ"].record_failure()
+    return ""
+
+
+def _stream_groq(groq, model: str, msgs: list, max_tokens: int,
+                 on_chunk: Callable[[str], None]) -> str:
+    """Streamed GROQ completion: reports the growing text via on_chunk, returns the full text."""
+    buf = []
+    for chunk in groq.chat.completions.create(
+        model=model, messages=msgs, max_tokens=max_tokens,
+        temperature=0.1, stream=True,
+    ):
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            buf.append(delta)
+            try:
+                on_chunk("".join(buf))
+            except Exception as e:          # a UI hiccup must not kill the completion
+                logger.debug(f"on_chunk: {e}")
+    return "".join(buf).strip()
+
+
+def _try_gemini(messages: list, max_tokens: int, system: str, errors: list) -> str:  # noqa: ARG001
+    """Gemini leg of the chain; returns text or "" (reasons appended to errors)."""
+    if not _key("GEMINI_API_KEY"):
         errors.append("Gemini: GEMINI_API_KEY not set (free at aistudio.google.com)")
-    else:
-        gemini = _get_gemini()
-        if not gemini:
-            errors.append("Gemini: client init failed")
+        return ""
+    if _breaker_open("Gemini", errors):
+        return ""
+    gemini = _get_gemini()
+    if not gemini:
+        errors.append("Gemini: client init failed")
+        return ""
+    try:
+        # FIX: Gemini works better with plain structured text
+        parts = [f"{system}\n\n"] if system else []
+        for m in messages:
+            prefix = "Question" if m.get("role", "user") == "user" else "Previous answer"
+            parts.append(f"{prefix}: {m.get('content', '')}\n\n")
+        parts.append("Answer:")
+        full_prompt = "".join(parts)
+
+        # FIX: no deadline meant a hung Gemini call held the user's handler for
+        # minutes; also cap output tokens like the other providers
+        r    = gemini.generate_content(
+            full_prompt,
+            generation_config={"max_output_tokens": max_tokens, "temperature": 0.1},
+            request_options={"timeout": TIMEOUT_GEMINI},
+        )
+        text = (getattr(r, "text", "") or "").strip()
+        if text:
+            logger.info("Gemini OK")
+            _BREAKERS["Gemini"].record_success()
+            return text
+        errors.append("Gemini: empty response")
+        _BREAKERS["Gemini"].record_failure()
+    except Exception as e:
+        _BREAKERS["Gemini"].record_failure()
+        msg = str(e)
+        if "API_KEY_INVALID" in msg or "401" in msg:
+            errors.append("Gemini: INVALID KEY — check aistudio.google.com")
+        elif "leaked" in msg.lower():
+            errors.append("Gemini: KEY LEAKED — generate new key at aistudio.google.com")
+        elif "429" in msg or "quota" in msg.lower():
+            errors.append("Gemini: quota exceeded — try again later or upgrade plan")
         else:
-            try:
-                # FIX: Gemini works better with plain structured text
-                full_prompt = ""
-                if system:
-                    full_prompt += f"{system}\n\n"
-                for m in messages:
-                    role    = m.get("role", "user")
-                    txt     = m.get("content", "")
-                    prefix  = "Question" if role == "user" else "Previous answer"
-                    full_prompt += f"{prefix}: {txt}\n\n"
-                full_prompt += "Answer:"
-
-                r    = gemini.generate_content(full_prompt)
-                text = (getattr(r, "text", "") or "").strip()
-                if text:
-                    logger.info("Gemini OK")
-                    return text, ""
-                errors.append("Gemini: empty response")
-            except Exception as e:
-                msg = str(e)
-                if "API_KEY_INVALID" in msg or "401" in msg:
-                    errors.append("Gemini: INVALID KEY — check aistudio.google.com")
-                elif "leaked" in msg.lower():
-                    errors.append("Gemini: KEY LEAKED — generate new key at aistudio.google.com")
-                elif "429" in msg or "quota" in msg.lower():
-                    errors.append("Gemini: quota exceeded — try again later or upgrade plan")
-                else:
-                    errors.append(f"Gemini: {msg[:120]}")
-
-    # ── OpenAI ──────────────────────────────────────────────────────────
-    openai_key = _key("OPENAI_KEY")
-    if not openai_key:
+            errors.append(f"Gemini: {msg[:120]}")
+    return ""
+
+
+def _try_openai(messages: list, max_tokens: int, system: str, errors: list) -> str:
+    """OpenAI leg of the chain; returns text or "" (reasons appended to errors)."""
+    if not _key("OPENAI_KEY"):
         errors.append("OpenAI: OPENAI_KEY not set")
-    else:
-        oc = _get_openai()
-        if not oc:
-            errors.append("OpenAI: client init failed")
+        return ""
+    if _breaker_open("OpenAI", errors):
+        return ""
+    oc = _get_openai()
+    if not oc:
+        errors.append("OpenAI: client init failed")
+        return ""
+    try:
+        msgs = ([{"role": "system", "content": system}] if system else []) + messages
+        r    = oc.chat.completions.create(
+            model="gpt-4o-mini", messages=msgs,
+            max_tokens=max_tokens, temperature=0.1,
+        )
+        text = (r.choices[0].message.content or "").strip()
+        if text:
+            logger.info("OpenAI OK")
+            _BREAKERS["OpenAI"].record_success()
+            return text
+        errors.append("OpenAI: empty response")
+        _BREAKERS["OpenAI"].record_failure()
+    except Exception as e:
+        _BREAKERS["OpenAI"].record_failure()
+        msg = str(e)
+        if "401" in msg or "Incorrect API key" in msg:
+            errors.append("OpenAI: INVALID KEY — regenerate at platform.openai.com/api-keys")
+        elif "429" in msg:
+            errors.append("OpenAI: quota exceeded")
         else:
-            try:
-                msgs = ([{"role": "system", "content": system}] if system else []) + messages
-                r    = oc.chat.completions.create(
-                    model="gpt-4o-mini", messages=msgs,
-                    max_tokens=max_tokens, temperature=0.1,
-                )
-                text = (r.choices[0].message.content or "").strip()
+            errors.append(f"OpenAI: {msg[:120]}")
+    return ""
+
+
+# Groq/Gemini hedge: Gemini is only started if Groq hasn't answered within
+# AI_HEDGE_DELAY seconds, and only if an _AI_SEMAPHORE slot is free — so the
+# fast path costs one call, a stalled Groq no longer adds its full timeout to
+# the user's wait, and a saturated bot doesn't double its provider load.
+_HEDGE_POOL = ThreadPoolExecutor(max_workers=2 * AI_MAX_CONCURRENCY, thread_name_prefix="ai-hedge")
+
+
+def _hedged_groq_gemini(messages: list, max_tokens: int, system: str, errors: list) -> str:
+    groq_errs, gem_errs = [], []
+    f_groq = _HEDGE_POOL.submit(_leg, _try_groq, messages, max_tokens, system, groq_errs)
+    done, _ = wait([f_groq], timeout=AI_HEDGE_DELAY)
+    if done or not _AI_SEMAPHORE.acquire(blocking=False):
+        # Groq already failed, or every slot is busy: no hedge — wait for Groq,
+        # then fall back to Gemini in turn
+        text = f_groq.result()
+        errors.extend(groq_errs)
+        return text or _leg(_try_gemini, messages, max_tokens, system, errors)
+    try:
+        f_gem = _HEDGE_POOL.submit(_release_after, _try_gemini, messages, max_tokens, system, gem_errs)
+    except Exception:
+        _AI_SEMAPHORE.release()
+        raise
+    pending = {f_groq, f_gem}
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                text = f.result()
                 if text:
-                    logger.info("OpenAI OK")
-                    return text, ""
-                errors.append("OpenAI: empty response")
-            except Exception as e:
-                msg = str(e)
-                if "401" in msg or "Incorrect API key" in msg:
-                    errors.append("OpenAI: INVALID KEY — regenerate at platform.openai.com/api-keys")
-                elif "429" in msg:
-                    errors.append("OpenAI: quota exceeded")
-                else:
-                    errors.append(f"OpenAI: {msg[:120]}")
+                    if pending:
+                        logger.info("AI hedge: first provider answered, discarding the other")
+                    return text
+        return ""
+    finally:
+        # Stop waiting on the loser; drop it outright if it hasn't started yet
+        for f in pending:
+            f.cancel()
+        # A leg that is still running may yet append — only read finished ones
+        errors.extend(groq_errs if f_groq.done() else ["GROQ: slow — Gemini used"])
+        errors.extend(gem_errs if f_gem.done() else [])
+
+
+def _call_ai_chain(messages: list, max_tokens: int = 500, system: str = "",
+                   on_chunk: Optional[Callable[[str], None]] = None) -> tuple:
+    """
+    Provider chain: GROQ ⇄ Gemini (hedged) → OpenAI → AskFuzz
+    FIX 6.0: temperature=0.1 for strict structured outputs
+    FIX: GROQ now tries 3 models before giving up
+    FIX: Gemini prompt is clean text (not role-labelled string)
+    """
+    errors = []
+
+    # Streaming already shows progress within ~1s, so it runs the plain chain —
+    # a hedge could let a discarded GROQ stream keep editing the user's message.
+    if on_chunk is None and _key("GROQ_API_KEY") and _key("GEMINI_API_KEY"):
+        text = _hedged_groq_gemini(messages, max_tokens, system, errors)
+    else:
+        text = (_leg(_try_groq, messages, max_tokens, system, errors, on_chunk)
+                or _leg(_try_gemini, messages, max_tokens, system, errors))
+    if text:
+        return text, ""
+
+    text = _leg(_try_openai, messages, max_tokens, system, errors)
+    if text:
+        return text, ""
 
     # ── AskFuzz ──────────────────────────────────────────────────────────
     if _key("ASKFUZZ_API_KEY"):
         user_q = next((m.get("content","") for m in reversed(messages) if m.get("role")=="user"), "")
         if user_q:
-            af_text, af_err = _call_askfuzz_ai(user_q)
+            af_text, af_err = _leg(_call_askfuzz_ai, user_q)
             if af_text:
                 return af_text, ""
             if af_err:
@@ -301,12 +476,6 @@ _CTX_LOCK = threading.Lock()
 
 def _fetch_nifty_pe() -> dict:
     """Fetch Nifty PE from NSE → Screener → Yahoo."""
-    _NSE_H = {
-        "User-Agent":      "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/122",
-        "Accept":          "application/json",
-        "Accept-Language": "en-US,en;q=0.9",
-        "Referer":         "https://www.nseindia.com/",
-    }
     def _parse_pe(v):
         try:
             f = float(v)
@@ -314,11 +483,10 @@ def _fetch_nifty_pe() -> dict:
         except Exception: pass
         return None
 
-    # NSE equity-stockIndices
+    # NSE equity-stockIndices — reuse data_engine's warmed, cookie-primed session
     try:
-        s = requests.Session()
-        s.headers.update(_NSE_H)
-        s.get("https://www.nseindia.com/", timeout=5)
+        from data_engine import get_nse_session
+        s = get_nse_session()
         r = s.get("https://www.nseindia.com/api/equity-stockIndices?index=NIFTY%2050", timeout=8)
         if r.ok:
             meta = r.json().get("metadata", {})
@@ -332,7 +500,7 @@ def _fetch_nifty_pe() -> dict:
 
     # Screener fallback
     try:
-        r = requests.get("https://www.screener.in/company/^NSEI/",
+        r = get_http_session().get("https://www.screener.in/company/^NSEI/",
                          headers={"User-Agent": "Mozilla/5.0"}, timeout=8)
         if r.ok:
             import re
@@ -356,7 +524,7 @@ def get_live_market_context(force: bool = False) -> str:
         if not force and _CTX_CACHE["text"] and (time.time() - _CTX_CACHE["ts"]) < _CTX_TTL:
             return _CTX_CACHE["text"]
 
-    from data_engine import _yahoo_v8_hist, get_hist, get_info, calc_rsi, batch_quotes
+    from data_engine import yahoo_v8_hist, get_hist, get_info, calc_rsi, batch_quotes
 
     lines = [f"=== LIVE DATA {datetime.now().strftime('%d-%b-%Y %H:%M IST')} ==="]
 
@@ -364,8 +532,9 @@ def get_live_market_context(force: bool = False) -> str:
 
     def fetch_index(ticker, name):
         try:
-            df = _yahoo_v8_hist(ticker, period="5d")
+            df = yahoo_v8_hist(ticker, period="5d")
             if df is None or len(df) < 2:
+                import yfinance as yf
                 df = yf.Ticker(ticker).history(period="5d")
             if df is not None and len(df) >= 2:
                 ltp  = round(float(df["Close"].iloc[-1]), 2)
@@ -482,7 +651,11 @@ def get_live_market_context(force: bool = False) -> str:
                        else "→ FAIRLY VALUED" if pe_f > 19 else "→ CHEAP")
         except Exception:
             verdict = ""
-        lines.append(f"NIFTY PE: {pe} | PB: {pb} | DivYield: {divy}% [{src}] {verdict}")
+        # Elide missing fields — "PB: N/A | DivYield: N/A%" is pure token waste
+        parts = [f"NIFTY PE: {pe}"]
+        if pb != "N/A":   parts.append(f"PB: {pb}")
+        if divy != "N/A": parts.append(f"DivYield: {divy}%")
+        lines.append(" | ".join(parts) + f" [{src}] {verdict}".rstrip())
 
     if results.get("top8"):
         lines.append("TOP STOCKS: " + "  ".join(results["top8"]))
@@ -508,12 +681,78 @@ def get_live_market_context(force: bool = False) -> str:
 
 
 # ── Stock insights ─────────────────────────────────────────────────────────
+# Built once at import — the hot path only fills in the numbers.
+_INSIGHTS_PROMPT = (
+    "STOCK: {symbol} (NSE India)\n"
+    "PRICE: ₹{ltp:.2f} exactly — USE THIS NUMBER ONLY for all calculations\n"
+    "SIGNAL: RSI={rsi:.1f} ({rsi_zone}) | MACD {direction} | Trend {trend}\n"
+    "{fund_line}"
+    "{atr_line}"
+    "{levels_line}"
+    "\nRespond in EXACTLY this format — no preamble, no extra lines:\n"
+    "📌 {symbol} — [BULLISH/BEARISH/NEUTRAL]\n"
+    "• Strength: [one specific technical reason citing ₹{ltp:.2f} and RSI/MACD numbers above]\n"
+    "• Risk: [one specific risk citing actual price levels]\n"
+    "• Catalyst: [sector/news factor in one line]\n"
+    "• Verdict: [BUY ABOVE ₹X / SELL BELOW ₹X / HOLD] — [one sentence]\n"
+    "• Horizon: [swing 3-5d / positional 2-4w / avoid]"
+)
+_LEVEL_LABELS = (
+    ("pivot", "Pivot"), ("r1", "R1"), ("r2", "R2"), ("s1", "S1"), ("s2", "S2"),
+    ("sma20", "SMA20"), ("sma50", "SMA50"), ("sma200", "SMA200"),
+    ("bb_upper", "BB upper"), ("bb_lower", "BB lower"),
+)
+_INSIGHTS_SYSTEM = (
+    "You are a precise NSE equity analyst. "
+    "Use ONLY the exact ₹ price given — never invent or round prices. "
+    "Cite the actual RSI and MACD values. Take support/resistance and targets "
+    "from the LEVELS given — do not compute your own. No speculation. Exact format only."
+)
+
+
+_INSIGHTS_FLIGHT = SingleFlight()
+
+
 def ai_insights(symbol: str, ltp: float, rsi: float, macd_line: float,
                 trend: str, pe: str, roe: str, atr: float = 0.0,
-                sl: float = 0.0, t1: float = 0.0) -> str:
+                sl: float = 0.0, t1: float = 0.0, levels: Optional[dict] = None) -> str:
+    """
+    Coalesced _ai_insights: requests for the same symbol on the same IST day,
+    with the same trend and LTP to the rupee, share one LLM call (in flight)
+    and its answer (cached CACHE_TTL_INSIGHTS), since the market inputs — and
+    so the answer — are effectively identical.
+    """
+    key   = (f"insights:{symbol.upper()}:{datetime.now(IST).date().isoformat()}:"
+             f"{trend}:{round(float(ltp or 0.0))}")
+    cached = AI_CACHE.get(key)
+    if cached is not None:
+        return cached
+    # Every provider circuit-broken: the call would only queue on the AI
+    # semaphore to collect errors — go straight to the last good answer
+    if ai_available() and not _any_provider_ready():
+        text = "⚠️ AI temporarily unavailable."
+    else:
+        text = _INSIGHTS_FLIGHT.do(key, _ai_insights, symbol, ltp, rsi, macd_line, trend,
+                                   pe, roe, atr, sl, t1, levels)
+    if text and not text.startswith("⚠️"):
+        AI_CACHE.set(key, text, ttl=CACHE_TTL_INSIGHTS)
+        AI_CACHE.set(f"insights:{symbol.upper()}:last", text)
+        return text
+    # Providers down / circuits open — fall back to the last good answer
+    stale = AI_CACHE.get_stale(f"insights:{symbol.upper()}:last")
+    if stale:
+        return f"⚠️ <i>Stale — AI providers unavailable, showing last analysis.</i>\n{stale}"
+    return text
+
+
+def _ai_insights(symbol: str, ltp: float, rsi: float, macd_line: float,
+                 trend: str, pe: str, roe: str, atr: float = 0.0,
+                 sl: float = 0.0, t1: float = 0.0, levels: Optional[dict] = None) -> str:
     """
     6-field structured prompt with explicit ₹ price anchors.
     FIX 6.0: Skip if no fundamentals (prevents AI hallucination)
+    `levels` (technical_indicators.price_levels) injects exact SMA / Bollinger /
+    pivot values so the model quotes them instead of doing arithmetic.
     """
     if not ai_available():
         return "⚠️ No AI key set. Add GROQ_API_KEY in Render env vars (free at console.groq.com)."
@@ -521,10 +760,12 @@ def ai_insights(symbol: str, ltp: float, rsi: float, macd_line: float,
     direction = "BULLISH" if macd_line > 0 else "BEARISH"
     rsi_zone  = ("OVERBOUGHT" if rsi > 70 else "OVERSOLD" if rsi < 30 else "NEUTRAL")
 
-    # Only include fundamentals if real — prevents hallucination
-    fund_line = ""
-    if pe not in ("N/A","None","","0","0.0") and roe not in ("N/A","None","","0","0.0"):
-        fund_line = f"Fundamentals: PE={pe} | ROE={roe}%\n"
+    # Only include fundamentals that are real — prevents hallucination.
+    # Each field is elided on its own so a missing ROE doesn't drop a valid PE.
+    _missing  = ("N/A", "None", "", "0", "0.0")
+    fund_parts = [f"{label}={val}{unit}" for label, val, unit in (("PE", pe, ""), ("ROE", roe, "%"))
+                  if str(val) not in _missing]
+    fund_line = f"Fundamentals: {' | '.join(fund_parts)}\n" if fund_parts else ""
 
     # ATR-based levels
     atr_line = ""
@@ -533,28 +774,20 @@ def ai_insights(symbol: str, ltp: float, rsi: float, macd_line: float,
         _t1  = t1  if t1  > 0 else round(ltp + 2.0*atr, 2)
         atr_line = f"ATR(14)=₹{atr:.2f} | Calculated SL=₹{_sl:.2f} | T1=₹{_t1:.2f}\n"
 
-    prompt = (
-        f"STOCK: {symbol} (NSE India)\n"
-        f"PRICE: ₹{ltp:.2f} exactly — USE THIS NUMBER ONLY for all calculations\n"
-        f"SIGNAL: RSI={rsi:.1f} ({rsi_zone}) | MACD {direction} | Trend {trend}\n"
-        f"{fund_line}"
-        f"{atr_line}"
-        f"\nRespond in EXACTLY this format — no preamble, no extra lines:\n"
-        f"📌 {symbol} — [BULLISH/BEARISH/NEUTRAL]\n"
-        f"• Strength: [one specific technical reason citing ₹{ltp:.2f} and RSI/MACD numbers above]\n"
-        f"• Risk: [one specific risk citing actual price levels]\n"
-        f"• Catalyst: [sector/news factor in one line]\n"
-        f"• Verdict: [BUY ABOVE ₹X / SELL BELOW ₹X / HOLD] — [one sentence]\n"
-        f"• Horizon: [swing 3-5d / positional 2-4w / avoid]"
+    levels_line = ""
+    if levels:
+        parts = [f"{label}=₹{levels[k]:.2f}" for k, label in _LEVEL_LABELS if k in levels]
+        if parts:
+            levels_line = "LEVELS: " + " | ".join(parts) + "\n"
+
+    prompt = _INSIGHTS_PROMPT.format(
+        symbol=symbol, ltp=ltp, rsi=rsi, rsi_zone=rsi_zone, direction=direction,
+        trend=trend, fund_line=fund_line, atr_line=atr_line, levels_line=levels_line,
     )
     text, err = _call_ai(
         [{"role": "user", "content": prompt}],
         max_tokens=180,
-        system=(
-            "You are a precise NSE equity analyst. "
-            "Use ONLY the exact ₹ price given — never invent or round prices. "
-            "Cite the actual RSI and MACD values. No speculation. Exact format only."
-        ),
+        system=_INSIGHTS_SYSTEM,
     )
     if text:
         return text
@@ -571,6 +804,7 @@ def _is_real_headline(title: str) -> bool:
     return not any(j.lower() in title.lower() for j in _NEWS_JUNK)
 
 
+@cached(NEWS_CACHE, key=lambda symbol: f"ai_news:{symbol.upper()}", ttl=CACHE_TTL_STOCK_NEWS)
 def fetch_news(symbol: str) -> str:
     # FIX 6.0: Rolling 30-day window instead of hardcoded date
     from_date = (date.today() - timedelta(days=30)).strftime("%Y-%m-%d")
@@ -579,7 +813,7 @@ def fetch_news(symbol: str) -> str:
     tavily_key = _key("TAVILY_API_KEY")
     if tavily_key:
         try:
-            r = requests.post(
+            r = get_http_session().post(
                 "https://api.tavily.com/search",
                 json={"api_key": tavily_key,
                       "query": f"{symbol} NSE India stock news latest",
@@ -597,7 +831,7 @@ def fetch_news(symbol: str) -> str:
     finnhub_key = _key("FINNHUB_API_KEY")
     if finnhub_key:
         try:
-            r = requests.get("https://finnhub.io/api/v1/company-news",
+            r = get_http_session().get("https://finnhub.io/api/v1/company-news",
                              params={"symbol": f"NSE:{symbol}", "from": from_date,
                                      "to": to_date, "token": finnhub_key}, timeout=6).json()
             if isinstance(r, list):
@@ -607,7 +841,7 @@ def fetch_news(symbol: str) -> str:
 
     try:
         import re
-        rss = requests.get("https://www.moneycontrol.com/rss/buzzingstocks.xml",
+        rss = get_http_session().get("https://www.moneycontrol.com/rss/buzzingstocks.xml",
                            headers={"User-Agent": "Mozilla/5.0"}, timeout=6)
         if rss.ok:
             titles = re.findall(r"<title><![CDATA[(.*?)]]></title>", rss.text)
@@ -619,11 +853,12 @@ def fetch_news(symbol: str) -> str:
     return ""
 
 
+@cached(NEWS_CACHE, key=lambda: "ai_market_news", ttl=CACHE_TTL_NEWS)
 def fetch_market_news() -> str:
     tavily_key = _key("TAVILY_API_KEY")
     if tavily_key:
         try:
-            r = requests.post(
+            r = get_http_session().post(
                 "https://api.tavily.com/search",
                 json={"api_key": tavily_key,
                       "query": "India NSE Nifty stock market news today",
@@ -639,7 +874,7 @@ def fetch_market_news() -> str:
 
     try:
         import re
-        rss = requests.get("https://www.moneycontrol.com/rss/latestnews.xml",
+        rss = get_http_session().get("https://www.moneycontrol.com/rss/latestnews.xml",
                            headers={"User-Agent": "Mozilla/5.0"}, timeout=8)
         if rss.ok:
             titles = re.findall(r"<title><![CDATA[(.*?)]]></title>", rss.text)
@@ -668,6 +903,33 @@ def clear_chat(uid: int):
     _chat_history.pop(uid, None)
 
 
+def _trim_history(history: list, max_chars: int = CHAT_HISTORY_MAX_CHARS) -> list:
+    """
+    Bound the history sent with each chat call: walk newest-first, drop older
+    turns that repeat a newer question (the newer answer supersedes them), and
+    stop once the character budget (~4 chars/token) is spent.
+    """
+    kept, seen, used = [], set(), 0
+    i = len(history) - 1
+    while i >= 0:
+        # History is stored as user→assistant pairs; keep them together
+        if i > 0 and history[i].get("role") == "assistant" and history[i - 1].get("role") == "user":
+            turn, i = history[i - 1:i + 1], i - 2
+        else:
+            turn, i = history[i:i + 1], i - 1
+        question = " ".join(turn[0].get("content", "").lower().split())
+        if turn[0].get("role") == "user":
+            if question in seen:
+                continue
+            seen.add(question)
+        size = sum(len(m.get("content", "")) for m in turn)
+        if used + size > max_chars:
+            break
+        kept[:0] = turn
+        used += size
+    return kept
+
+
 # ── Structured AI topics ───────────────────────────────────────────────────────
 CHAT_SYSTEM = """You are AutoAI Advisory — an expert Indian NSE/BSE stock market AI assistant.
 You have access to LIVE MARKET DATA injected below. Use it to answer accurately.
@@ -713,32 +975,50 @@ AI_CHAT_TOPICS: dict = {
 
 AI_CHAT_TOPIC_KEYS: set = set(AI_CHAT_TOPICS.keys())
 
-
-def ai_chat_respond(uid: int, user_message: str) -> str:
+# Fixed prompt parts for chat/topic calls — built once; per call only the live
+# context is appended.
+_CHAT_SYSTEM_PREFIX = CHAT_SYSTEM + "\n\nLIVE MARKET CONTEXT:\n"
+_TOPIC_SYSTEM = (
+    "You are AutoAI Advisory, an expert Indian NSE equity analyst. "
+    "Use ONLY the data below. Be direct, specific, format exactly as instructed. "
+    "Never invent prices or percentages not in the data provided."
+)
+_TOPIC_DATA_SEP = "\n\nLIVE DATA:\n"
+_CTX_UNAVAILABLE = "Market data temporarily unavailable. Use general NSE knowledge."
+_NO_KEYS_CHAT = (
+    "⚠️ <b>No AI keys configured.</b>\n\n"
+    "Add at least one key in Render → Environment:\n"
+    "• <code>GROQ_API_KEY</code> — free at console.groq.com\n"
+    "• <code>GEMINI_API_KEY</code> — free at aistudio.google.com"
+)
+_NO_KEYS_TOPIC = (
+    "⚠️ <b>No AI keys configured.</b>\n\n"
+    "Add <code>GROQ_API_KEY</code> in Render → Environment (free at console.groq.com)"
+)
+
+
+def ai_chat_respond(uid: int, user_message: str,
+                    on_chunk: Optional[Callable[[str], None]] = None) -> str:
     """
     Handle free-form user chat. Stores turns in history.
     FIX 6.0: Wrap context calls in try/except
+    on_chunk: optional progress callback for streamed replies (see _call_ai).
     """
     if not ai_available():
-        return (
-            "⚠️ <b>No AI keys configured.</b>\n\n"
-            "Add at least one key in Render → Environment:\n"
-            "• <code>GROQ_API_KEY</code> — free at console.groq.com\n"
-            "• <code>GEMINI_API_KEY</code> — free at aistudio.google.com"
-        )
+        return _NO_KEYS_CHAT
 
     # FIX 6.0: PERMANENT — wrap market context call
     try:
         market_ctx = get_live_market_context()
     except Exception as _e:
         logger.warning(f"market context failed in ai_chat_respond: {_e}")
-        market_ctx = "Market data temporarily unavailable. Use general NSE knowledge."
+        market_ctx = _CTX_UNAVAILABLE
 
-    system = CHAT_SYSTEM + f"\n\nLIVE MARKET CONTEXT:\n{market_ctx}"
-    history  = get_chat_history(uid)[-12:]
+    system = _CHAT_SYSTEM_PREFIX + market_ctx
+    history  = _trim_history(get_chat_history(uid)[-12:])
     messages = history + [{"role": "user", "content": user_message}]
 
-    text, err = _call_ai(messages, max_tokens=450, system=system)
+    text, err = _call_ai(messages, max_tokens=450, system=system, on_chunk=on_chunk)
 
     if text:
         add_to_chat(uid, "user",      user_message)
@@ -748,32 +1028,26 @@ def ai_chat_respond(uid: int, user_message: str) -> str:
     return _friendly_ai_error(err)
 
 
-def ai_topic_respond(topic_prompt: str) -> str:
+def ai_topic_respond(topic_prompt: str,
+                     on_chunk: Optional[Callable[[str], None]] = None) -> str:
     """
     Topic button calls — NOT stored in chat history.
     FIX 6.0: Wrap context calls in try/except
+    on_chunk: optional progress callback for streamed replies (see _call_ai).
     """
     if not ai_available():
-        return (
-            "⚠️ <b>No AI keys configured.</b>\n\n"
-            "Add <code>GROQ_API_KEY</code> in Render → Environment (free at console.groq.com)"
-        )
+        return _NO_KEYS_TOPIC
 
     # FIX 6.0: PERMANENT — wrap market context call
     try:
         market_ctx = get_live_market_context()
     except Exception as _e:
         logger.warning(f"market context failed in ai_topic_respond: {_e}")
-        market_ctx = "Market data temporarily unavailable. Use general NSE knowledge."
+        market_ctx = _CTX_UNAVAILABLE
     
-    system     = (
-        "You are AutoAI Advisory, an expert Indian NSE equity analyst. "
-        "Use ONLY the data below. Be direct, specific, format exactly as instructed. "
-        "Never invent prices or percentages not in the data provided."
-    )
-    messages   = [{"role": "user", "content": f"{topic_prompt}\n\nLIVE DATA:\n{market_ctx}"}]
+    messages = [{"role": "user", "content": topic_prompt + _TOPIC_DATA_SEP + market_ctx}]
 
-    text, err = _call_ai(messages, max_tokens=400, system=system)
+    text, err = _call_ai(messages, max_tokens=400, system=_TOPIC_SYSTEM, on_chunk=on_chunk)
     if text:
         return text
     return _friendly_ai_error(err)
@@ -808,7 +1082,8 @@ def test_ai_providers() -> dict:
         ("GROQ",    "GROQ_API_KEY",    lambda: _get_groq().chat.completions.create(
              model="llama-3.1-8b-instant",
              messages=[{"role":"user","content":"Say OK"}], max_tokens=3)),
-        ("Gemini",  "GEMINI_API_KEY",  lambda: _get_gemini().generate_content("Say OK, just those two words.")),
+        ("Gemini",  "GEMINI_API_KEY",  lambda: _get_gemini().generate_content(
+             "Say OK, just those two words.", request_options={"timeout": TIMEOUT_GEMINI})),
         ("OpenAI",  "OPENAI_KEY",      lambda: _get_openai().chat.completions.create(
              model="gpt-4o-mini",
              messages=[{"role":"user","content":"Say OK"}], max_tokens=3)),
@@ -15,14 +15,26 @@ import logging
 import threading
 import functools
 import hashlib
+import pickle
 from typing import Any, Callable, Optional
-from collections import defaultdict, deque
+from collections import defaultdict, deque, OrderedDict
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import Future
 
 from config import (
     RETRY_MAX_ATTEMPTS, RETRY_BASE_DELAY, RETRY_BACKOFF,
     RATE_LIMIT_WINDOW, RATE_LIMIT_MAX_CALLS,
+    REDIS_URL, CACHE_STALE_TTL, CACHE_TTL_ADVISORY, CACHE_TTL_INDICATORS, TTL_CACHE_MAX,
+    NSE_OPEN_HM, NSE_CLOSE_HM,
+    HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, HTTP_KEEPALIVE_EXPIRY,
+    TIMEOUT_GROQ, AI_SDK_MAX_RETRIES,
 )
 
+try:
+    import redis as _redis_lib
+except ImportError:  # optional — caches stay in-process without it
+    _redis_lib = None
+
 logger = logging.getLogger(__name__)
 
 
@@ -114,6 +126,76 @@ def with_retry(
     return decorator
 
 
+_http_session = None
+_http_session_lock = threading.Lock()
+
+
+def get_http_session():
+    """
+    Process-wide requests.Session with a pooled keep-alive adapter, so repeat
+    calls to the same API host skip the TCP + TLS handshake. Idempotent GETs
+    are retried on 502/503/504 with a short backoff. Sessions are safe to share
+    across the bot's worker threads for plain get/post calls.
+    """
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+                adapter = HTTPAdapter(
+                    pool_connections=HTTP_POOL_CONNECTIONS,
+                    pool_maxsize=HTTP_POOL_MAXSIZE,
+                    max_retries=Retry(total=3, backoff_factor=0.3,
+                                      status_forcelist=(502, 503, 504),
+                                      raise_on_status=False),
+                )
+                sess = requests.Session()
+                sess.mount("https://", adapter)
+                sess.mount("http://", adapter)
+                _http_session = sess
+    return _http_session
+
+
+_httpx_client = None
+
+
+def get_httpx_client(timeout: float):
+    """
+    Process-wide httpx.Client for the httpx-based LLM SDKs (Groq, OpenAI), so
+    every SDK client shares one keep-alive pool instead of opening its own.
+    Passing it as http_client also sidesteps the SDK building a client with
+    proxies=. HTTP/2 (one multiplexed connection per host) is used when the
+    optional h2 package is installed.
+    """
+    global _httpx_client
+    if _httpx_client is None:
+        with _http_session_lock:
+            if _httpx_client is None:
+                import httpx
+                import importlib.util
+                _httpx_client = httpx.Client(
+                    timeout=timeout,
+                    http2=importlib.util.find_spec("h2") is not None,
+                    limits=httpx.Limits(max_connections=HTTP_POOL_MAXSIZE,
+                                        max_keepalive_connections=HTTP_POOL_CONNECTIONS,
+                                        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY),
+                )
+    return _httpx_client
+
+
+def make_groq_client(api_key: str):
+    """
+    Groq SDK client with our timeout/retry budget on the shared httpx pool.
+    The SDK default is a 60s timeout × 3 attempts, which held a hung request
+    for minutes before a caller could fall back to another provider.
+    """
+    from groq import Groq
+    return Groq(api_key=api_key, timeout=TIMEOUT_GROQ, max_retries=AI_SDK_MAX_RETRIES,
+                http_client=get_httpx_client(TIMEOUT_GROQ))
+
+
 def raise_if_transient(resp) -> None:
     """
     Call after requests.get/post. Raises TransientError for retriable HTTP codes,
@@ -124,20 +206,100 @@ def raise_if_transient(resp) -> None:
 
 
 # ══════════════════════════════════════════════════════════════════════════════
-# FIX #2 — UNIFIED CACHE (TTL dict, thread-safe)
+# FIX #2 — UNIFIED CACHE (TTL dict + optional Redis, thread-safe)
 # ══════════════════════════════════════════════════════════════════════════════
 
+_redis_client = None
+_redis_checked = False
+_redis_lock = threading.Lock()
+
+
+def _get_redis():
+    """Shared Redis client when REDIS_URL is set and reachable, else None (checked once)."""
+    global _redis_client, _redis_checked
+    if _redis_checked:
+        return _redis_client
+    with _redis_lock:
+        if not _redis_checked:
+            if REDIS_URL and _redis_lib is None:
+                logger.warning("[cache] REDIS_URL set but the redis package is not installed — "
+                               "using in-memory cache only")
+            elif REDIS_URL:
+                try:
+                    client = _redis_lib.Redis.from_url(
+                        REDIS_URL, socket_timeout=1.0, socket_connect_timeout=1.0,
+                    )
+                    client.ping()
+                    _redis_client = client
+                    logger.info("[cache] Redis backend enabled")
+                except Exception as e:
+                    logger.warning(f"[cache] Redis unavailable ({e}) — using in-memory cache only")
+                if _redis_client is not None:
+                    # Evict by access frequency, so hot symbols' entries outlive
+                    # one-off lookups. Managed Redis often blocks CONFIG — set
+                    # maxmemory-policy allkeys-lfu on the server there instead.
+                    try:
+                        _redis_client.config_set("maxmemory-policy", "allkeys-lfu")
+                    except Exception as e:
+                        logger.info(f"[cache] could not set allkeys-lfu ({e}) — set it on the Redis server")
+            _redis_checked = True
+    return _redis_client
+
+
 class TTLCache:
     """
     Thread-safe in-memory TTL cache.
     Optionally flushes expired entries on every N reads (lazy GC).
+    With `maxsize` > 0 it is also an LRU: the least recently used entry is
+    evicted once the store is full, so keys built from user input (symbols,
+    free-text queries) can't grow it without bound.
+
+    With a `namespace` and REDIS_URL configured, entries are also written to a
+    Redis hash {ts, exp, val} so they survive restarts and are shared between
+    workers. Expired entries are kept for `stale_ttl` more seconds so callers
+    can fall back to them via get_stale() when the upstream API is down.
     """
-    def __init__(self, default_ttl: int = 300, gc_interval: int = 100):
-        self._store:   dict  = {}
+    def __init__(self, default_ttl: int = 300, gc_interval: int = 100,
+                 namespace: Optional[str] = None, stale_ttl: int = 0,
+                 maxsize: int = 0):
+        self._store          = OrderedDict()
         self._lock           = threading.Lock()
         self._default_ttl    = default_ttl
         self._gc_interval    = gc_interval
         self._read_count     = 0
+        self._namespace      = namespace
+        self._stale_ttl      = stale_ttl
+        self._maxsize        = maxsize
+        self._flight         = SingleFlight()
+
+    def _put(self, key: str, entry: dict) -> None:
+        """Store entry as most recently used, evicting the LRU tail (caller holds the lock)."""
+        self._store[key] = entry
+        if self._maxsize:
+            self._store.move_to_end(key)
+            while len(self._store) > self._maxsize:
+                self._store.popitem(last=False)
+
+    def _redis_key(self, key: str) -> Optional[str]:
+        if not self._namespace or _get_redis() is None:
+            return None
+        return f"{self._namespace}:{key}"
+
+    def _redis_load(self, key: str) -> Optional[dict]:
+        rkey = self._redis_key(key)
+        if rkey is None:
+            return None
+        try:
+            raw = _get_redis().hgetall(rkey)
+            if not raw:
+                return None
+            entry = {"val": pickle.loads(raw[b"val"]), "exp": float(raw[b"exp"])}
+        except Exception as e:
+            logger.debug(f"[cache] Redis read {rkey}: {e}")
+            return None
+        with self._lock:
+            self._put(key, entry)
+        return entry
 
     def get(self, key: str) -> Optional[Any]:
         with self._lock:
@@ -146,17 +308,69 @@ class TTLCache:
                 self._gc()
             entry = self._store.get(key)
             if entry and time.time() < entry["exp"]:
+                if self._maxsize:
+                    self._store.move_to_end(key)
                 return entry["val"]
-            return None
+        # Local miss/expiry — another worker may have refreshed it in Redis
+        entry = self._redis_load(key)
+        if entry and time.time() < entry["exp"]:
+            return entry["val"]
+        return None
+
+    def get_stale(self, key: str) -> Optional[Any]:
+        """Return the last stored value even if expired (within stale_ttl)."""
+        with self._lock:
+            entry = self._store.get(key)
+        if entry is None:
+            entry = self._redis_load(key)
+        if entry and time.time() < entry["exp"] + self._stale_ttl:
+            return entry["val"]
+        return None
 
     def set(self, key: str, val: Any, ttl: Optional[int] = None) -> None:
         ttl = ttl if ttl is not None else self._default_ttl
+        now = time.time()
         with self._lock:
-            self._store[key] = {"val": val, "exp": time.time() + ttl}
+            self._put(key, {"val": val, "exp": now + ttl})
+        rkey = self._redis_key(key)
+        if rkey is not None:
+            try:
+                pipe = _get_redis().pipeline()
+                pipe.hset(rkey, mapping={"ts": now, "exp": now + ttl, "val": pickle.dumps(val)})
+                pipe.expire(rkey, int(ttl + self._stale_ttl) or 1)
+                pipe.execute()
+            except Exception as e:
+                logger.debug(f"[cache] Redis write {rkey}: {e}")
+
+    def get_or_compute(self, key: str, fn: Callable[[], Any], ttl: Optional[int] = None,
+                       keep: Callable[[Any], bool] = bool) -> Any:
+        """
+        Cached value for key, else fn() — concurrent misses for the same key
+        share one fn() call. The result is stored only if keep(result) is true
+        (default: truthy), so error / empty results are recomputed next time.
+        """
+        val = self.get(key)
+        if val is not None:
+            return val
+        return self._flight.do(key, self._compute, key, fn, ttl, keep)
+
+    def _compute(self, key: str, fn: Callable[[], Any], ttl: Optional[int], keep: Callable[[Any], bool]) -> Any:
+        val = self.get(key)               # filled while we waited to lead the flight
+        if val is None:
+            val = fn()
+            if keep(val):
+                self.set(key, val, ttl)
+        return val
 
     def delete(self, key: str) -> None:
         with self._lock:
             self._store.pop(key, None)
+        rkey = self._redis_key(key)
+        if rkey is not None:
+            try:
+                _get_redis().delete(rkey)
+            except Exception:
+                pass
 
     def clear(self) -> None:
         with self._lock:
@@ -164,7 +378,7 @@ class TTLCache:
 
     def _gc(self) -> None:
         now  = time.time()
-        dead = [k for k, v in self._store.items() if now >= v["exp"]]
+        dead = [k for k, v in self._store.items() if now >= v["exp"] + self._stale_ttl]
         for k in dead:
             del self._store[k]
         if dead:
@@ -178,12 +392,146 @@ class TTLCache:
             return {"total": total, "alive": alive, "expired": total - alive}
 
 
+def cached(cache: "TTLCache", key: Callable[..., str], ttl: Optional[int] = None):
+    """
+    Decorator: serve fn(*args) from `cache`, keyed by key(*args, **kwargs).
+
+    Empty results (None / "" / []) are treated as an upstream failure: they are
+    not cached, and the last good value is served instead if still in the
+    stale window. Exceptions fall back to the stale value the same way.
+
+    Usage:
+        @cached(NEWS_CACHE, key=lambda symbol: f"news:{symbol}", ttl=900)
+        def fetch_news(symbol): ...
+    """
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            k   = key(*args, **kwargs)
+            hit = cache.get(k)
+            if hit is not None:
+                return hit
+            try:
+                val = fn(*args, **kwargs)
+            except Exception as e:
+                stale = cache.get_stale(k)
+                if stale is not None:
+                    logger.warning(f"[cache] {fn.__name__} failed ({e}) — serving stale {k}")
+                    return stale
+                raise
+            if val:
+                cache.set(k, val, ttl)
+                return val
+            stale = cache.get_stale(k)
+            if stale is not None:
+                logger.info(f"[cache] {fn.__name__} returned nothing — serving stale {k}")
+                return stale
+            return val
+        return wrapper
+    return decorator
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls for the same key onto one in-flight execution:
+    the first caller runs fn, everyone arriving meanwhile waits for and shares
+    its result (or exception). Nothing is retained after the call finishes —
+    pair with a TTLCache for reuse across time.
+    """
+    def __init__(self):
+        self._lock     = threading.Lock()
+        self._inflight: dict = {}
+
+    def do(self, key: str, fn: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            fut    = self._inflight.get(key)
+            leader = fut is None
+            if leader:
+                fut = Future()
+                self._inflight[key] = fut
+        if not leader:
+            return fut.result()
+        try:
+            result = fn(*args, **kwargs)
+            fut.set_result(result)
+            return result
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for an upstream provider.
+    After `threshold` failures in a row the circuit opens and allow() returns
+    False for base_cooldown · 2^(failures-threshold) seconds (exponent capped
+    at max_exp); the next success closes it again.
+    """
+    def __init__(self, name: str, threshold: int = 3, base_cooldown: float = 30.0, max_exp: int = 5):
+        self.name           = name
+        self._threshold     = threshold
+        self._base_cooldown = base_cooldown
+        self._max_exp       = max_exp
+        self._failures      = 0
+        self._open_until    = 0.0
+        self._lock          = threading.Lock()
+
+    def allow(self) -> bool:
+        return time.time() >= self._open_until
+
+    def retry_in(self) -> float:
+        return max(0.0, self._open_until - time.time())
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures   = 0
+            self._open_until = 0.0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self._threshold:
+                cooldown = self._base_cooldown * 2 ** min(self._failures - self._threshold, self._max_exp)
+                self._open_until = time.time() + cooldown
+                logger.warning(f"[breaker] {self.name}: {self._failures} consecutive failures — "
+                               f"skipping for {cooldown:.0f}s")
+
+
+# ── NSE session clock ─────────────────────────────────────────────────────────
+IST = timezone(timedelta(hours=5, minutes=30))
+
+
+def nse_closed_session(now: Optional[datetime] = None) -> Optional[str]:
+    """
+    None while the NSE cash session is open (Mon-Fri, NSE_OPEN_HM–NSE_CLOSE_HM IST);
+    otherwise the date of the last completed session, e.g. "2024-05-17". Daily
+    bars can't change until the next open, so results keyed by it stay valid.
+    Exchange holidays are not modelled — they simply behave like open days.
+    """
+    now = (now or datetime.now(IST)).astimezone(IST)
+    hm  = (now.hour, now.minute)
+    if now.weekday() < 5 and NSE_OPEN_HM <= hm < NSE_CLOSE_HM:
+        return None
+    day = now.date()
+    if now.weekday() >= 5 or hm < NSE_OPEN_HM:
+        day -= timedelta(days=1)
+        while day.weekday() >= 5:
+            day -= timedelta(days=1)
+    return day.isoformat()
+
+
 # Shared global cache instances (import these in other modules)
-LIVE_CACHE = TTLCache(default_ttl=300)    # prices
-FUND_CACHE = TTLCache(default_ttl=14400)  # fundamentals
-NEWS_CACHE = TTLCache(default_ttl=1800)   # news
-HIST_CACHE = TTLCache(default_ttl=3600)   # price history
-CTX_CACHE  = TTLCache(default_ttl=300)    # AI market context
+LIVE_CACHE = TTLCache(default_ttl=300, maxsize=TTL_CACHE_MAX)    # prices
+FUND_CACHE = TTLCache(default_ttl=14400, maxsize=TTL_CACHE_MAX)  # fundamentals
+NEWS_CACHE = TTLCache(default_ttl=1800, namespace="news", stale_ttl=CACHE_STALE_TTL, maxsize=TTL_CACHE_MAX)  # news
+HIST_CACHE = TTLCache(default_ttl=3600, maxsize=TTL_CACHE_MAX)   # price history
+CTX_CACHE  = TTLCache(default_ttl=300, maxsize=TTL_CACHE_MAX)    # AI market context
+AI_CACHE   = TTLCache(default_ttl=60, namespace="ai", stale_ttl=3600, maxsize=TTL_CACHE_MAX)  # rendered AI answers
+ADV_CACHE  = TTLCache(default_ttl=CACHE_TTL_ADVISORY, maxsize=TTL_CACHE_MAX)  # rendered advisory cards
+IND_CACHE  = TTLCache(default_ttl=CACHE_TTL_INDICATORS, maxsize=TTL_CACHE_MAX)  # indicator dicts per last bar
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -14,4 +14,10 @@ fi
 python -m pip install --upgrade pip setuptools wheel
 pip install -r requirements.txt
 
+# Compile the numba kernels now so their cache (__pycache__/*.nbi, *.nbc) ships
+# with the build and a cold start loads machine code instead of re-JITting.
+echo "==> Pre-compiling indicator kernels"
+python -c "import sys, indicator_kernels as k; sys.exit(0 if k.wait_until_warm(600) else 1)" \
+  || echo "WARN: kernel pre-compile skipped"
+
 echo "==> Build completed successfully"
@@ -8,14 +8,17 @@ Fixes in this version:
   5. Fallback message sends proper text on failure
 """
 
-import os, sys, subprocess, logging, time
+import os, sys, subprocess, logging
 from typing import Optional, Tuple
 
+from api_utils import TTLCache
+
 logger = logging.getLogger(__name__)
 
 CHART_SCRIPT     = "gen_smart_stock_chart.py"
 CHART_OUTPUT_DIR = "output"
 CHART_CACHE_TTL  = 3600   # 1 hour per symbol
+CHART_CACHE_MAX  = 128    # LRU bound — keys come from user-typed symbols
 
 
 class ChartGenerator:
@@ -23,7 +26,7 @@ class ChartGenerator:
     def __init__(self, script_path=CHART_SCRIPT, output_dir=CHART_OUTPUT_DIR):
         self.script_path = script_path
         self.output_dir  = output_dir
-        self.cache       = {}
+        self.cache       = TTLCache(default_ttl=CHART_CACHE_TTL, maxsize=CHART_CACHE_MAX)
         os.makedirs(output_dir, exist_ok=True)
 
     def generate(
@@ -41,7 +44,8 @@ class ChartGenerator:
         if symbol:
             cache_key = symbol.upper().replace(".NS","") + (period or "")
             cached    = self.cache.get(cache_key)
-            if cached and time.time() - cached["ts"] < CHART_CACHE_TTL:
+            # PNGs are swept from output/ by the chart script — only reuse live files
+            if cached and os.path.exists(cached["path"]):
                 logger.info(f"[Chart] Cache hit: {cache_key}")
                 return True, cached["meta"], cached["path"]
 
@@ -110,11 +114,10 @@ class ChartGenerator:
 
             # ── Cache ─────────────────────────────────────────────────────────
             if cache_key:
-                self.cache[cache_key] = {
+                self.cache.set(cache_key, {
                     "path": png_path,
                     "meta": meta_text,
-                    "ts":   time.time(),
-                }
+                })
 
             logger.info(f"[Chart] OK: {png_path}")
             return True, meta_text, png_path
@@ -19,12 +19,34 @@ CACHE_TTL_CONTEXT   = int(os.getenv("CACHE_TTL_CTX",   "300"))   # 5 min  — AI
 CACHE_TTL_NEWS      = int(os.getenv("CACHE_TTL_NEWS",  "1800"))  # 30 min — news
 CACHE_TTL_HIST      = int(os.getenv("CACHE_TTL_HIST",  "3600"))  # 1 hr   — price history
 CACHE_TTL_NSE_PE    = int(os.getenv("CACHE_TTL_PE",    "3600"))  # 1 hr   — Nifty PE
+CACHE_TTL_STOCK_NEWS= int(os.getenv("CACHE_TTL_SNEWS", "900"))   # 15 min — per-stock news
+CACHE_TTL_ADVISORY  = int(os.getenv("CACHE_TTL_ADV",   "300"))   # 5 min  — rendered advisory card
+CACHE_TTL_ADV_CLOSED= int(os.getenv("CACHE_TTL_ADV_CLOSED", "14400"))  # 4 hr — card while NSE is closed
+CACHE_TTL_BREADTH   = int(os.getenv("CACHE_TTL_BREADTH", "60"))   # 1 min  — market breadth card
+CACHE_TTL_SCAN      = int(os.getenv("CACHE_TTL_SCAN",  "60"))    # 1 min  — screener / swing scan output
+CACHE_TTL_RESOLVE   = int(os.getenv("CACHE_TTL_RESOLVE", "86400")) # 1 day  — query → ticker lookups
+CACHE_TTL_INDICATORS= int(os.getenv("CACHE_TTL_IND",   "3600"))  # 1 hr   — indicators per (symbol, last bar)
+CACHE_TTL_INSIGHTS  = int(os.getenv("CACHE_TTL_INSIGHTS", "1800")) # 30 min — AI insights per (symbol, day, ₹ price)
+CACHE_TTL_AI_PROMPT = int(os.getenv("CACHE_TTL_AI_PROMPT", "3600")) # 1 hr — LLM answer per exact prompt
+CACHE_STALE_TTL     = int(os.getenv("CACHE_STALE_TTL", "86400")) # 24 hr  — serve-stale window on upstream failure
+REDIS_URL           = os.getenv("REDIS_URL", "").strip()         # optional shared cache backend (server: maxmemory-policy allkeys-lfu)
+MEM_CACHE_MAX       = int(os.getenv("MEM_CACHE_MAX",   "512"))   # data_engine in-memory LRU entries
+TTL_CACHE_MAX       = int(os.getenv("TTL_CACHE_MAX",   "1024"))  # api_utils TTLCache entries (LRU beyond this)
+PRICE_FETCH_WORKERS = int(os.getenv("PRICE_FETCH_WORKERS", "8")) # parallel quote lookups (portfolio card)
+QUOTE_FETCH_WORKERS = int(os.getenv("QUOTE_FETCH_WORKERS", "6")) # parallel get_info calls in batch_quotes
+HIST_BATCH_WINDOW_MS= int(os.getenv("HIST_BATCH_WINDOW_MS", "50")) # coalesce concurrent history misses (0 = off)
+HIST_FETCH_TIMEOUT  = int(os.getenv("HIST_FETCH_TIMEOUT", "90"))  # max wait on a batched history miss before serving stale
+SWING_SCAN_WORKERS  = int(os.getenv("SWING_SCAN_WORKERS", "6"))  # parallel candidate fetches in the swing scan
+SWING_PREFETCH_SEC  = int(os.getenv("SWING_PREFETCH_SEC", "600")) # background swing-universe refresh (0 = off)
 
 # ── AI defaults ───────────────────────────────────────────────────────────────
 DEFAULT_MAX_TOKENS      = int(os.getenv("MAX_TOKENS", "500"))
 AI_TEMPERATURE          = float(os.getenv("AI_TEMP",  "0.1"))   # Low = strict format
 AI_CHAT_MAX_TOKENS      = int(os.getenv("CHAT_TOKENS","600"))
 CHAT_HISTORY_MAX_TURNS  = 10     # per user
+AI_MAX_CONCURRENCY      = int(os.getenv("AI_MAX_CONCURRENCY", "8"))  # LLM calls in flight at once
+CHAT_HISTORY_MAX_CHARS  = int(os.getenv("CHAT_HIST_CHARS", "3000"))  # ~750 tokens of history per call
+AI_HEDGE_DELAY          = float(os.getenv("AI_HEDGE_DELAY", "4"))     # start Gemini if GROQ silent this long
 
 # ── HTTP timeouts (seconds) ──────────────────────────────────────────────────
 TIMEOUT_GROQ        = int(os.getenv("TIMEOUT_GROQ",    "15"))
@@ -37,6 +59,12 @@ TIMEOUT_SCREENER    = int(os.getenv("TIMEOUT_SCREENER", "8"))
 TIMEOUT_FINNHUB     = int(os.getenv("TIMEOUT_FINNHUB",  "6"))
 TIMEOUT_TAVILY      = int(os.getenv("TIMEOUT_TAVILY",   "8"))
 TIMEOUT_RSS         = int(os.getenv("TIMEOUT_RSS",       "6"))
+AI_SDK_MAX_RETRIES  = 1         # SDK-level retries per LLM call; the provider chain handles the rest
+
+# ── HTTP connection pool (shared requests.Session) ───────────────────────────
+HTTP_POOL_CONNECTIONS = 16      # distinct hosts kept warm
+HTTP_POOL_MAXSIZE     = 32      # sockets per host (≥ executor workers)
+HTTP_KEEPALIVE_EXPIRY = 60      # seconds an idle LLM-SDK socket stays open
 
 # ── Retry policy ──────────────────────────────────────────────────────────────
 RETRY_MAX_ATTEMPTS  = int(os.getenv("RETRY_MAX",   "3"))
@@ -60,9 +88,18 @@ HIST_PERIOD_ADV     = "1y"      # advisory card history
 HIST_PERIOD_SCAN    = "6mo"     # screener history (was 3mo — too short for RSI)
 HIST_PERIOD_SWING   = "1y"      # swing scan history
 
+# ── NSE session (IST) ─────────────────────────────────────────────────────────
+NSE_OPEN_HM         = (9, 15)
+NSE_CLOSE_HM        = (15, 30)
+
 # ── Telegram ──────────────────────────────────────────────────────────────────
 TG_MAX_MSG_CHARS    = 4000      # Telegram limit is 4096 — leave margin
 TG_CHUNK_SIZE       = 3800      # split messages at this length
+TG_HANDLER_THREADS  = int(os.getenv("TG_HANDLER_THREADS", "8"))  # telebot worker pool for handlers
+TG_STREAM_EDIT_SEC  = 1.0       # min gap between edits of a streamed reply (Telegram edit limits)
+TG_ALLOWED_UPDATES  = ["message"]  # only update types with handlers; Telegram drops the rest server-side
+TG_LONG_POLL_SEC    = int(os.getenv("TG_LONG_POLL_SEC", "50"))  # getUpdates long-poll hold (telebot default 20)
+TG_CHAT_QUEUE_MAX   = int(os.getenv("TG_CHAT_QUEUE_MAX", "4"))  # queued jobs per chat; further taps are dropped
 
 # ── Nifty PE valuation benchmarks ────────────────────────────────────────────
 NIFTY_PE_AVG_10Y    = 21.0      # 10-year historical average
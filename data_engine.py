@@ -5,7 +5,7 @@ Drop-in replacement for all yfinance calls in main.py and swing_trades.py.
 
 STRATEGY (in priority order):
   1. In-memory cache  → instant (TTL: 5 min live prices, 60 min fundamentals)
-  2. Disk cache       → fast, survives restarts (SQLite via shelve)
+  2. Disk cache       → fast, survives restarts (SQLite, WAL, batched writes)
   3. Yahoo Finance v8 chart API (direct HTTP, no yfinance library)
   4. Yahoo Finance v10 quoteSummary (fundamentals)
   5. NSE India API    → official source, never rate-limits retail users
@@ -16,20 +16,34 @@ STRATEGY (in priority order):
 import os
 import time
 import json
-import shelve
+import atexit
+import pickle
 import random
-from api_utils import with_retry, raise_if_transient, TransientError, HIST_CACHE, LIVE_CACHE, FUND_CACHE
-from config import TIMEOUT_YAHOO, TIMEOUT_NSE, CACHE_TTL_LIVE, CACHE_TTL_FUND, CACHE_TTL_HIST
+import signal
+import sqlite3
+from api_utils import (
+    with_retry, raise_if_transient, TransientError, HIST_CACHE, LIVE_CACHE, FUND_CACHE,
+    get_http_session,
+)
+from config import (
+    TIMEOUT_YAHOO, TIMEOUT_NSE, CACHE_TTL_LIVE, CACHE_TTL_FUND, CACHE_TTL_HIST, CACHE_STALE_TTL,
+    MEM_CACHE_MAX, QUOTE_FETCH_WORKERS, HIST_BATCH_WINDOW_MS, HIST_FETCH_TIMEOUT,
+)
+import queue
 import logging
 import threading
-from collections import deque
-from datetime import datetime, date
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from collections import OrderedDict
+from datetime import date
 from typing import Optional, Dict, List
 from io import StringIO
 
 import requests
+import numpy as np
 import pandas as pd
 
+from indicator_kernels import as_f64, rsi_last
+
 logger = logging.getLogger(__name__)
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -37,7 +51,12 @@ logger = logging.getLogger(__name__)
 # ─────────────────────────────────────────────────────────────────────────────
 
 CACHE_DIR       = os.getenv("CACHE_DIR", "/tmp")
-CACHE_FILE      = os.path.join(CACHE_DIR, "stock_cache")   # shelve appends .db/.dir/.bak
+CACHE_FILE      = os.path.join(CACHE_DIR, "stock_cache.sqlite3")
+
+DISK_FLUSH_ROWS = 50       # flush buffered disk-cache writes at this many rows …
+DISK_FLUSH_SEC  = 2.0      # … or after this many seconds, whichever comes first
+DISK_MMAP_BYTES = 256 * 1024 * 1024   # memory-map up to 256 MB of the cache file
+DISK_PAGE_CACHE_KB = 20_000           # ~20 MB SQLite page cache per connection
 
 TTL_PRICE       = 300      # 5 min  — live price / OHLCV
 TTL_HIST        = 600      # 10 min — historical candles
@@ -65,7 +84,10 @@ _HEADERS = {
 # MEMORY CACHE
 # ─────────────────────────────────────────────────────────────────────────────
 
-_mem: Dict[str, dict] = {}
+# FIX: was an unbounded dict — one entry per symbol/period forever, shared by the
+# bot workers and the webhook thread. Now an LRU capped at MEM_CACHE_MAX entries;
+# evicted keys are still on disk and get promoted back on the next read.
+_mem: "OrderedDict[str, dict]" = OrderedDict()
 _mem_lock = threading.Lock()
 
 
@@ -73,6 +95,7 @@ def _mem_get(key: str, ttl: int):
     with _mem_lock:
         entry = _mem.get(key)
         if entry and time.time() - entry["ts"] < ttl:
+            _mem.move_to_end(key)
             return entry["val"]
     return None
 
@@ -80,34 +103,137 @@ def _mem_get(key: str, ttl: int):
 def _mem_set(key: str, val, ttl: int):  # noqa: ARG001
     with _mem_lock:
         _mem[key] = {"val": val, "ts": time.time()}
+        _mem.move_to_end(key)
+        while len(_mem) > MEM_CACHE_MAX:
+            _mem.popitem(last=False)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
-# DISK CACHE  (shelve — survives process restarts)
+# DISK CACHE  (SQLite — survives process restarts)
 # ─────────────────────────────────────────────────────────────────────────────
-
-_disk_lock = threading.Lock()
+# FIX: shelve reopened the file (and fsync'd) on every single get/set. Now each
+# thread keeps one long-lived WAL connection, and writes are buffered and
+# flushed with executemany() in one transaction.
+
+_disk_lock    = threading.Lock()
+_disk_flush_lock = threading.Lock()     # one flush at a time (held across the commit)
+_disk_local   = threading.local()
+_disk_pending: Dict[str, tuple] = {}      # key -> (ts, pickled val), not yet flushed
+_disk_last_flush = time.time()
+
+
+_disk_schema_ready = False
+
+
+def _disk_conn() -> sqlite3.Connection:
+    global _disk_schema_ready
+    conn = getattr(_disk_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(CACHE_FILE, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute(f"PRAGMA mmap_size={DISK_MMAP_BYTES}")     # reads via mmap, no read() syscalls
+        conn.execute(f"PRAGMA cache_size=-{DISK_PAGE_CACHE_KB}")  # negative = KiB
+        if not _disk_schema_ready:
+            # Schema check once per process, not once per thread/connection
+            with _disk_lock:
+                if not _disk_schema_ready:
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS cache ("
+                        "key TEXT PRIMARY KEY, ts REAL NOT NULL, val BLOB NOT NULL)"
+                    )
+                    conn.commit()
+                    _disk_schema_ready = True
+        _disk_local.conn = conn
+    return conn
 
 
 def _disk_get(key: str, ttl: int):
     try:
         with _disk_lock:
-            with shelve.open(CACHE_FILE, flag="r") as db:
-                entry = db.get(key)
-        if entry and time.time() - entry["ts"] < ttl:
-            return entry["val"]
+            row = _disk_pending.get(key)
+        if row is None:
+            row = _disk_conn().execute("SELECT ts, val FROM cache WHERE key = ?", (key,)).fetchone()
+        if row and time.time() - row[0] < ttl:
+            return pickle.loads(row[1])
     except Exception:
         pass
     return None
 
 
+def _disk_flush() -> None:
+    """
+    Write buffered rows in one transaction. Rows leave _disk_pending only after
+    the commit (and only if not overwritten meanwhile), so _disk_get never sees
+    a gap between the buffer and the table. Flushes are serialised so an older
+    snapshot can't commit over a newer one.
+    """
+    global _disk_last_flush
+    with _disk_flush_lock:
+        with _disk_lock:
+            if not _disk_pending:
+                return
+            snap = dict(_disk_pending)
+            _disk_last_flush = time.time()
+        try:
+            conn = _disk_conn()
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO cache (key, ts, val) VALUES (?, ?, ?)",
+                                 [(k, ts, blob) for k, (ts, blob) in snap.items()])
+        except Exception as e:
+            logger.debug(f"[DiskCache] flush of {len(snap)} rows failed: {e}")
+            return
+        with _disk_lock:
+            for k, row in snap.items():
+                if _disk_pending.get(k) is row:
+                    del _disk_pending[k]
+
+
 def _disk_set(key: str, val, ttl: int = 0):  # noqa: ARG001
     try:
-        with _disk_lock:
-            with shelve.open(CACHE_FILE, flag="c") as db:
-                db[key] = {"val": val, "ts": time.time()}
+        blob = pickle.dumps(val, protocol=pickle.HIGHEST_PROTOCOL)
     except Exception:
-        pass
+        return
+    with _disk_lock:
+        first = not _disk_pending
+        _disk_pending[key] = (time.time(), blob)
+        due = (len(_disk_pending) >= DISK_FLUSH_ROWS
+               or time.time() - _disk_last_flush >= DISK_FLUSH_SEC)
+    if due:
+        _disk_flush()
+    elif first:
+        # A lone write must not wait for the next one to be persisted
+        t = threading.Timer(DISK_FLUSH_SEC, _disk_flush)
+        t.daemon = True
+        t.start()
+
+
+def _install_sigterm_flush() -> None:
+    """
+    atexit doesn't run on SIGTERM (Render's normal shutdown) — flush there too,
+    then hand the signal on to whatever handler was installed before.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return
+    prev = signal.getsignal(signal.SIGTERM)
+
+    def _on_sigterm(signum, frame):
+        _disk_flush()
+        if callable(prev):
+            prev(signum, frame)
+        elif prev != signal.SIG_IGN:
+            signal.signal(signum, signal.SIG_DFL)
+            os.kill(os.getpid(), signum)
+
+    try:
+        signal.signal(signal.SIGTERM, _on_sigterm)
+    except (ValueError, OSError) as e:
+        logger.debug(f"[DiskCache] SIGTERM flush not installed: {e}")
+
+
+atexit.register(_disk_flush)
+_install_sigterm_flush()
 
 
 def cached_get(key: str, ttl: int):
@@ -121,6 +247,11 @@ def cached_get(key: str, ttl: int):
     return v
 
 
+def cached_get_stale(key: str):
+    """Last known value regardless of TTL (up to CACHE_STALE_TTL) — used when every source fails."""
+    return cached_get(key, CACHE_STALE_TTL)
+
+
 def cached_set(key: str, val, ttl: int):
     _mem_set(key, val, ttl)
     _disk_set(key, val, ttl)
@@ -130,22 +261,26 @@ def cached_set(key: str, val, ttl: int):
 # RATE LIMITER  (token bucket for Yahoo Finance calls)
 # ─────────────────────────────────────────────────────────────────────────────
 
-_yf_calls: deque = deque()
-_rate_lock = threading.Lock()
+# Token bucket: YF_MAX_PER_WIN tokens of burst, refilled continuously at
+# YF_MAX_PER_WIN / YF_WINDOW_SEC per second — O(1) per call, no timestamp log.
+_YF_RATE     = YF_MAX_PER_WIN / YF_WINDOW_SEC
+_yf_tokens   = float(YF_MAX_PER_WIN)
+_yf_last     = time.monotonic()
+_rate_lock   = threading.Lock()
 
 
-def _wait_for_rate_slot():
-    """Block until there is a free slot in the Yahoo rate-limit window."""
+def wait_for_rate_slot():
+    """Block until the shared Yahoo token bucket has a token, then take it."""
+    global _yf_tokens, _yf_last
     while True:
-        now = time.time()
         with _rate_lock:
-            # Remove calls older than the window
-            while _yf_calls and now - _yf_calls[0] > YF_WINDOW_SEC:
-                _yf_calls.popleft()
-            if len(_yf_calls) < YF_MAX_PER_WIN:
-                _yf_calls.append(now)
+            now = time.monotonic()
+            _yf_tokens = min(float(YF_MAX_PER_WIN), _yf_tokens + (now - _yf_last) * _YF_RATE)
+            _yf_last = now
+            if _yf_tokens >= 1.0:
+                _yf_tokens -= 1.0
                 return
-            wait = YF_WINDOW_SEC - (now - _yf_calls[0]) + 0.1
+            wait = (1.0 - _yf_tokens) / _YF_RATE
         logger.debug(f"[RateLimit] Waiting {wait:.1f}s for Yahoo slot")
         time.sleep(wait)
 
@@ -160,18 +295,18 @@ def _jitter(base: float, factor: float = 0.3) -> float:
 # ─────────────────────────────────────────────────────────────────────────────
 
 @with_retry(max_attempts=2)
-def _yahoo_v8_hist(symbol: str, period: str = "6mo", interval: str = "1d") -> Optional[pd.DataFrame]:
+def yahoo_v8_hist(symbol: str, period: str = "6mo", interval: str = "1d") -> Optional[pd.DataFrame]:
     """
     Fetch OHLCV history from Yahoo Finance v8 chart API directly.
     Uses browser headers so Yahoo doesn't block us.
     """
-    _wait_for_rate_slot()
+    wait_for_rate_slot()
     url = (
         f"https://query2.finance.yahoo.com/v8/finance/chart/{symbol}"
         f"?interval={interval}&range={period}&includePrePost=false"
     )
     try:
-        resp = requests.get(url, headers=_HEADERS, timeout=12)
+        resp = get_http_session().get(url, headers=_HEADERS, timeout=12)
         if resp.status_code == 429:
             logger.warning(f"[Yahoo v8] 429 on {symbol} — backing off 30s")
             time.sleep(_jitter(30))
@@ -191,28 +326,23 @@ def _yahoo_v8_hist(symbol: str, period: str = "6mo", interval: str = "1d") -> Op
         if not timestamps or not q.get("close"):
             return None
 
-        rows = []
-        for i, ts in enumerate(timestamps):
-            o = q.get("open",   [None])[i]
-            h = q.get("high",   [None])[i]
-            l = q.get("low",    [None])[i]
-            c = q.get("close",  [None])[i]
-            v = q.get("volume", [None])[i]
-            if all(x is not None for x in [o, h, l, c, v]):
-                rows.append({
-                    "Date":   datetime.utcfromtimestamp(ts).date(),
-                    "Open":   float(o),
-                    "High":   float(h),
-                    "Low":    float(l),
-                    "Close":  float(c),
-                    "Volume": int(v),
-                })
-
-        if not rows:
+        # Build the frame column-wise from presized arrays (was a per-row dict loop)
+        n = len(timestamps)
+        cols = {
+            name: np.array(q.get(key) or [None] * n, dtype=np.float64)    # None → NaN
+            for name, key in (("Open", "open"), ("High", "high"), ("Low", "low"),
+                              ("Close", "close"), ("Volume", "volume"))
+        }
+        valid = np.ones(n, dtype=bool)
+        for arr in cols.values():
+            valid &= ~np.isnan(arr)
+        if not valid.any():
             return None
 
-        df = pd.DataFrame(rows).set_index("Date")
-        df.index = pd.to_datetime(df.index)
+        index = pd.to_datetime(np.asarray(timestamps, dtype=np.int64)[valid], unit="s").normalize()
+        df = pd.DataFrame({name: arr[valid] for name, arr in cols.items()}, index=index)
+        df["Volume"] = df["Volume"].astype(np.int64)
+        df.index.name = "Date"
         return df
 
     except requests.exceptions.RequestException as e:
@@ -225,13 +355,13 @@ def _yahoo_v8_hist(symbol: str, period: str = "6mo", interval: str = "1d") -> Op
 
 def _yahoo_v8_quote(symbol: str) -> Optional[dict]:
     """Fetch live quote (price, prevClose, 52W H/L, PE, EPS) from Yahoo v8 meta."""
-    _wait_for_rate_slot()
+    wait_for_rate_slot()
     url = (
         f"https://query2.finance.yahoo.com/v8/finance/chart/{symbol}"
         f"?interval=1d&range=2d"
     )
     try:
-        resp = requests.get(url, headers=_HEADERS, timeout=10)
+        resp = get_http_session().get(url, headers=_HEADERS, timeout=10)
         if resp.status_code == 429:
             time.sleep(_jitter(30))
             return None
@@ -269,7 +399,7 @@ def _yahoo_v10_fundamentals(symbol: str) -> Optional[dict]:
     Fetch PE, PB, ROE, EPS, dividend yield from Yahoo quoteSummary.
     Tries both query1 and query2 endpoints — Yahoo periodically blocks one.
     """
-    _wait_for_rate_slot()
+    wait_for_rate_slot()
     modules = "summaryDetail,defaultKeyStatistics,financialData,price"
     for host in ["query2", "query1"]:
         url = (
@@ -277,7 +407,7 @@ def _yahoo_v10_fundamentals(symbol: str) -> Optional[dict]:
             f"?modules={modules}&corsDomain=finance.yahoo.com&formatted=false"
         )
         try:
-            resp = requests.get(url, headers=_HEADERS, timeout=12)
+            resp = get_http_session().get(url, headers=_HEADERS, timeout=12)
             if resp.status_code in (401, 403):
                 logger.debug(f"[Yahoo v10] {host} blocked for {symbol} ({resp.status_code})")
                 continue
@@ -340,7 +470,7 @@ _nse_session_ts: float = 0.0
 _nse_lock = threading.Lock()
 
 
-def _get_nse_session() -> requests.Session:
+def get_nse_session() -> requests.Session:
     """Return a warmed-up NSE session (cookies initialised)."""
     global _nse_session, _nse_session_ts
     with _nse_lock:
@@ -360,7 +490,7 @@ def _get_nse_session() -> requests.Session:
 def _nse_quote(symbol: str) -> Optional[dict]:
     """Fetch live price from NSE India quote API."""
     try:
-        sess = _get_nse_session()
+        sess = get_nse_session()
         url  = f"https://www.nseindia.com/api/quote-equity?symbol={symbol}"
         resp = sess.get(url, timeout=10)
         if not resp.ok:
@@ -387,7 +517,7 @@ def _nse_hist(symbol: str, series: str = "EQ") -> Optional[pd.DataFrame]:
     try:
         end   = date.today()
         start = date(end.year - 1, end.month, end.day)
-        sess  = _get_nse_session()
+        sess  = get_nse_session()
         url   = (
             "https://www.nseindia.com/api/historical/cm/equity"
             f"?symbol={symbol}&series=[%22{series}%22]"
@@ -452,7 +582,7 @@ def _stooq_hist(symbol: str, period_days: int = 365) -> Optional[pd.DataFrame]:
             f"&d2={end_dt.strftime('%Y%m%d')}"
             f"&i=d"
         )
-        resp = requests.get(url, headers={"User-Agent": "Mozilla/5.0"}, timeout=12)
+        resp = get_http_session().get(url, headers={"User-Agent": "Mozilla/5.0"}, timeout=12)
         if not resp.ok or "No data" in resp.text[:50]:
             return None
 
@@ -486,7 +616,7 @@ def _yfinance_hist(symbol: str, period: str = "1y") -> Optional[pd.DataFrame]:
 
     for attempt in range(1, 4):
         try:
-            _wait_for_rate_slot()
+            wait_for_rate_slot()
             tk = yf.Ticker(symbol)
             df = tk.history(period=period, auto_adjust=True, timeout=15)
             if not df.empty:
@@ -524,13 +654,22 @@ def get_hist(symbol: str, period: str = "1y") -> pd.DataFrame:
         logger.debug(f"[Cache HIT] {cache_key}")
         return cached
 
-    df: Optional[pd.DataFrame]
+    if HIST_BATCH_WINDOW_MS > 0:
+        return _hist_batcher.fetch(sym_clean, period)
+    return _fetch_hist(sym_clean, period)
+
+
+# get_hist period → Yahoo range (Yahoo has no 2mo / 2d)
+_YF_PERIOD = {
+    "1y": "1y", "6mo": "6mo", "3mo": "3mo",
+    "2mo": "3mo", "1mo": "1mo", "5d": "5d", "2d": "5d",
+}
 
-    yf_period = {
-        "1y": "1y", "6mo": "6mo", "3mo": "3mo",
-        "2mo": "3mo", "1mo": "1mo", "5d": "5d", "2d": "5d",
-    }.get(period, "1y")
-    df = _yahoo_v8_hist(yahoo_sym, period=yf_period)
+
+def _primary_hist(sym_clean: str, period: str) -> Optional[pd.DataFrame]:
+    """The keyless HTTP sources in get_hist() order: Yahoo v8 → NSE → Stooq."""
+    yahoo_sym = f"{sym_clean}.NS"
+    df: Optional[pd.DataFrame] = yahoo_v8_hist(yahoo_sym, period=_YF_PERIOD.get(period, "1y"))
 
     if df is None or df.empty:
         logger.info(f"[DataEngine] Yahoo v8 failed for {sym_clean} — trying NSE")
@@ -543,21 +682,221 @@ def get_hist(symbol: str, period: str = "1y") -> pd.DataFrame:
             "2mo": 60, "1mo": 30, "5d": 5, "2d": 2,
         }
         df = _stooq_hist(yahoo_sym, period_days=days_map.get(period, 365))
+    return df
 
-    if df is None or df.empty:
-        logger.info(f"[DataEngine] Stooq failed for {sym_clean} — trying yfinance (last resort)")
-        time.sleep(_jitter(3))
-        df = _yfinance_hist(yahoo_sym, period=period)
+
+def _store_hist(sym_clean: str, period: str, df: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """Cache a fetched frame; if every source failed, serve stale history or an empty frame."""
+    ttl = TTL_HIST if period not in ("5d", "2d", "1d") else TTL_PRICE
+    cache_key = f"hist_{sym_clean}.NS_{period}"
 
     if df is not None and not df.empty:
         cached_set(cache_key, df, ttl)
         logger.info(f"[DataEngine] {sym_clean} history: {len(df)} rows fetched")
         return df
 
+    stale = cached_get_stale(cache_key)
+    if stale is not None:
+        logger.warning(f"[DataEngine] ALL sources failed for {sym_clean} — serving stale history")
+        return stale
+
     logger.error(f"[DataEngine] ALL sources failed for {sym_clean}")
     return pd.DataFrame()
 
 
+def _fetch_hist(sym_clean: str, period: str) -> pd.DataFrame:
+    """get_hist() cache miss for one symbol: the source chain, then stale cache."""
+    df = _primary_hist(sym_clean, period)
+    if df is None or df.empty:
+        logger.info(f"[DataEngine] Stooq failed for {sym_clean} — trying yfinance (last resort)")
+        time.sleep(_jitter(3))
+        df = _yfinance_hist(f"{sym_clean}.NS", period=period)
+    return _store_hist(sym_clean, period, df)
+
+
+def _fetch_hist_many(syms: List[str], period: str, max_workers: int = 6) -> Dict[str, pd.DataFrame]:
+    """
+    _fetch_hist() for several symbols with the same source order, so a symbol's
+    prices don't depend on what else was requested alongside it: the keyless
+    chain per symbol in parallel, then ONE multi-ticker yfinance download (same
+    auto_adjust as _yfinance_hist) for whatever is still missing, instead of N
+    last-resort calls. Every symbol gets an entry — empty if nothing worked.
+    """
+    if len(syms) == 1:
+        return {syms[0]: _fetch_hist(syms[0], period)}
+
+    def _one(sym: str) -> Optional[pd.DataFrame]:
+        try:
+            return _primary_hist(sym, period)
+        except Exception as e:              # one bad symbol mustn't fail the batch
+            logger.warning(f"[DataEngine] {sym} history: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(syms))) as pool:
+        frames = dict(zip(syms, pool.map(_one, syms)))
+    missing = [s for s, df in frames.items() if df is None or df.empty]
+    if missing:
+        logger.info(f"[DataEngine] {len(missing)} symbols missed the HTTP sources — yfinance batch")
+        got = yfinance_download_batch([f"{s}.NS" for s in missing], _YF_PERIOD.get(period, "1y"))
+        for s in missing:
+            frames[s] = got.get(f"{s}.NS")
+    return {s: _store_hist(s, period, df) for s, df in frames.items()}
+
+
+def yfinance_download_batch(yahoo_syms: List[str], period: str) -> Dict[str, pd.DataFrame]:
+    """One yf.download() for many tickers — a single rate-limit slot instead of N."""
+    try:
+        import yfinance as yf
+    except ImportError:
+        return {}
+    try:
+        wait_for_rate_slot()
+        raw = yf.download(
+            yahoo_syms, period=period, interval="1d", group_by="ticker",
+            auto_adjust=True, threads=True, progress=False, timeout=20,
+        )
+    except Exception as e:
+        logger.warning(f"[yfinance batch] {len(yahoo_syms)} symbols: {e}")
+        return {}
+    if raw is None or raw.empty:
+        return {}
+
+    out: Dict[str, pd.DataFrame] = {}
+    multi = isinstance(raw.columns, pd.MultiIndex)
+    for ys in yahoo_syms:
+        try:
+            frame = raw[ys] if multi else raw
+            frame = frame[["Open", "High", "Low", "Close", "Volume"]].dropna()
+        except KeyError:
+            continue
+        if not frame.empty:
+            out[ys] = frame
+    return out
+
+
+class _HistBatcher:
+    """
+    Micro-batches get_hist() cache misses. Callers park on a Future; a single
+    dispatcher thread blocks on the queue, then keeps collecting for
+    HIST_BATCH_WINDOW_MS and resolves the batch with _fetch_hist_many — the
+    same source order as a lone miss, but N users opening different cards at
+    once share one yfinance download (one rate-limit slot) if it comes to the
+    last resort. Requests for a (symbol, period) already in flight share its
+    Future. Waiters give up after HIST_FETCH_TIMEOUT and get stale history.
+    """
+
+    def __init__(self, window_ms: int, workers: int = 4):
+        self._window  = window_ms / 1000.0
+        self._q       = queue.Queue()
+        self._pending: Dict[tuple, Future] = {}
+        self._lock    = threading.Lock()
+        self._pool    = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hist-batch")
+        self._thread  = None
+
+    def fetch(self, sym_clean: str, period: str) -> pd.DataFrame:
+        key = (period, sym_clean)
+        with self._lock:
+            fut = self._pending.get(key)
+            if fut is None:
+                fut = self._pending[key] = Future()
+                self._q.put(key)
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="hist-batcher", daemon=True)
+                    self._thread.start()
+        try:
+            return fut.result(timeout=HIST_FETCH_TIMEOUT)
+        except FutureTimeout:
+            # The fetch keeps going and will fill the cache; this caller moves on
+            logger.warning(f"[DataEngine] {sym_clean} history pending >{HIST_FETCH_TIMEOUT}s — serving stale")
+            stale = cached_get_stale(f"hist_{sym_clean}.NS_{period}")
+            return stale if stale is not None else pd.DataFrame()
+
+    def _run(self):
+        while True:
+            batch = [self._q.get()]                    # blocks — no polling while idle
+            try:
+                deadline = time.monotonic() + self._window
+                while True:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        break
+                    try:
+                        batch.append(self._q.get(timeout=left))
+                    except queue.Empty:
+                        break
+                by_period: Dict[str, List[str]] = {}
+                for period, sym in batch:
+                    by_period.setdefault(period, []).append(sym)
+                for period, syms in by_period.items():
+                    self._pool.submit(self._resolve, period, syms)
+            except Exception as e:
+                # Keep the dispatcher alive; fail this batch's waiters (already-
+                # submitted keys resolve normally — _done ignores settled ones)
+                logger.exception("[DataEngine] hist batcher dispatch failed")
+                for key in batch:
+                    self._done(key, error=e)
+
+    def _resolve(self, period: str, syms: List[str]):
+        frames: Dict[str, pd.DataFrame] = {}
+        error: Optional[Exception] = None
+        try:
+            frames = _fetch_hist_many(syms, period)
+        except Exception as e:
+            logger.warning(f"[DataEngine] batched history {period} {syms}: {e}")
+            error = e
+        finally:
+            # Every key gets a result or an exception — no waiter is left parked
+            for sym in syms:
+                df = frames.get(sym)
+                if df is not None:
+                    self._done((period, sym), df)
+                else:
+                    self._done((period, sym), error=error or RuntimeError(f"no history for {sym}"))
+
+    def _done(self, key: tuple, df: Optional[pd.DataFrame] = None, error: Optional[Exception] = None):
+        with self._lock:
+            fut = self._pending.pop(key, None)
+        if fut is None or fut.done():
+            return
+        if error is not None:
+            fut.set_exception(error)
+        else:
+            fut.set_result(df)
+
+
+_hist_batcher = _HistBatcher(HIST_BATCH_WINDOW_MS, workers=8)
+
+
+def get_hist_batch(symbols: List[str], period: str = "1y", max_workers: int = 6) -> Dict[str, pd.DataFrame]:
+    """
+    Multi-symbol get_hist(): cache hits are served directly and misses go
+    through _fetch_hist_many — the same source order as get_hist (Yahoo v8 →
+    NSE → Stooq per symbol, in parallel), with ONE multi-ticker yfinance
+    download as the last resort for whatever is still missing.
+    Returns { symbol (as given): DataFrame } — symbols with no data are omitted.
+    """
+    ttl = TTL_HIST if period not in ("5d", "2d", "1d") else TTL_PRICE
+
+    out: Dict[str, pd.DataFrame] = {}
+    missing: Dict[str, str] = {}          # sym_clean -> caller's symbol
+    for sym in symbols:
+        sym_clean = sym.upper().replace(".NS", "").replace(".NSE", "")
+        cached = cached_get(f"hist_{sym_clean}.NS_{period}", ttl)
+        if cached is not None:
+            out[sym] = cached
+        else:
+            missing[sym_clean] = sym
+
+    if missing:
+        # Straight to the source chain, not get_hist's batcher: these already
+        # missed the cache, and this call is its own batch
+        for sym_clean, df in _fetch_hist_many(list(missing), period, max_workers).items():
+            if df is not None and not df.empty:
+                out[missing[sym_clean]] = df
+        logger.info(f"[DataEngine] batch history: {len(out)}/{len(symbols)} ready, {len(missing)} fetched")
+    return out
+
+
 def get_info(symbol: str) -> dict:
     """
     Fetch live quote + fundamentals for `symbol` (NSE ticker without .NS suffix).
@@ -598,7 +937,7 @@ def get_info(symbol: str) -> dict:
         finnhub_key = os.getenv("FINNHUB_API_KEY", "").strip()
         if finnhub_key:
             try:
-                r = requests.get(
+                r = get_http_session().get(
                     "https://finnhub.io/api/v1/stock/metric",
                     params={
                         "symbol": f"NSE:{sym_clean}",
@@ -627,6 +966,8 @@ def get_info(symbol: str) -> dict:
 
     if info:
         cached_set(cache_key, info, TTL_FUND)
+    else:
+        info = cached_get_stale(cache_key) or {}
 
     return info
 
@@ -658,24 +999,43 @@ def get_live_price(symbol: str) -> Optional[float]:
         except (TypeError, ValueError):
             price = None
 
+    if price is None:
+        price = cached_get_stale(cache_key)
+
     return price
 
 
-def batch_quotes(symbols: List[str]) -> Dict[str, Optional[dict]]:
+def batch_quotes(symbols: List[str], max_workers: int = QUOTE_FETCH_WORKERS) -> Dict[str, Optional[dict]]:
     """
-    Fetch live quotes for multiple symbols with automatic rate-limit spacing.
+    Fetch live quotes for multiple symbols.
+    Cache hits return immediately; misses are fetched in parallel. Pacing comes
+    from the shared Yahoo rate-limit window inside the fetchers, so the old
+    fixed ~1.5s sleep between symbols (paid even on cache hits) is gone.
     Returns { symbol: info_dict_or_None }.
     """
-    results: Dict[str, Optional[dict]] = {}
-    for i, sym in enumerate(symbols):
-        if i > 0:
-            time.sleep(_jitter(1.5))
+    def _one(sym: str) -> Optional[dict]:
         try:
-            results[sym] = get_info(sym)
+            return get_info(sym)
         except Exception as e:
             logger.warning(f"[batch_quotes] {sym}: {e}")
-            results[sym] = None
-    return results
+            return None
+
+    fetched: Dict[str, Optional[dict]] = {}
+    missing = []
+    for sym in symbols:
+        yahoo_sym = f"{sym.upper().replace('.NS', '').replace('.NSE', '')}.NS"
+        hit = cached_get(f"info_{yahoo_sym}", TTL_FUND)
+        if hit is not None:
+            fetched[sym] = hit
+        else:
+            missing.append(sym)
+
+    if len(missing) > 1:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as pool:
+            fetched.update(zip(missing, pool.map(_one, missing)))
+    elif missing:
+        fetched[missing[0]] = _one(missing[0])
+    return {sym: fetched.get(sym) for sym in symbols}
 
 
 def clear_cache(symbol: Optional[str] = None):
@@ -701,24 +1061,15 @@ def clear_cache(symbol: Optional[str] = None):
 # ─────────────────────────────────────────────────────────────────────────────
 
 def calc_rsi(close: pd.Series, period: int = 14) -> float:
-    """RSI(14) — self-contained so callers don't need to import calc functions."""
+    """
+    RSI(14) — self-contained so callers don't need to import calc functions.
+    FIX: was a rolling-SMA of gains/losses (Cutler's RSI), which disagreed with
+    the Wilder RSI shown on advisory cards; now the same compiled Wilder kernel.
+    """
     if len(close) < period + 1:
         return 50.0
-    delta     = close.diff()
-    gain      = delta.clip(lower=0)
-    loss      = -delta.clip(upper=0)
-    avg_gain  = gain.rolling(period).mean()
-    avg_loss  = loss.rolling(period).mean()
-    avg_loss  = avg_loss.replace(0, 1e-10)
-    rsi       = 100 - (100 / (1 + avg_gain / avg_loss))
-    val       = rsi.iloc[-1]
-    return round(float(val), 1) if pd.notna(val) else 50.0
-
-
-def calc_ema(close: pd.Series, span: int) -> float:
-    ema = close.ewm(span=span, adjust=False).mean()
-    val = ema.iloc[-1]
-    return round(float(val), 2) if pd.notna(val) else float(close.iloc[-1])
+    val = rsi_last(as_f64(close), period)
+    return round(float(val), 1) if np.isfinite(val) else 50.0
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -17,10 +17,10 @@ import re
 import time
 import logging
 import random
+import threading
 from typing import Dict, Any, Optional
 
-import requests
-from api_utils import with_retry, raise_if_transient, TransientError, FUND_CACHE
+from api_utils import with_retry, raise_if_transient, TransientError, FUND_CACHE, get_http_session
 from config import (
     TIMEOUT_SCREENER, TIMEOUT_FINNHUB, CACHE_TTL_FUND,
     RETRY_MAX_ATTEMPTS, REVENUE_MAX_MCAP_RATIO,
@@ -115,11 +115,11 @@ def _fetch_screener(sym: str) -> Optional[dict]:
     """
     url = f"https://www.screener.in/company/{sym}/consolidated/"
     try:
-        resp = requests.get(url, headers=_SCREENER_HEADERS, timeout=5)
+        resp = get_http_session().get(url, headers=_SCREENER_HEADERS, timeout=5)
         if resp.status_code == 404:
             # Try standalone (non-consolidated)
             url  = f"https://www.screener.in/company/{sym}/"
-            resp = requests.get(url, headers=_SCREENER_HEADERS, timeout=5)
+            resp = get_http_session().get(url, headers=_SCREENER_HEADERS, timeout=5)
         if not resp.ok:
             logger.debug(f"Screener.in {sym}: HTTP {resp.status_code}")
             return None
@@ -212,7 +212,7 @@ def _fetch_finnhub(sym: str) -> Optional[dict]:
     if not key:
         return None
     try:
-        r = requests.get(
+        r = get_http_session().get(
             "https://finnhub.io/api/v1/stock/metric",
             params={"symbol": f"NSE:{sym}", "metric": "all", "token": key},
             timeout=8,
@@ -238,28 +238,44 @@ def _fetch_finnhub(sym: str) -> Optional[dict]:
 
 # ── Source 3: yfinance (last resort, no custom session) ──────────────────────
 
-_last_yf_call = 0.0
+_next_yf_slot = 0.0
 _YF_DELAY = 3.0
+_yf_slot_lock = threading.Lock()
 
 
 def _rate_limit_yf():
-    global _last_yf_call
-    elapsed = time.time() - _last_yf_call
-    if elapsed < _YF_DELAY:
-        time.sleep(_YF_DELAY - elapsed + random.uniform(0.1, 0.5))
-    _last_yf_call = time.time()
-
-
-def _fetch_yfinance(sym: str) -> dict:
+    """
+    FIX: the old check-then-sleep-then-stamp let two threads read the same
+    _last_yf_call and fire together. The slot is now reserved under a lock
+    (check + advance in one step) and only the sleep happens outside it.
+    The call also takes a slot from data_engine's shared Yahoo window.
+    """
+    global _next_yf_slot
+    with _yf_slot_lock:
+        now   = time.time()
+        start = max(now, _next_yf_slot)
+        _next_yf_slot = start + _YF_DELAY + random.uniform(0.1, 0.5)
+    if start > now:
+        time.sleep(start - now)
+    from data_engine import wait_for_rate_slot
+    wait_for_rate_slot()
+
+
+def _fetch_yfinance(sym: str, full: bool = True) -> dict:
+    """
+    yfinance fundamentals. full=False skips the heavy .info scrape and returns
+    only the fast_info fields (market cap, 52W high/low).
+    """
     try:
         import yfinance as yf
         _rate_limit_yf()
         ticker = yf.Ticker(f"{sym}.NS")
         info   = {}
-        try:
-            info = dict(ticker.info)
-        except Exception as e:
-            logger.debug(f"yfinance .info {sym}: {e}")
+        if full:
+            try:
+                info = dict(ticker.info)
+            except Exception as e:
+                logger.debug(f"yfinance .info {sym}: {e}")
         try:
             fi = ticker.fast_info
             for attr, key in [
@@ -282,6 +298,10 @@ def _fetch_yfinance(sym: str) -> dict:
 # UNIFIED FUNDAMENTALS — data_engine → Screener.in → Finnhub → yfinance
 # ══════════════════════════════════════════════════════════════════════════════
 
+# get_fundamentals fields that only yfinance's .info (not fast_info) provides
+_YF_INFO_ONLY_FIELDS = ("pe", "fwd_pe", "pb", "roe", "eps", "rev", "de", "beta", "div_y")
+
+
 def get_fundamentals(sym: str) -> dict:
     sym       = sym.upper().replace(".NS", "")
     cache_key = f"fund_{sym}"
@@ -366,7 +386,11 @@ def get_fundamentals(sym: str) -> dict:
     # ── Source 4: yfinance (last resort) ──────────────────────────────────────
     still_missing2 = [k for k in ["pe", "roe", "mcap"] if result[k] is None]
     if still_missing2:
-        yf_info = _fetch_yfinance(sym)
+        # fast_info covers mcap / 52W; the full .info scrape is only worth it
+        # if a field that just .info fills below is still empty
+        needs_info = (result["name"] == sym
+                      or any(result[k] is None for k in _YF_INFO_ONLY_FIELDS))
+        yf_info = _fetch_yfinance(sym, full=needs_info)
         if yf_info:
             if result["name"] == sym:
                 result["name"] = yf_info.get("longName") or yf_info.get("shortName") or sym
@@ -5,8 +5,13 @@
 import sys, os, warnings
 import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from typing import Optional
+try:
+    import bottleneck as bn   # C moving-window kernels (requirements.txt); NumPy fallback below
+except ImportError:
+    bn = None
 import matplotlib
 matplotlib.use("Agg")
 import matplotlib.pyplot as plt
@@ -180,15 +185,94 @@ def detect_patterns(data, pivots, lookback=60):
     return sorted(seen.values(), key=lambda x: -x.confidence)
 
 # ── INDICATORS ────────────────────────────────────────────────────────────────
+def rolling_sum(a, window):
+    """
+    Trailing `window`-sum per bar from ONE prefix sum (O(N) for any window):
+    NaN until the window is full, and NaN where the window holds a NaN — the
+    same cells pandas rolling(window) leaves NaN.
+    """
+    a   = np.asarray(a, dtype=np.float64)
+    out = np.full(len(a), np.nan)
+    if len(a) >= window:
+        nan = np.isnan(a)
+        c = np.zeros(len(a) + 1); np.cumsum(np.where(nan, 0.0, a), out=c[1:])
+        k = np.zeros(len(a) + 1); np.cumsum(nan, out=k[1:])
+        s = c[window:] - c[:-window]
+        s[k[window:] - k[:-window] > 0] = np.nan
+        out[window-1:] = s
+    return out
+
+def move_mean(a, window):
+    """Trailing mean like pandas rolling(window).mean(): NaN until full, NaN-window → NaN."""
+    a = np.asarray(a, dtype=np.float64)
+    if bn is not None:
+        return bn.move_mean(a, window)
+    return rolling_sum(a, window) / window
+
+def move_std(a, window):
+    """Trailing sample σ (ddof=1) like pandas rolling(window).std()."""
+    a = np.asarray(a, dtype=np.float64)
+    if bn is not None:
+        return bn.move_std(a, window, ddof=1)
+    # Var = (Σd² − (Σd)²/w)/(w−1) from two prefix sums; d is de-meaned first so
+    # the subtraction doesn't cancel away precision at ₹-thousands price levels
+    finite = a[~np.isnan(a)]
+    d  = a - (finite.mean() if finite.size else 0.0)
+    s1 = rolling_sum(d, window)
+    s2 = rolling_sum(d * d, window)
+    return np.sqrt(np.maximum((s2 - s1 * s1 / window) / (window - 1), 0.0))
+
 def calc_rsi(prices, period=14):
+    """
+    Wilder RSI per bar (NaN for the first `period` bars): seeded with the mean
+    gain/loss of the first `period` moves, then avg = (avg*(period-1) + x)/period.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    rsi = np.full(len(prices), np.nan)
+    if len(prices) <= period:
+        return rsi
     d  = np.diff(prices)
     g  = np.where(d > 0, d, 0.0)
     l  = np.where(d < 0, -d, 0.0)
-    ag = np.convolve(g, np.ones(period)/period, "full")[:len(g)]
-    al = np.convolve(l, np.ones(period)/period, "full")[:len(l)]
-    rs = np.where(al != 0, ag/al, 100.0)
-    rsi= np.concatenate([[np.nan]*period, (100 - 100/(1+rs))[period-1:]])
-    return rsi[:len(prices)]
+    ag = float(g[:period].mean())
+    al = float(l[:period].mean())
+    k  = period - 1
+    for i in range(period, len(d) + 1):
+        if i > period:
+            ag = (ag * k + g[i - 1]) / period
+            al = (al * k + l[i - 1]) / period
+        rsi[i] = 100.0 - 100.0 / (1.0 + ag / al) if al != 0 else 100.0
+    return rsi
+
+def calc_adx(high, low, close, period=14):
+    """
+    Wilder ADX (last value): TR and ±DM from aligned bar/previous-bar slices
+    (np.maximum.reduce — no per-column temporaries), smoothed with Wilder's
+    avg = (avg*(period-1) + x)/period seeded by the first `period` means, and
+    DX smoothed the same way. Needs 2·period bars; raises otherwise.
+    """
+    h, l, c = (np.asarray(a, dtype=np.float64) for a in (high, low, close))
+    if len(c) < 2 * period + 1:
+        raise ValueError("ADX needs 2·period bars")
+    up, down = h[1:] - h[:-1], l[:-1] - l[1:]
+    tr  = np.maximum.reduce([h[1:] - l[1:], np.abs(h[1:] - c[:-1]), np.abs(l[1:] - c[:-1])])
+    dmp = np.where((up > down) & (up > 0), up, 0.0)
+    dmn = np.where((down > up) & (down > 0), down, 0.0)
+    k   = period - 1
+    atr, pdm, ndm = float(tr[:period].mean()), float(dmp[:period].mean()), float(dmn[:period].mean())
+    dx  = []
+    for i in range(period, len(tr) + 1):
+        if i > period:
+            atr = (atr * k + tr[i - 1]) / period
+            pdm = (pdm * k + dmp[i - 1]) / period
+            ndm = (ndm * k + dmn[i - 1]) / period
+        dip = 100 * pdm / atr if atr > 0 else 0.0
+        din = 100 * ndm / atr if atr > 0 else 0.0
+        dx.append(100 * abs(dip - din) / (dip + din) if dip + din > 0 else 0.0)
+    adx = float(np.mean(dx[:period]))
+    for v in dx[period:]:
+        adx = (adx * k + v) / period
+    return adx
 
 def build_cross_signals(fast, slow, data):
     diff = fast.values - slow.values
@@ -240,13 +324,44 @@ def detect_candle_pattern(data):
     return "", ""
 
 # ── NEW: WEIGHTED 11-CHECK SCORING ENGINE ────────────────────────────────────
-def score_symbol_weighted(sym, name):
+def download_batch(syms, period="6mo"):
+    """
+    One multi-ticker yf.download for a scan batch. Returns {sym: OHLCV frame};
+    tickers that failed are simply absent so the caller can fetch them alone.
+    """
+    from data_engine import wait_for_rate_slot
+    try:
+        wait_for_rate_slot()   # one slot of the bot's Yahoo token bucket per batch
+        raw = yf.download(syms, period=period, interval="1d", group_by="ticker",
+                          auto_adjust=True, threads=True, progress=False)
+    except Exception:
+        return {}
+    if raw is None or raw.empty:
+        return {}
+    out = {}
+    for sym in syms:
+        try:
+            frame = raw[sym] if isinstance(raw.columns, pd.MultiIndex) else raw
+            frame = frame.dropna(subset=["Open","High","Low","Close","Volume"])
+        except KeyError:
+            continue
+        if not frame.empty:
+            out[sym] = frame
+    return out
+
+def score_symbol_weighted(sym, name, df=None):
     """
     Lightweight scorer for auto-scan. Uses weighted EMA freshness.
+    `df` is the symbol's 6mo daily frame from download_batch; fetched here if None.
     Returns candidate dict or None.
     """
     try:
-        df = yf.download(sym, period="6mo", interval="1d", progress=False, auto_adjust=True)
+        if df is None:
+            # Ticker.history, not yf.download: download() keeps per-call results in
+            # module-level state, so concurrent scan workers would clobber each other
+            from data_engine import wait_for_rate_slot
+            wait_for_rate_slot()
+            df = yf.Ticker(sym).history(period="6mo", interval="1d", auto_adjust=True)
         if df.empty or len(df) < 55: return None
         if isinstance(df.columns, pd.MultiIndex): df.columns = df.columns.get_level_values(0)
         df = df.dropna(subset=["Open","High","Low","Close","Volume"])
@@ -254,10 +369,9 @@ def score_symbol_weighted(sym, name):
         c   = df["Close"]
         e9  = c.ewm(span=9,  adjust=False).mean()
         e21 = c.ewm(span=21, adjust=False).mean()
-        s20 = c.rolling(20).mean()
-        s50 = c.rolling(50).mean()
+        cv  = c.to_numpy(dtype=np.float64)
         ed_diff = (e9 - e21).values
-        dd_diff = (s20 - s50).values
+        dd_diff = move_mean(cv, 20) - move_mean(cv, 50)
 
         # EMA freshness weighted
         score = 0
@@ -382,10 +496,9 @@ def compute_full_score(data, weekly_data, pivots, rsi_last, hist, macd,
     if weekly_data is not None and len(weekly_data) >= 10:
         wc    = weekly_data["Close"]
         we21  = wc.ewm(span=21, adjust=False).mean()
-        ws50  = wc.rolling(10).mean()
         wltp  = float(wc.iloc[-1])
         we21l = float(we21.iloc[-1])
-        ws50l = float(ws50.iloc[-1])
+        ws50l = float(move_mean(wc.values, 10)[-1])
         w_bull = wltp > we21l and we21l > ws50l
         w_bear = wltp < we21l and we21l < ws50l
         e9l   = float(ema9.iloc[-1]); e21l = float(ema21.iloc[-1])
@@ -425,21 +538,7 @@ def compute_full_score(data, weekly_data, pivots, rsi_last, hist, macd,
 
     # ── CHECK 8: ADX strength ≥ 28 (+1) ──────────────────────────────────────
     try:
-        high_v = data["High"].values; low_v = data["Low"].values; close_v = data["Close"].values
-        tr = np.maximum(high_v[1:]-low_v[1:], np.maximum(np.abs(high_v[1:]-close_v[:-1]),
-                                                           np.abs(low_v[1:]-close_v[:-1])))
-        dm_p = np.where((high_v[1:]-high_v[:-1]) > (low_v[:-1]-low_v[1:]),
-                        np.maximum(high_v[1:]-high_v[:-1], 0.0), 0.0)
-        dm_n = np.where((low_v[:-1]-low_v[1:]) > (high_v[1:]-high_v[:-1]),
-                        np.maximum(low_v[:-1]-low_v[1:], 0.0), 0.0)
-        p=14
-        tr14 = pd.Series(tr).rolling(p).mean().values
-        dp14 = pd.Series(dm_p).rolling(p).mean().values
-        dn14 = pd.Series(dm_n).rolling(p).mean().values
-        dip  = np.where(tr14>0, 100*dp14/tr14, 0.0)
-        din  = np.where(tr14>0, 100*dn14/tr14, 0.0)
-        dx   = np.where((dip+din)>0, 100*np.abs(dip-din)/(dip+din), 0.0)
-        adx_val = float(pd.Series(dx).rolling(p).mean().iloc[-1])
+        adx_val = calc_adx(data["High"].values, data["Low"].values, data["Close"].values)
     except Exception:
         adx_val = 20.0
     adx_pts = +1 if adx_val >= 28 else -1
@@ -458,7 +557,7 @@ def compute_full_score(data, weekly_data, pivots, rsi_last, hist, macd,
 
     # ── CHECK 10: BB squeeze breakout (+1) ───────────────────────────────────
     bw     = (bb_upper - bb_lower) / bb_lower.replace(0, 1)       # bandwidth
-    bw_avg = bw.rolling(20).mean()
+    bw_avg = pd.Series(move_mean(bw.values, 20), index=bw.index)
     bw_now = float(bw.dropna().iloc[-1])   if bw.dropna().shape[0]   > 0 else 0.1
     bw_mean= float(bw_avg.dropna().iloc[-1]) if bw_avg.dropna().shape[0] > 0 else 0.1
     in_squeeze   = bw_now < 0.75 * bw_mean
@@ -619,6 +718,12 @@ except Exception:
         ("NTPC.NS","NTPC"),("TATAMOTORS.NS","Tata Motors"),
     ]
 
+# Each scan batch is one multi-ticker download; symbols it misses are
+# fetched one by one, concurrently
+SCAN_WORKERS = int(os.getenv("CHART_SCAN_WORKERS", "10"))
+_SCAN_FRAMES = {}   # sym -> 6mo daily frame from the scan, reused for the winner's chart
+MIN_CHART_BARS = 20 # BB(20) / RSI(14) need this many daily bars
+
 # ── ARGUMENT PARSING ─────────────────────────────────────────────────────────
 VALID_PERIODS = {"1mo","3mo","6mo","1y","2y"}
 CHART_PERIOD  = "6mo"
@@ -632,19 +737,25 @@ if len(sys.argv) >= 3:
     winner = {"sym": forced_sym, "name": forced_name, "score": 0, "reason": "Manual pick"}
     print(f"SCAN: skipped (manual) period={CHART_PERIOD}")
 else:
-    import time
     candidates = []; checked = 0
-    for i in range(0, len(UNIVERSE), 10):
-        batch = UNIVERSE[i:i+10]
-        for sym, name in batch:
-            r = score_symbol_weighted(sym, name); checked += 1
-            if r and r.get("cross_dir") != 0: candidates.append(r)
-        time.sleep(0.4)
-        if len(candidates) >= 12: break
-    if not candidates:
-        for sym, name in UNIVERSE:
-            r = score_symbol_weighted(sym, name); checked += 1
-            if r: candidates.append(r)
+    with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as _ex:
+        def _score_batch(batch):
+            missing = [sym for sym, _ in batch if sym not in _SCAN_FRAMES]
+            if missing:
+                _SCAN_FRAMES.update(download_batch(missing))
+            # map() keeps UNIVERSE order, so the candidate list matches a serial scan
+            return list(_ex.map(lambda sn: score_symbol_weighted(*sn, _SCAN_FRAMES.get(sn[0])), batch))
+        for i in range(0, len(UNIVERSE), 10):
+            batch = UNIVERSE[i:i+10]
+            for r in _score_batch(batch):
+                checked += 1
+                if r and r.get("cross_dir") != 0: candidates.append(r)
+            if len(candidates) >= 12: break
+        if not candidates:
+            for i in range(0, len(UNIVERSE), 10):
+                for r in _score_batch(UNIVERSE[i:i+10]):
+                    checked += 1
+                    if r: candidates.append(r)
     print(f"SCAN: checked {checked}, candidates {len(candidates)}")
     if not candidates:
         print("[ERROR] No candidates", file=sys.stderr); sys.exit(1)
@@ -659,11 +770,20 @@ _sym_safe    = symbol.replace(".NS","").replace(".BO","").upper()
 OUT_FILE     = os.path.join(OUT_DIR, f"chart_{_sym_safe}_{int(_time.time())}.png")
 
 # ── DATA DOWNLOAD ─────────────────────────────────────────────────────────────
-data = yf.download(symbol, period=CHART_PERIOD, interval="1d", progress=False, auto_adjust=True)
+# Auto-picked winners were already downloaded (6mo daily) by the scan batch
+data = _SCAN_FRAMES.get(symbol) if CHART_PERIOD == "6mo" else None
+if data is None:
+    data = yf.download(symbol, period=CHART_PERIOD, interval="1d", progress=False, auto_adjust=True)
 if data.empty:
     print(f"[ERROR] No data for {symbol}", file=sys.stderr); sys.exit(1)
 if isinstance(data.columns, pd.MultiIndex): data.columns = data.columns.get_level_values(0)
 data = data.dropna(subset=["Open","High","Low","Close","Volume"])
+# BB(20) is the longest window the chart can't do without — below that the
+# indicator block dies on an empty .dropna().iloc[-1]; stop before the weekly
+# and .info round-trips instead
+if len(data) < MIN_CHART_BARS:
+    print(f"[ERROR] Not enough history for {symbol} (have {len(data)} bars, need {MIN_CHART_BARS})",
+          file=sys.stderr); sys.exit(1)
 
 # Weekly data for trend alignment check
 try:
@@ -700,17 +820,17 @@ close    = close_s.values; n = len(close)
 ema9     = close_s.ewm(span=9,  adjust=False).mean()
 ema21    = close_s.ewm(span=21, adjust=False).mean()
 ema50    = close_s.ewm(span=50, adjust=False).mean()
-sma20    = close_s.rolling(20).mean()
-sma50    = close_s.rolling(50).mean()
+sma20    = pd.Series(move_mean(close, 20), index=data.index)
+sma50    = pd.Series(move_mean(close, 50), index=data.index)
 ema12    = close_s.ewm(span=12, adjust=False).mean()
 ema26    = close_s.ewm(span=26, adjust=False).mean()
 macd     = ema12 - ema26
 macd_sig = macd.ewm(span=9, adjust=False).mean()
 hist     = macd - macd_sig
-vol_ma20 = vol_s.rolling(20).mean()
+vol_ma20 = pd.Series(move_mean(vol_s.values, 20), index=data.index)
 
 bb_mid   = sma20
-bb_std   = close_s.rolling(20).std()
+bb_std   = pd.Series(move_std(close, 20), index=data.index)
 bb_upper = bb_mid + 2 * bb_std
 bb_lower = bb_mid - 2 * bb_std
 bb_pct   = ((close_s - bb_lower) / (bb_upper - bb_lower)).clip(0, 1)
@@ -741,8 +861,8 @@ _tr= np.maximum(_h[1:]-_l[1:], np.maximum(np.abs(_h[1:]-_c[:-1]), np.abs(_l[1:]-
 atr_val = round(float(np.mean(_tr[-14:])), 2) if len(_tr) >= 14 else round(float(np.mean(_tr)), 2)
 
 hist_n = min(252, n)
-if _52h is None: _52h = float(data["High"].rolling(hist_n).max().iloc[-1])
-if _52l is None: _52l = float(data["Low"].rolling(hist_n).min().iloc[-1])
+if _52h is None: _52h = float(data["High"].values[-hist_n:].max())
+if _52l is None: _52l = float(data["Low"].values[-hist_n:].min())
 _52w_pct = round((last_close - _52l) / (_52h - _52l) * 100, 1) if _52h != _52l else 50.0
 
 # ── 11-CHECK WEIGHTED SCORING ─────────────────────────────────────────────────
@@ -1,15 +1,20 @@
 from flask import Flask, jsonify
+import json
 import time
 
 app = Flask(__name__)
 
+# Constant probe bodies, serialised once at import
+_HEALTH_BODY = json.dumps({'status': 'healthy'}).encode()
+_STATUS_BODY = json.dumps({'status': 'running', 'version': '1.0.0'}).encode()
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'healthy'}), 200
+    return app.response_class(_HEALTH_BODY, status=200, mimetype='application/json')
 
 @app.route('/status', methods=['GET'])
 def status():
-    return jsonify({'status': 'running', 'version': '1.0.0'}), 200
+    return app.response_class(_STATUS_BODY, status=200, mimetype='application/json')
 
 @app.route('/uptime', methods=['GET'])
 def uptime():
@@ -26,4 +31,4 @@ def restart():
     return jsonify({'message': 'Service is restarting'}), 200
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000)
+    app.run(host='0.0.0.0', port=5000, threaded=True)
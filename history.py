@@ -1,8 +1,11 @@
 import time
-from collections import defaultdict
-from typing import Dict, List, Optional
+from collections import defaultdict, deque
+from itertools import islice
+from typing import Deque, Dict, List, Optional
 
-history_store: Dict[int, List[Dict]] = defaultdict(list)
+HISTORY_MAX_ITEMS = 20
+# deque(maxlen) evicts the oldest item on append — no slice-and-copy per write
+history_store: Dict[int, Deque[Dict]] = defaultdict(lambda: deque(maxlen=HISTORY_MAX_ITEMS))
 FRESHNESS_SECONDS = 3600
 
 def add_history_item(uid: int, prompt: str, response: str, itype: str = "analysis") -> int:
@@ -14,15 +17,13 @@ def add_history_item(uid: int, prompt: str, response: str, itype: str = "analysi
         "response": response,
         "type": itype,
     })
-    if len(history_store[uid]) > 20:
-        history_store[uid] = history_store[uid][-20:]
     return iid
 
 def get_recent_history(uid: int, limit: int = 10) -> List[Dict]:
-    return history_store.get(uid, [])[-limit:][::-1]
+    return list(islice(reversed(history_store.get(uid, ())), limit))
 
 def get_history_item(uid: int, iid: int) -> Optional[Dict]:
-    for item in history_store.get(uid, []):
+    for item in history_store.get(uid, ()):
         if item["id"] == iid:
             return item
     return None
@@ -0,0 +1,451 @@
+"""
+indicator_kernels.py — Compiled inner loops for technical_indicators.py
+
+The pandas versions allocated several intermediate Series per indicator
+(ewm → diff → concat → ewm …) for a ~250-bar array. These kernels make a
+single pass over plain float64 NumPy arrays and return only what callers use.
+
+Numba is optional: without it `njit` is a no-op decorator and the same loops
+run as ordinary Python over the arrays — slower, but identical results.
+"""
+
+import time
+import logging
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:  # optional dependency — fall back to pure Python loops
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda fn: fn
+
+
+def as_f64(values) -> np.ndarray:
+    """pd.Series / list / ndarray → contiguous float64 array (no copy if already one)."""
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+# ── EMA ───────────────────────────────────────────────────────────────────────
+@njit(cache=True)
+def ema_last(x, alpha):
+    """Last value of pandas ewm(alpha=alpha, adjust=False).mean(), seeded with x[0]; NaN if empty."""
+    if x.shape[0] == 0:
+        return np.nan
+    e = x[0]
+    for i in range(1, x.shape[0]):
+        e = alpha * x[i] + (1.0 - alpha) * e
+    return e
+
+
+@njit(cache=True)
+def ema_array(x, alpha):
+    """Full EMA series (same recurrence as ema_last) for callers that need history."""
+    out = np.empty_like(x)
+    if x.shape[0] == 0:
+        return out
+    e = x[0]
+    out[0] = e
+    for i in range(1, x.shape[0]):
+        e = alpha * x[i] + (1.0 - alpha) * e
+        out[i] = e
+    return out
+
+
+@njit(cache=True)
+def ema_multi_last(x, alphas):
+    """Last EMA for each alpha in ONE pass over x (same recurrence as ema_last); NaNs if empty."""
+    k = alphas.shape[0]
+    e = np.empty(k)
+    if x.shape[0] == 0:
+        e[:] = np.nan
+        return e
+    for j in range(k):
+        e[j] = x[0]
+    for i in range(1, x.shape[0]):
+        xi = x[i]
+        for j in range(k):
+            e[j] = alphas[j] * xi + (1.0 - alphas[j]) * e[j]
+    return e
+
+
+# ── MACD (fused fast/slow/signal EMAs) ────────────────────────────────────────
+@njit(cache=True)
+def macd_last(close, a_fast, a_slow, a_sig):
+    """
+    Last (macd, signal, histogram) in one pass. Same recurrence as
+    pandas ewm(span=n, adjust=False): seeded with the first bar, alpha = 2/(n+1).
+    """
+    ema_f = close[0]
+    ema_s = close[0]
+    sig = 0.0
+    for i in range(1, close.shape[0]):
+        c = close[i]
+        ema_f = a_fast * c + (1.0 - a_fast) * ema_f
+        ema_s = a_slow * c + (1.0 - a_slow) * ema_s
+        sig = a_sig * (ema_f - ema_s) + (1.0 - a_sig) * sig
+    macd = ema_f - ema_s
+    return macd, sig, macd - sig
+
+
+# ── RSI (Wilder) ──────────────────────────────────────────────────────────────
+@njit(cache=True)
+def rsi_last(close, period):
+    """
+    Last RSI value with Wilder smoothing — same recurrence as pandas
+    ewm(com=period-1, adjust=False) over gains/losses, seeded with the first diff.
+    Needs at least 2 bars.
+    """
+    a = 1.0 / period
+    d = close[1] - close[0]
+    gain = d if d > 0.0 else 0.0
+    loss = -d if d < 0.0 else 0.0
+    for i in range(2, close.shape[0]):
+        d = close[i] - close[i - 1]
+        gain = (1.0 - a) * gain + a * (d if d > 0.0 else 0.0)
+        loss = (1.0 - a) * loss + a * (-d if d < 0.0 else 0.0)
+    if loss == 0.0:
+        loss = 1e-10
+    return 100.0 - 100.0 / (1.0 + gain / loss)
+
+
+# ── Fused close-only pass (RSI + MACD + EMA20/50 + SMA20/50/200) ─────────────
+@njit(cache=True)
+def close_stats(close, period, a_fast, a_slow, a_sig, a20, a50):
+    """
+    Everything the advisory/screener cards need from the closes, in one loop:
+    (rsi, macd, signal, ema20, ema50, sma20, sma50, sma200).
+    EMAs follow pandas ewm(adjust=False); RSI is Wilder (see rsi_last).
+    SMAs use windowed running sums and are NaN when history is shorter than the window.
+    Needs at least 2 bars.
+    """
+    n = close.shape[0]
+    a = 1.0 / period
+    c0 = close[0]
+    ema_f = c0
+    ema_s = c0
+    sig = 0.0
+    e20 = c0
+    e50 = c0
+    gain = 0.0
+    loss = 0.0
+    s20 = c0
+    s50 = c0
+    s200 = c0
+    for i in range(1, n):
+        c = close[i]
+        d = c - close[i - 1]
+        up = d if d > 0.0 else 0.0
+        dn = -d if d < 0.0 else 0.0
+        if i == 1:
+            gain = up
+            loss = dn
+        else:
+            gain = (1.0 - a) * gain + a * up
+            loss = (1.0 - a) * loss + a * dn
+        ema_f = a_fast * c + (1.0 - a_fast) * ema_f
+        ema_s = a_slow * c + (1.0 - a_slow) * ema_s
+        sig = a_sig * (ema_f - ema_s) + (1.0 - a_sig) * sig
+        e20 = a20 * c + (1.0 - a20) * e20
+        e50 = a50 * c + (1.0 - a50) * e50
+        s20 += c
+        s50 += c
+        s200 += c
+        if i >= 20:
+            s20 -= close[i - 20]
+        if i >= 50:
+            s50 -= close[i - 50]
+        if i >= 200:
+            s200 -= close[i - 200]
+    if loss == 0.0:
+        loss = 1e-10
+    rsi = 100.0 - 100.0 / (1.0 + gain / loss)
+    sma20 = s20 / 20.0 if n >= 20 else np.nan
+    sma50 = s50 / 50.0 if n >= 50 else np.nan
+    sma200 = s200 / 200.0 if n >= 200 else np.nan
+    return rsi, ema_f - ema_s, sig, e20, e50, sma20, sma50, sma200
+
+
+# ── ADX / +DI / -DI ───────────────────────────────────────────────────────────
+@njit(cache=True)
+def adx_last(high, low, close, period):
+    """
+    Last (adx, +DI, -DI) in one pass, reproducing technical_indicators.calc_adx's
+    pandas pipeline exactly: +DM = ΔHigh, -DM = |ΔLow| (each kept only when it
+    dominates the other and is > 0), TR = max(H-L, |H-Cprev|, |L-Cprev|), then
+    Wilder smoothing (ewm com=period-1, adjust=False) of TR/+DM/-DM and of DX.
+    Values are NaN until enough bars exist (min_periods=period at each stage).
+    """
+    n = close.shape[0]
+    a = 1.0 / period
+    atr = high[0] - low[0]
+    pdm_s = 0.0
+    mdm_s = 0.0
+    pdi = np.nan
+    mdi = np.nan
+    adx = np.nan
+    n_dx = 0
+    for i in range(1, n):
+        up = high[i] - high[i - 1]
+        dn = abs(low[i] - low[i - 1])
+        pdm = up if (up > dn and up > 0.0) else 0.0
+        mdm = dn if (dn > pdm and dn > 0.0) else 0.0
+        tr = high[i] - low[i]
+        t2 = abs(high[i] - close[i - 1])
+        t3 = abs(low[i] - close[i - 1])
+        if t2 > tr:
+            tr = t2
+        if t3 > tr:
+            tr = t3
+        atr = (1.0 - a) * atr + a * tr
+        pdm_s = (1.0 - a) * pdm_s + a * pdm
+        mdm_s = (1.0 - a) * mdm_s + a * mdm
+        if i >= period - 1:
+            pdi = 100.0 * pdm_s / atr
+            mdi = 100.0 * mdm_s / atr
+            dx = abs(pdi - mdi) / (pdi + mdi + 1e-10) * 100.0
+            adx = dx if n_dx == 0 else (1.0 - a) * adx + a * dx
+            n_dx += 1
+    if n_dx < period:
+        adx = np.nan
+    return adx, pdi, mdi
+
+
+# ── ATR ───────────────────────────────────────────────────────────────────────
+@njit(cache=True)
+def atr_last(high, low, close, period):
+    """
+    Last Wilder ATR, matching technical_indicators.calc_atr's former pandas
+    pipeline: TR = max(H-L, |H-Cprev|, |L-Cprev|) with TR[0] = H-L, smoothed by
+    ewm(com=period-1, adjust=False); NaN below `period` bars (min_periods).
+    """
+    n = close.shape[0]
+    if n < period:
+        return np.nan
+    a = 1.0 / period
+    atr = high[0] - low[0]
+    for i in range(1, n):
+        tr = high[i] - low[i]
+        t2 = abs(high[i] - close[i - 1])
+        t3 = abs(low[i] - close[i - 1])
+        if t2 > tr:
+            tr = t2
+        if t3 > tr:
+            tr = t3
+        atr = (1.0 - a) * atr + a * tr
+    return atr
+
+
+# ── Bollinger (last bar) ──────────────────────────────────────────────────────
+@njit(cache=True)
+def bb_last(close, window, num_sd):
+    """
+    (mid, upper, lower) over the trailing `window` closes — two short passes
+    (mean, then squared deviations) so there's no E[x²]−E[x]² cancellation.
+    Sample σ (ddof=1) like pandas rolling().std(). Needs n ≥ window ≥ 2.
+    """
+    n = close.shape[0]
+    s = 0.0
+    for i in range(n - window, n):
+        s += close[i]
+    mid = s / window
+    ss = 0.0
+    for i in range(n - window, n):
+        ss += (close[i] - mid) * (close[i] - mid)
+    sd = np.sqrt(ss / (window - 1))
+    return mid, mid + num_sd * sd, mid - num_sd * sd
+
+
+# ── Fused swing pass (EMA50/200 + RSI + MACD + Bollinger + ADX) ─────────────
+@njit(cache=True)
+def swing_stats(high, low, close, rsi_period, adx_period,
+                a_fast, a_slow, a_sig, a50, a200, bb_window, num_sd, tail_k):
+    """
+    Last values for swing_trades.swing_score in one pass over H/L/C:
+    (ema50, ema200, rsi, macd, signal, bb_mid, bb_upper, bb_lower, adx, +DI, -DI,
+    rsi_tail, hist_tail) — the two tails are the last tail_k RSI and MACD
+    histogram values, oldest first.
+    Each recurrence matches its single-indicator kernel above (rsi_last,
+    macd_last, adx_last); Bollinger uses the sample σ of the last bb_window
+    closes, like pandas rolling().std(). Needs at least bb_window, tail_k+1
+    and 2 bars.
+    """
+    n = close.shape[0]
+    rsi_t = np.empty(tail_k)
+    hist_t = np.empty(tail_k)
+    ar = 1.0 / rsi_period
+    aa = 1.0 / adx_period
+    c0 = close[0]
+    e50 = c0
+    e200 = c0
+    ema_f = c0
+    ema_s = c0
+    sig = 0.0
+    gain = 0.0
+    loss = 0.0
+    atr = high[0] - low[0]
+    pdm_s = 0.0
+    mdm_s = 0.0
+    pdi = np.nan
+    mdi = np.nan
+    adx = np.nan
+    n_dx = 0
+    for i in range(1, n):
+        c = close[i]
+        cp = close[i - 1]
+        e50 = a50 * c + (1.0 - a50) * e50
+        e200 = a200 * c + (1.0 - a200) * e200
+        ema_f = a_fast * c + (1.0 - a_fast) * ema_f
+        ema_s = a_slow * c + (1.0 - a_slow) * ema_s
+        sig = a_sig * (ema_f - ema_s) + (1.0 - a_sig) * sig
+
+        d = c - cp
+        up = d if d > 0.0 else 0.0
+        dn = -d if d < 0.0 else 0.0
+        if i == 1:
+            gain = up
+            loss = dn
+        else:
+            gain = (1.0 - ar) * gain + ar * up
+            loss = (1.0 - ar) * loss + ar * dn
+
+        hu = high[i] - high[i - 1]
+        ld = abs(low[i] - low[i - 1])
+        pdm = hu if (hu > ld and hu > 0.0) else 0.0
+        mdm = ld if (ld > pdm and ld > 0.0) else 0.0
+        tr = high[i] - low[i]
+        t2 = abs(high[i] - cp)
+        t3 = abs(low[i] - cp)
+        if t2 > tr:
+            tr = t2
+        if t3 > tr:
+            tr = t3
+        atr = (1.0 - aa) * atr + aa * tr
+        pdm_s = (1.0 - aa) * pdm_s + aa * pdm
+        mdm_s = (1.0 - aa) * mdm_s + aa * mdm
+        if i >= adx_period - 1:
+            pdi = 100.0 * pdm_s / atr
+            mdi = 100.0 * mdm_s / atr
+            dx = abs(pdi - mdi) / (pdi + mdi + 1e-10) * 100.0
+            adx = dx if n_dx == 0 else (1.0 - aa) * adx + aa * dx
+            n_dx += 1
+
+        j = i - (n - tail_k)
+        if j >= 0:
+            lo = loss if loss != 0.0 else 1e-10
+            rsi_t[j] = 100.0 - 100.0 / (1.0 + gain / lo)
+            hist_t[j] = (ema_f - ema_s) - sig
+    if n_dx < adx_period:
+        adx = np.nan
+    if loss == 0.0:
+        loss = 1e-10
+    rsi = 100.0 - 100.0 / (1.0 + gain / loss)
+
+    mid, upper, lower = bb_last(close, bb_window, num_sd)
+    return (e50, e200, rsi, ema_f - ema_s, sig,
+            mid, upper, lower, adx, pdi, mdi, rsi_t, hist_t)
+
+
+# ── Supertrend direction ──────────────────────────────────────────────────────
+@njit(cache=True)
+def supertrend_dir(high, low, close, period, mult):
+    """
+    Last Supertrend direction (+1 / -1) in one pass: true range, its
+    period-bar simple mean (running sum), hl2 ± mult·ATR bands and the
+    direction flip rule — close above the previous upper band → +1, below the
+    previous lower band → -1, else unchanged. Bands are NaN (no flip) until
+    `period` true ranges exist. Same rule as the old pandas/loop version.
+    """
+    m = close.shape[0] - 1
+    trs = np.empty(m)
+    s = 0.0
+    d = 1
+    prev_up = np.nan
+    prev_lo = np.nan
+    for j in range(m):
+        i = j + 1
+        tr = high[i] - low[i]
+        t2 = abs(high[i] - close[i - 1])
+        t3 = abs(low[i] - close[i - 1])
+        if t2 > tr:
+            tr = t2
+        if t3 > tr:
+            tr = t3
+        trs[j] = tr
+        s += tr
+        if j >= period:
+            s -= trs[j - period]
+        atr = s / period if j >= period - 1 else np.nan
+        if j >= 1:
+            c = close[i]
+            if c > prev_up:
+                d = 1
+            elif c < prev_lo:
+                d = -1
+        hl2 = (high[i] + low[i]) / 2.0
+        prev_up = hl2 + mult * atr
+        prev_lo = hl2 - mult * atr
+    return d
+
+
+# ── Warm-up ───────────────────────────────────────────────────────────────────
+def warm_up() -> None:
+    """
+    Compile every kernel for the float64 signature callers use (or load it from
+    numba's on-disk cache), so the first user request doesn't pay 1-3 s of JIT.
+    """
+    if not NUMBA_AVAILABLE:
+        return
+    t0 = time.time()
+    x = np.linspace(100.0, 120.0, 64)
+    ema_last(x, 2.0 / 21)
+    ema_array(x, 2.0 / 21)
+    ema_multi_last(x, np.array([2.0 / 21, 2.0 / 51, 2.0 / 201]))
+    macd_last(x, 2.0 / 13, 2.0 / 27, 2.0 / 10)
+    rsi_last(x, 14)
+    close_stats(x, 14, 2.0 / 13, 2.0 / 27, 2.0 / 10, 2.0 / 21, 2.0 / 51)
+    adx_last(x + 1.0, x - 1.0, x, 14)
+    atr_last(x + 1.0, x - 1.0, x, 14)
+    bb_last(x, 20, 2.0)
+    supertrend_dir(x + 1.0, x - 1.0, x, 7, 3.0)
+    swing_stats(x + 1.0, x - 1.0, x, 14, 14, 2.0 / 13, 2.0 / 27, 2.0 / 10,
+                2.0 / 51, 2.0 / 201, 20, 2.0, 3)
+    logger.info(f"[kernels] numba warm-up done in {time.time() - t0:.2f}s")
+
+
+_warm_ok = False
+
+
+def _warm_up_quietly() -> None:
+    global _warm_ok
+    try:
+        warm_up()
+        _warm_ok = True
+    except Exception as e:
+        logger.warning(f"[kernels] numba warm-up failed: {e}")
+
+
+_warmup_thread = None
+if NUMBA_AVAILABLE:
+    _warmup_thread = threading.Thread(target=_warm_up_quietly, name="numba-warmup", daemon=True)
+    _warmup_thread.start()
+
+
+def wait_until_warm(timeout: float = 30.0) -> bool:
+    """
+    Block until the import-time warm-up finishes. True if every kernel compiled
+    (or numba is absent, so there is nothing to compile); False on timeout or
+    if warm-up raised. builder.sh uses this to bake the numba cache into the image.
+    """
+    if _warmup_thread is None:
+        return True
+    _warmup_thread.join(timeout)
+    return not _warmup_thread.is_alive() and _warm_ok
@@ -2,6 +2,7 @@
 # FIX: file was mis-named "limits.py.py" → renamed to "limits.py"
 
 import os
+import threading
 from datetime import date
 from typing import Tuple, Dict
 
@@ -12,54 +13,95 @@ TIER_LIMITS: Dict[str, int] = {
 
 # In-memory store: { user_id: {"date": "YYYY-MM-DD", "calls": int, "tier": str} }
 usage_store: Dict[int, Dict] = {}
+# FIX: handlers run on telebot's thread pool; check-then-increment raced and
+# let concurrent requests overshoot the daily limit. All access goes through this.
+_usage_lock  = threading.Lock()
+_swept_date  = ""
 
 
 def get_today_str() -> str:
     return date.today().isoformat()
 
 
+def _sweep(today: str) -> None:
+    """Once per day, drop free-tier users idle since before today (caller holds the lock)."""
+    global _swept_date
+    if _swept_date == today:
+        return
+    for uid in [u for u, r in usage_store.items() if r["date"] != today and r.get("tier", "free") == "free"]:
+        del usage_store[uid]
+    _swept_date = today
+
+
+def _record(user_id: int, today: str) -> Dict:
+    """Today's record for user_id, created or rolled over as needed (caller holds the lock)."""
+    _sweep(today)
+    rec = usage_store.get(user_id)
+    if rec is None:
+        rec = usage_store[user_id] = {"date": today, "calls": 0, "tier": "free"}
+    elif rec["date"] != today:
+        rec["date"]  = today
+        rec["calls"] = 0
+    return rec
+
+
+def _limit(rec: Dict) -> int:
+    return TIER_LIMITS.get(rec.get("tier", "free"), TIER_LIMITS["free"])
+
+
 def can_use_llm(user_id: int) -> Tuple[bool, int, int]:
     """
     Returns (allowed, remaining, limit).
     Resets counter at midnight automatically.
     """
-    today = get_today_str()
-    rec   = usage_store.get(user_id)
+    with _usage_lock:
+        rec = _record(user_id, get_today_str())
+        lim = _limit(rec)
+        rem = lim - rec["calls"]
+    return rem > 0, rem, lim
 
-    if rec is None:
-        usage_store[user_id] = {"date": today, "calls": 0, "tier": "free"}
-        lim = TIER_LIMITS["free"]
-        return True, lim, lim
 
-    # Roll over at new day
-    if rec["date"] != today:
-        rec["date"]  = today
-        rec["calls"] = 0
+def try_consume_llm(user_id: int) -> Tuple[bool, int, int]:
+    """
+    Check and take one call in a single step. Returns (allowed, remaining, limit),
+    where remaining is what is left after this call. Pair with refund_llm_usage()
+    if the call then fails.
+    """
+    with _usage_lock:
+        rec = _record(user_id, get_today_str())
+        lim = _limit(rec)
+        if rec["calls"] >= lim:
+            return False, 0, lim
+        rec["calls"] += 1
+        return True, lim - rec["calls"], lim
 
-    lim = TIER_LIMITS.get(rec.get("tier", "free"), TIER_LIMITS["free"])
-    rem = lim - rec["calls"]
-    return rem > 0, rem, lim
+
+def refund_llm_usage(user_id: int) -> None:
+    """Give back a call taken by try_consume_llm() (e.g. the provider failed)."""
+    with _usage_lock:
+        rec = usage_store.get(user_id)
+        if rec and rec["date"] == get_today_str() and rec["calls"] > 0:
+            rec["calls"] -= 1
 
 
 def register_llm_usage(user_id: int) -> None:
-    rec = usage_store.get(user_id)
-    if rec:
-        rec["calls"] += 1
-    else:
-        usage_store[user_id] = {"date": get_today_str(), "calls": 1, "tier": "free"}
+    with _usage_lock:
+        _record(user_id, get_today_str())["calls"] += 1
 
 
 def set_tier(user_id: int, tier: str) -> None:
     """Upgrade/downgrade a user's tier (free / paid)."""
-    rec = usage_store.setdefault(user_id, {"date": get_today_str(), "calls": 0, "tier": "free"})
-    if tier in TIER_LIMITS:
-        rec["tier"] = tier
+    with _usage_lock:
+        rec = _record(user_id, get_today_str())
+        if tier in TIER_LIMITS:
+            rec["tier"] = tier
 
 
 def get_usage_info(user_id: int) -> Dict:
     """Return current usage stats for a user."""
     allowed, remaining, limit = can_use_llm(user_id)
-    rec = usage_store.get(user_id, {})
+    with _usage_lock:
+        rec = dict(usage_store.get(user_id, {}))
     return {
         "tier":      rec.get("tier", "free"),
         "calls":     rec.get("calls", 0),
@@ -1,7 +1,11 @@
 # llm_wrapper.py — Safe LLM wrapper with lazy imports + per-user limits
 import logging
 import os
-from typing import Tuple
+import threading
+from typing import Any, Dict, Tuple
+
+from api_utils import make_groq_client
+from config import TIMEOUT_GEMINI
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +29,30 @@ def _ensure_gemini():
     return _gemini_configured
 
 
+# ── Cached Gemini model objects (one per model name) ──────────────────────
+_gemini_models: Dict[str, Any] = {}
+
+def _get_gemini_model(name: str):
+    m = _gemini_models.get(name)
+    if m is None:
+        import google.generativeai as genai
+        m = _gemini_models.setdefault(name, genai.GenerativeModel(model_name=name))
+    return m
+
+
+# ── Cached Groq client (one TLS pool per process, not per call) ───────────
+_groq_client = None
+_groq_lock   = threading.Lock()
+
+def _get_groq():
+    global _groq_client
+    if _groq_client is None:
+        with _groq_lock:
+            if _groq_client is None:
+                _groq_client = make_groq_client(GROQ_API_KEY)
+    return _groq_client
+
+
 def actual_llm_call(prompt: str, max_tokens: int = 500) -> str:
     used_any = False
 
@@ -32,21 +60,7 @@ def actual_llm_call(prompt: str, max_tokens: int = 500) -> str:
     if GROQ_API_KEY:
         used_any = True
         try:
-            from groq import Groq
-            import functools
-            # groq>=0.9 uses httpx which rejects proxies= kwarg from some environments
-            def _safe_groq(api_key):
-                try:
-                    return Groq(api_key=api_key)
-                except TypeError as e:
-                    if "proxies" not in str(e): raise
-                    import httpx
-                    orig = httpx.Client.__init__
-                    httpx.Client.__init__ = lambda self,*a,**kw: orig(self,*a,**{k:v for k,v in kw.items() if k!="proxies"})
-                    c = Groq(api_key=api_key)
-                    httpx.Client.__init__ = orig
-                    return c
-            client = _safe_groq(GROQ_API_KEY)
+            client = _get_groq()
             for model in ["llama-3.3-70b-versatile", "llama3-70b-8192", "mixtral-8x7b-32768"]:
                 try:
                     resp = client.chat.completions.create(
@@ -70,13 +84,13 @@ def actual_llm_call(prompt: str, max_tokens: int = 500) -> str:
     if GEMINI_API_KEY and _ensure_gemini():
         used_any = True
         try:
-            import google.generativeai as genai
             for model_name in ["gemini-1.5-flash", "gemini-1.5-pro", "gemini-pro"]:
                 try:
-                    model = genai.GenerativeModel(model_name=model_name)
+                    model = _get_gemini_model(model_name)
                     resp = model.generate_content(
                         prompt,
-                        generation_config={"max_output_tokens": max_tokens, "temperature": 0.3}
+                        generation_config={"max_output_tokens": max_tokens, "temperature": 0.3},
+                        request_options={"timeout": TIMEOUT_GEMINI},
                     )
                     text = (getattr(resp, "text", "") or "").strip()
                     if text:
@@ -100,18 +114,19 @@ def safe_llm_call(prompt: str, max_tokens: int = 500) -> Tuple[bool, str]:
 def call_llm_with_limits(user_id: int, prompt: str, item_type: str = "analysis") -> str:
     import history as hist
     import limits as lim
-    allowed, remaining, limit = lim.can_use_llm(user_id)
+    # Reserve the call up front so concurrent requests can't overshoot the limit
+    allowed, remaining, limit = lim.try_consume_llm(user_id)
     if not allowed:
         return f"🚫 You've used all {limit} AI analyses for today. Please try again tomorrow."
 
     success, response = safe_llm_call(prompt)
     if not success:
+        lim.refund_llm_usage(user_id)
         return "⚠️ AI service temporarily unavailable. Your quota was not used."
 
-    lim.register_llm_usage(user_id)
     hist.add_history_item(user_id, prompt, response, item_type)
 
-    if (remaining - 1) <= 3:
-        response += f"\n\n<i>⚠️ {remaining - 1} AI calls left today.</i>"
+    if remaining <= 3:
+        response += f"\n\n<i>⚠️ {remaining} AI calls left today.</i>"
 
     return response
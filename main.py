@@ -6,29 +6,38 @@ Fully audited: No type errors, no missing imports, no API breaks.
 import os
 import re
 import json
+import hmac
 import time
 import logging
 from logging.handlers import RotatingFileHandler
 from datetime import datetime, date
 from collections import deque
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
 import threading
 
-import requests
 import pandas as pd
-import yfinance as yf
 from flask import Flask, request, jsonify
 import telebot
 from telebot import types
 
 # ── Local Module Imports ──────────────────────────────────────────────────────
-from data_engine import get_hist, get_info, get_live_price, batch_quotes
+from data_engine import (
+    get_hist, get_hist_batch, get_info, get_live_price, batch_quotes, yfinance_download_batch,
+)
 from technical_indicators import (
-    calc_rsi, calc_ema, calc_macd, calc_atr, calc_asi,
-    calc_bollinger, trend_label, swing_signal, rsi_label,
+    calc_asi, calc_bollinger, swing_signal, rsi_label, adv_indicators,
+)
+from api_utils import (
+    API_RATE_LIMITER, ADV_CACHE, LIVE_CACHE, FUND_CACHE, IND_CACHE, cached,
+    nse_closed_session, get_http_session,
+)
+from config import (
+    RATE_LIMIT_WINDOW, RATE_LIMIT_MAX_CALLS, TG_CHUNK_SIZE, TG_HANDLER_THREADS,
+    TG_STREAM_EDIT_SEC, CACHE_TTL_ADV_CLOSED, TIMEOUT_TAVILY,
+    CACHE_TTL_BREADTH, CACHE_TTL_RESOLVE, CACHE_TTL_SCAN, PRICE_FETCH_WORKERS, TG_ALLOWED_UPDATES,
+    TG_LONG_POLL_SEC, TG_CHAT_QUEUE_MAX,
 )
-from api_utils import API_RATE_LIMITER
-from config import RATE_LIMIT_WINDOW, RATE_LIMIT_MAX_CALLS
 from market_news import get_market_news, get_stock_news
 
 from ai_engine import (
@@ -43,7 +52,7 @@ from ai_engine import (
     test_ai_providers,
     debug_ai_status,
 )
-from swing_trades import get_swing_trades
+from swing_trades import get_swing_trades, start_prefetch_thread
 from chart_integration import get_chart_generator
 
 # ── Logging Setup (Render & Local Safe) ──────────────────────────────────────
@@ -63,12 +72,99 @@ if not TOKEN:
     raise RuntimeError("TELEGRAM_TOKEN environment variable is required")
 
 WEBHOOK_URL = os.getenv("WEBHOOK_URL", "").rstrip("/")
+# Telegram echoes this in X-Telegram-Bot-Api-Secret-Token on every push
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
 TAVILY_KEY = os.getenv("TAVILY_API_KEY")
 WEBHOOK_PATH = f"/webhook/{TOKEN}"
 
 app = Flask(__name__)
-bot = telebot.TeleBot(TOKEN, threaded=False)
+# FIX: threaded=False ran every handler on the polling thread, so one slow
+# send_message / resolve_symbol (e.g. /buy) stalled all other chats. Handlers
+# now run on telebot's worker pool; heavy work still goes to `executor`.
+bot = telebot.TeleBot(TOKEN, threaded=True, num_threads=TG_HANDLER_THREADS)
+# telebot otherwise gives each sending thread its own requests.Session with a
+# 10-socket pool; route every Bot API call through the shared pooled session
+# so handler and executor threads reuse warm TLS connections to Telegram.
+telebot.apihelper.session = get_http_session()
 executor = ThreadPoolExecutor(max_workers=20)
+# Separate pool for per-symbol quote fan-out: the callers already run on
+# `executor`, and nesting into the same pool can starve it.
+_price_pool = ThreadPoolExecutor(max_workers=PRICE_FETCH_WORKERS, thread_name_prefix="price")
+
+# ── Per-chat ordering ────────────────────────────────────────────────────────
+# Handlers hand their slow work to `executor` so the update loop never waits
+# on yfinance/LLM calls. Work for one chat is drained in submission order by a
+# single runner (other chats still run in parallel), so replies can't overtake
+# each other and an idle chat holds no lock or pool thread. A chat's backlog is
+# capped at TG_CHAT_QUEUE_MAX, so one user hammering buttons can't queue up
+# minutes of LLM calls ahead of everyone else's work on the shared pool.
+_chat_queues = {}
+_chat_queues_lock = threading.Lock()
+
+
+def _notify_busy(chat_id):
+    logger.info(f"Chat {chat_id} backlog full — request dropped")
+    try:
+        bot.send_message(chat_id, "⏳ Still working on your earlier requests — try again in a moment.")
+    except Exception:
+        pass
+
+
+def chat_busy(chat_id):
+    """
+    True (and the user is told) if the chat's backlog is already full. Handlers
+    check this BEFORE sending a placeholder or changing state, so a dropped
+    request leaves nothing behind.
+    """
+    with _chat_queues_lock:
+        q = _chat_queues.get(chat_id)
+        full = q is not None and len(q) >= TG_CHAT_QUEUE_MAX
+    if full:
+        _notify_busy(chat_id)
+    return full
+
+
+def submit_for_chat(chat_id, fn, *args):
+    """
+    Run fn(*args) after the chat's earlier jobs. Returns False if the backlog
+    filled up since chat_busy() (two updates racing) — the user has been told,
+    the caller cleans up its placeholder / state.
+    """
+    with _chat_queues_lock:
+        q = _chat_queues.get(chat_id)
+        full = q is not None and len(q) >= TG_CHAT_QUEUE_MAX
+        if q is None:
+            _chat_queues[chat_id] = deque([(fn, args)])
+        elif not full:
+            q.append((fn, args))
+            return True
+    if full:
+        _notify_busy(chat_id)
+        return False
+    executor.submit(_drain_chat, chat_id)
+    return True
+
+
+def _drop_placeholder(chat_id, message_id):
+    if message_id is not None:
+        try:
+            bot.delete_message(chat_id, message_id)
+        except Exception:
+            pass
+
+
+def _drain_chat(chat_id):
+    while True:
+        with _chat_queues_lock:
+            q = _chat_queues[chat_id]
+            if not q:
+                del _chat_queues[chat_id]
+                return
+            fn, args = q.popleft()
+        try:
+            fn(*args)
+        except Exception:
+            logger.exception(f"Chat task failed for {chat_id}")
 
 # ── Smart Symbol Resolver (yfinance version-safe) ────────────────────────────
 _SYMBOL_MAP = {}
@@ -100,6 +196,22 @@ def resolve_symbol(query: str) -> tuple:
         best = sorted(matches, key=len)[0]
         return f"{best}.NS", best
 
+    # 3/4. Network lookups — memoised, since every free-text query lands here
+    key = f"resolve:{q}"
+    hit = FUND_CACHE.get(key)
+    if hit is not None:
+        return hit
+    res = _resolve_remote(q, q_raw)
+    if res[0]:
+        FUND_CACHE.set(key, res, CACHE_TTL_RESOLVE)
+    return res
+
+
+def _resolve_remote(q: str, q_raw: str) -> tuple:
+    # yfinance is imported lazily (like data_engine) — it's heavy and only the
+    # remote-lookup / fallback paths need it
+    import yfinance as yf
+
     # 3. yfinance search (compatible with older yfinance versions)
     try:
         if hasattr(yf, 'Search'):
@@ -118,13 +230,13 @@ def resolve_symbol(query: str) -> tuple:
     except Exception:
         pass
 
-    # 4. Direct ticker fallback
+    # 4. Direct ticker fallback — a short history proves the ticker exists; the
+    # full .info scrape just for a display name isn't worth it (the map paths
+    # above also return the bare symbol as name)
     try:
-        _t = yf.Ticker(f"{q}.NS")
-        _h = _t.history(period="2d", progress=False)
+        _h = yf.Ticker(f"{q}.NS").history(period="2d")
         if _h is not None and not _h.empty:
-            _name = (_t.info or {}).get("longName") or q
-            return f"{q}.NS", _name
+            return f"{q}.NS", q
     except Exception:
         pass
 
@@ -250,42 +362,143 @@ def _fmt_revenue(rev, mcap=None):
         return "N/A"
 
 
+def _make_tgt_fmt(target_mult, sl_mult):
+    """Build the Target/SL formatter for one trend once, instead of branching per call."""
+    t_sign = "+" if target_mult > 0 else "-"
+    s_sign = "+" if sl_mult > 0 else "-"
+    t_abs, s_abs = abs(target_mult), abs(sl_mult)
+
+    def _fmt(ltp, atr):
+        return (f"🎯 Target: ₹{round(ltp + target_mult * atr, 2):,.2f} ({t_sign}{round(t_abs * atr / ltp * 100, 1)}%)"
+                f"  |  SL: ₹{round(ltp + sl_mult * atr, 2):,.2f} ({s_sign}{round(s_abs * atr / ltp * 100, 1)}%)")
+    return _fmt
+
+
+def _range_tgt_fmt(ltp, atr):
+    return (f"🎯 R1: ₹{round(ltp + atr, 2):,.2f}  |  S1: ₹{round(ltp - atr, 2):,.2f}"
+            f"  |  Range SL: ₹{round(ltp - 2 * atr, 2):,.2f}")
+
+
+# ATR multiples per trend: (target, stop-loss)
+_TGT_FMT = {
+    "BULLISH": _make_tgt_fmt(1.5, -2.0),
+    "BEARISH": _make_tgt_fmt(-1.5, 2.0),
+}
+
+
 def _get_tgt_line(trend, ltp, atr):
     if atr is None or atr <= 0 or ltp <= 0:
         return "🎯 Target/SL: Insufficient data"
-    if trend == "BULLISH":
-        return (f"🎯 Target: ₹{round(ltp + 1.5 * atr, 2):,.2f} (+{round(1.5 * atr / ltp * 100, 1)}%)"
-                f"  |  SL: ₹{round(ltp - 2 * atr, 2):,.2f} (-{round(2 * atr / ltp * 100, 1)}%)")
-    if trend == "BEARISH":
-        return (f"🎯 Target: ₹{round(ltp - 1.5 * atr, 2):,.2f} (-{round(1.5 * atr / ltp * 100, 1)}%)"
-                f"  |  SL: ₹{round(ltp + 2 * atr, 2):,.2f} (+{round(2 * atr / ltp * 100, 1)}%)")
-    return (f"🎯 R1: ₹{round(ltp + atr, 2):,.2f}  |  S1: ₹{round(ltp - atr, 2):,.2f}"
-            f"  |  Range SL: ₹{round(ltp - 2 * atr, 2):,.2f}")
+    return _TGT_FMT.get(trend, _range_tgt_fmt)(ltp, atr)
 
 
 # ── Build Advisory Card ──────────────────────────────────────────────────────
-def build_adv(sym):
+def _adv_key(sym):
+    """(cache key, ttl) for sym's advisory card — see build_adv."""
+    session = nse_closed_session()
+    if session is None:
+        return f"adv:{sym}", None
+    return f"adv:{sym}:{session}:close", CACHE_TTL_ADV_CLOSED
+
+
+def _adv_parts(sym, on_snapshot=None):
+    """
+    (snapshot, ai_block) for sym, each served from ADV_CACHE — a repeat request
+    skips history, fundamentals, news and the AI call entirely. While NSE is
+    open they live CACHE_TTL_ADVISORY seconds; once it closes they are keyed by
+    the session date and kept CACHE_TTL_ADV_CLOSED, since daily bars are final.
+    Error snapshots ("❌ …") are never cached and come back with ai_block None;
+    an AI block whose call failed is shown but not cached, so it is retried.
+    Concurrent misses for the same symbol share one build per part.
+    on_snapshot(text) is called as soon as the snapshot is ready, before the
+    (slow) AI block is requested.
+    """
     sym = str(sym).upper().replace(".NS", "").replace(".BO", "")
+    key, ttl = _adv_key(sym)
+    snap, ai_args = ADV_CACHE.get_or_compute(f"{key}:snap", lambda: _adv_snapshot(sym), ttl,
+                                             keep=lambda r: _is_card(r[0]))
+    if on_snapshot is not None:
+        on_snapshot(snap)
+    if ai_args is None:
+        return snap, None
+    ai_block, _ = ADV_CACHE.get_or_compute(f"{key}:ai", lambda: _adv_ai_block(*ai_args), ttl,
+                                           keep=lambda r: r[1])
+    return snap, ai_block
+
+
+def build_adv(sym):
+    """Full advisory card for sym: the snapshot followed by the AI block."""
+    snap, ai_block = _adv_parts(sym)
+    return snap if ai_block is None else f"{snap}\n{ai_block}"
+
+
+def send_adv(chat_id, sym):
+    """
+    Deliver sym's advisory card as two messages: the snapshot (history,
+    indicators, fundamentals, news) goes out as soon as it's ready and the AI
+    block follows when the LLM answers, so the user isn't left waiting on both.
+    """
+    def _on_snapshot(text):
+        safe_send(chat_id, text)
+        _typing(chat_id)          # the send cleared it; the AI block is still coming
+
+    _typing(chat_id)
+    _, ai_block = _adv_parts(sym, on_snapshot=_on_snapshot)
+    if ai_block:
+        safe_send(chat_id, ai_block)
+
+
+def _is_card(text):
+    """Cacheable card output: non-empty and not an error ("❌ …")."""
+    return bool(text) and not text.startswith("❌")
+
+
+def _frow(label, val, suffix=""):
+    """One aligned fundamentals row for the advisory card."""
+    if val is None or val == "N/A":
+        return f"  {label:<14}: N/A"
+    return f"  {label:<14}: {val}{suffix}"
+
+
+def _adv_indicators_cached(sym, df):
+    """
+    adv_indicators() memoised on (symbol, bar count, last bar, last close), so
+    the screener and the advisory card share one computation per symbol until
+    a new bar or tick lands. The returned dict is shared — treat it as read-only.
+    """
+    sym = sym.upper().replace(".NS", "")
+    key = f"{sym}:{len(df)}:{df.index[-1]}:{float(df['Close'].iloc[-1])!r}"
+    out = IND_CACHE.get(key)
+    if out is None:
+        out = adv_indicators(df)
+        IND_CACHE.set(key, out)
+    return out
+
+
+def _adv_snapshot(sym):
+    """
+    Everything on the advisory card except the AI block, plus the arguments
+    _adv_ai_block needs: (text, ai_args). ai_args is None for error cards.
+    """
     try:
         df = get_hist(sym, "6mo")
     except Exception as e:
-        return f"❌ Error fetching history for {sym}: {e}"
+        return f"❌ Error fetching history for {sym}: {e}", None
 
     if df is None or df.empty:
-        return f"❌ <b>{sym}</b> not found."
+        return f"❌ <b>{sym}</b> not found.", None
 
     if len(df) < 2:
-        return f"❌ <b>{sym}</b> insufficient historical data."
+        return f"❌ <b>{sym}</b> insufficient historical data.", None
 
     close = df["Close"]
     ltp = round(float(close.iloc[-1]), 2)
     prev = float(close.iloc[-2])
     chg = round((ltp - prev) / prev * 100, 2) if prev > 0 else 0.0
-    rsi = calc_rsi(close)
-    macd, _, _ = calc_macd(close)
-    ema20 = calc_ema(close, 20)
-    ema50 = calc_ema(close, 50)
-    atr = calc_atr(df)
+    ind = _adv_indicators_cached(sym, df)  # RSI/MACD/EMA/ATR/levels, shared with the screener
+    rsi, macd = ind["rsi"], ind["macd"]
+    ema20, ema50 = ind["ema20"], ind["ema50"]
+    atr = ind["atr"]
     asi = calc_asi(df)
     trend = "BULLISH" if ltp > ema20 > ema50 else "BEARISH" if ltp < ema20 < ema50 else "NEUTRAL"
     t_icon = "🔼" if trend == "BULLISH" else "🔽" if trend == "BEARISH" else "↔️"
@@ -321,12 +534,12 @@ def build_adv(sym):
     n = min(252, len(close))
     if w52h is None:
         try:
-            w52h = round(float(close.rolling(n).max().iloc[-1]), 2)
+            w52h = round(float(close.values[-n:].max()), 2)
         except Exception:
             w52h = None
     if w52l is None:
         try:
-            w52l = round(float(close.rolling(n).min().iloc[-1]), 2)
+            w52l = round(float(close.values[-n:].min()), 2)
         except Exception:
             w52l = None
 
@@ -341,23 +554,8 @@ def build_adv(sym):
     except Exception:
         pass
 
-    ai_text = ""
-    try:
-        ai_text = engine_ai_insights(
-            sym, ltp, rsi, macd, trend,
-            str(pe if pe is not None else "N/A"),
-            str(roe if roe is not None else "N/A")
-        ) or ""
-    except Exception:
-        ai_text = "AI insights unavailable."
-
     chg_icon = "🟢" if chg >= 0 else "🔴"
 
-    def frow(label, val, suffix=""):
-        if val is None or val == "N/A":
-            return f"  {label:<14}: N/A"
-        return f"  {label:<14}: {val}{suffix}"
-
     rows = [
         f"🏢 <b>{name}</b>  ({sym})",
         f"{chg_icon} LTP: ₹{ltp:,.2f}  <b>({chg:+.2f}%)</b>",
@@ -370,25 +568,44 @@ def build_adv(sym):
         f"📉 ATR(14): ₹{atr if atr else 'N/A'}",
         "━━━━━━━━━━━━━━━━━━━━",
         "📋 <b>FUNDAMENTALS</b>",
-        frow("Market Cap", fmt_mcap(mcap)),
-        frow("Revenue", _fmt_revenue(rev, mcap)),
-        frow("PE (TTM)", pe) + (f"  |  Fwd PE: {fwd_pe}" if fwd_pe else ""),
-        frow("Price/Book", pb),
-        frow("ROE", roe, "%") + (f"  |  EPS: ₹{eps}" if eps else ""),
-        frow("Debt/Equity", de) + (f"  |  Beta: {beta}" if beta else ""),
-        frow("Div Yield", div_y, "%"),
+        _frow("Market Cap", fmt_mcap(mcap)),
+        _frow("Revenue", _fmt_revenue(rev, mcap)),
+        _frow("PE (TTM)", pe) + (f"  |  Fwd PE: {fwd_pe}" if fwd_pe else ""),
+        _frow("Price/Book", pb),
+        _frow("ROE", roe, "%") + (f"  |  EPS: ₹{eps}" if eps else ""),
+        _frow("Debt/Equity", de) + (f"  |  Beta: {beta}" if beta else ""),
+        _frow("Div Yield", div_y, "%"),
         "━━━━━━━━━━━━━━━━━━━━",
         _get_tgt_line(trend, ltp, atr),
     ]
     if news_text:
         rows += ["━━━━━━━━━━━━━━━━━━━━", f"📰 <b>NEWS</b>\n{news_text}"]
-    rows += [
+    ai_args = (sym, ltp, rsi, macd, trend,
+               str(pe if pe is not None else "N/A"),
+               str(roe if roe is not None else "N/A"),
+               atr or 0.0, ind["levels"])
+    return "\n".join(rows), ai_args
+
+
+def _adv_ai_block(sym, ltp, rsi, macd, trend, pe, roe, atr, levels):
+    """
+    (block, ok): the advisory card's AI INSIGHTS section and disclaimer, and
+    whether the AI call produced fresh text (ai_insights marks failures and
+    stale fallbacks with a leading "⚠️").
+    """
+    try:
+        ai_text = engine_ai_insights(sym, ltp, rsi, macd, trend, pe, roe,
+                                     atr=atr, levels=levels) or ""
+        ok = bool(ai_text) and not ai_text.startswith("⚠️")
+    except Exception:
+        ai_text, ok = "AI insights unavailable.", False
+    block = "\n".join([
         "━━━━━━━━━━━━━━━━━━━━",
         f"🤖 <b>AI INSIGHTS</b>\n{ai_text}",
         "━━━━━━━━━━━━━━━━━━━━",
         "⚠️ <i>Educational only. Not SEBI-registered advice.</i>",
-    ]
-    return "\n".join(rows)
+    ])
+    return block, ok
 
 
 # ── Build Screener Card ──────────────────────────────────────────────────────
@@ -399,6 +616,26 @@ SCREENER_STOCKS = {
 }
 
 
+@dataclass(slots=True, frozen=True)
+class ScanRow:
+    """One screener line — slotted, immutable (no per-row dict)."""
+    sym: str
+    ltp: float
+    chg: float
+    rsi: float
+    trend: str
+    signal: str
+
+
+def shared_scan(key, fn, *args):
+    """
+    fn(*args) for a scan-style card that is identical for every user: served
+    from LIVE_CACHE for CACHE_TTL_SCAN seconds, and concurrent misses share one
+    run instead of each re-fetching every symbol. "❌ …" results aren't cached.
+    """
+    return LIVE_CACHE.get_or_compute(key, lambda: fn(*args), CACHE_TTL_SCAN, keep=_is_card)
+
+
 def build_scan(profile):
     syms = SCREENER_STOCKS.get(profile, [])
     if not syms:
@@ -406,41 +643,39 @@ def build_scan(profile):
     labels = {"conservative": "🏦 CONSERVATIVE", "moderate": "⚖️ MODERATE", "aggressive": "🚀 AGGRESSIVE"}
     lines = [f"📊 <b>{labels.get(profile, 'SCREENER')}</b>", f"📅 {date.today().strftime('%d-%b-%Y')}", "━━━━━━━━━━━━━━━━━━━━"]
 
+    # One batched download for the whole profile instead of N per-symbol round trips
+    frames = get_hist_batch(syms, "6mo")
+
     def _fetch(sym):
         try:
-            df = get_hist(sym, "6mo")
+            df = frames.get(sym)
             if df is None or df.empty or len(df) < 28:
                 return None
             c = df["Close"]
             ltp = round(float(c.iloc[-1]), 2)
             prev = float(c.iloc[-2])
             chg = round((ltp - prev) / prev * 100, 2) if prev > 0 else 0.0
-            rsi_val = calc_rsi(c)
-            trend_val = trend_label(c)
+            ind = _adv_indicators_cached(sym, df)
+            rsi_val = ind["rsi"]
+            trend_val = ind["trend"]
             signal_val = swing_signal(rsi_val, trend_val, chg)
-            return {"sym": sym, "ltp": ltp, "chg": chg, "rsi": rsi_val, "trend": trend_val, "signal": signal_val}
+            return ScanRow(sym, ltp, chg, rsi_val, trend_val, signal_val)
         except Exception:
             return None
 
     results = {}
-    with ThreadPoolExecutor(max_workers=10) as pool:
-        futs = {pool.submit(_fetch, s): s for s in syms}
-        for f in as_completed(futs, timeout=15):
-            sym = futs[f]
-            try:
-                r = f.result()
-                if r:
-                    results[sym] = r
-            except Exception:
-                pass
+    for sym in syms:
+        r = _fetch(sym)
+        if r:
+            results[sym] = r
 
     for s in syms:
         r = results.get(s)
         if not r:
             continue
-        icon = "🟢" if r["chg"] >= 0 else "🔴"
-        rsi_b = "🔴OB" if r["rsi"] > 70 else ("🟢OS" if r["rsi"] < 30 else "🟡")
-        lines.append(f"{icon} <b>{s}</b>  ₹{r['ltp']:,.2f} ({r['chg']:+.2f}%)\n   RSI:{r['rsi']} {rsi_b}  |  {r['trend']}  |  <b>{r['signal']}</b>")
+        icon = "🟢" if r.chg >= 0 else "🔴"
+        rsi_b = "🔴OB" if r.rsi > 70 else ("🟢OS" if r.rsi < 30 else "🟡")
+        lines.append(f"{icon} <b>{s}</b>  ₹{r.ltp:,.2f} ({r.chg:+.2f}%)\n   RSI:{r.rsi} {rsi_b}  |  {r.trend}  |  <b>{r.signal}</b>")
 
     if not results:
         lines.append("❌ Data unavailable.")
@@ -449,12 +684,32 @@ def build_scan(profile):
 
 
 # ── Build Market Breadth ─────────────────────────────────────────────────────
+def _index_history(tick):
+    try:
+        import yfinance as yf
+        return yf.Ticker(tick).history(period="1mo")
+    except Exception:
+        return None
+
+
 def build_breadth():
+    # Same card for every user; a 60s window turns concurrent taps into one fetch
+    return _breadth_card() or "❌ Index data unavailable."
+
+
+@cached(LIVE_CACHE, key=lambda: "breadth", ttl=CACHE_TTL_BREADTH)
+def _breadth_card():
     lines = ["📊 <b>MARKET BREADTH</b>", "━━━━━━━━━━━━━━━━━━━━"]
     indices = {"NIFTY 50": "^NSEI", "BANK NIFTY": "^NSEBANK", "NIFTY IT": "^CNXIT", "NIFTY MIDCAP": "^NSEMDCP50"}
+    # One multi-ticker download for all indices; per-ticker history only for
+    # gaps, fetched concurrently
+    frames = yfinance_download_batch(list(indices.values()), "1mo")
+    gaps = [t for t in indices.values() if frames.get(t) is None]
+    if gaps:
+        frames.update(zip(gaps, _price_pool.map(_index_history, gaps)))
     for name, tick in indices.items():
         try:
-            d = yf.Ticker(tick).history(period="1mo")
+            d = frames.get(tick)
             if d is None or len(d) < 5:
                 continue
             l = round(float(d["Close"].iloc[-1]), 2)
@@ -464,7 +719,7 @@ def build_breadth():
             lines.append(f"{icon} <b>{name}</b>: {l:,.2f} ({c:+.2f}%)")
         except Exception:
             pass
-    return "\n".join(lines) if len(lines) > 2 else "❌ Index data unavailable."
+    return "\n".join(lines) if len(lines) > 2 else ""
 
 
 # ── Build News ───────────────────────────────────────────────────────────────
@@ -474,10 +729,10 @@ _JUNK = ["Investing.com", "TradingView", "Yahoo Finance", "Stock Price", "NSE In
 def build_news():
     if TAVILY_KEY:
         try:
-            r = requests.post(
+            r = get_http_session().post(
                 "https://api.tavily.com/search",
                 json={"api_key": TAVILY_KEY, "query": "India NSE stock market news today", "max_results": 8},
-                timeout=10
+                timeout=TIMEOUT_TAVILY,
             )
             items = r.json().get("results", [])
             headlines = [
@@ -492,6 +747,13 @@ def build_news():
 
 
 # ── Build Portfolio Card ─────────────────────────────────────────────────────
+def _safe_live_price(sym):
+    try:
+        return get_live_price(sym)
+    except Exception:
+        return None
+
+
 def build_portfolio_card(uid):
     p = portfolio.get(uid)
     if not p:
@@ -503,13 +765,14 @@ def build_portfolio_card(uid):
     winners = []
     losers = []
 
+    # Quotes are independent network calls — fetch them concurrently
+    syms = list(p)
+    prices = dict(zip(syms, _price_pool.map(_safe_live_price, syms)))
+
     for sym, pos in p.items():
         qty, avg = pos["qty"], pos["avg"]
-        try:
-            ltp_raw = get_live_price(sym)
-            ltp = round(float(ltp_raw), 2) if ltp_raw is not None else avg
-        except Exception:
-            ltp = avg
+        ltp_raw = prices.get(sym)
+        ltp = round(float(ltp_raw), 2) if ltp_raw is not None else avg
 
         inv = qty * avg
         cur = qty * ltp
@@ -540,16 +803,18 @@ def build_portfolio_card(uid):
 
 
 # ── Keyboards ────────────────────────────────────────────────────────────────
-def main_keyboard():
+# Both keyboards are static: build and JSON-encode them once. telebot passes a
+# str reply_markup through as-is instead of re-serialising the markup per send.
+def _build_main_keyboard():
     kb = types.ReplyKeyboardMarkup(resize_keyboard=True, row_width=3)
     kb.add("🔍 Analysis", "📊 Breadth", "🤖 AI")
     kb.add("🏦 Conservative", "⚖️ Moderate", "🚀 Aggressive")
     kb.add("🎯 Swing (Safe)", "🚀 Swing (Agr)", "💼 Portfolio")
     kb.add("📰 News", "📈 Chart", "📋 Status")
-    return kb
+    return kb.to_json()
 
 
-def ai_keyboard():
+def _build_ai_keyboard():
     kb = types.ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
     topics = list(AI_CHAT_TOPICS.keys())
     for i in range(0, len(topics) - 1, 2):
@@ -557,10 +822,30 @@ def ai_keyboard():
     if len(topics) % 2 == 1:
         kb.add(topics[-1])
     kb.add("🔙 Menu")
-    return kb
+    return kb.to_json()
+
+
+_MAIN_KB = _build_main_keyboard()
+_AI_KB   = _build_ai_keyboard()
+
+
+def main_keyboard():
+    return _MAIN_KB
+
+
+def ai_keyboard():
+    return _AI_KB
 
 
 # ── Safe Sender ──────────────────────────────────────────────────────────────
+def _typing(chat_id):
+    """Show "typing…" while a slow reply is built; best-effort, never raises."""
+    try:
+        bot.send_chat_action(chat_id, "typing")
+    except Exception:
+        pass
+
+
 def safe_send(chat_id, text, parse_mode="HTML", **kwargs):
     if text is None:
         return
@@ -576,24 +861,96 @@ def safe_send(chat_id, text, parse_mode="HTML", **kwargs):
                 pass
 
 
+def split_for_telegram(text, limit=TG_CHUNK_SIZE):
+    """
+    Split text into ≤limit-char chunks on line boundaries (a single over-long
+    line is hard-sliced). Lines are collected in a list and joined once per
+    chunk — linear, unlike repeated `chunk += line`.
+    """
+    if len(text) <= limit:
+        return [text]
+    chunks, buf, size = [], [], 0
+    for line in text.split("\n"):
+        if len(line) + 1 > limit:
+            if buf:
+                chunks.append("\n".join(buf))
+                buf, size = [], 0
+            chunks.extend(line[i:i + limit] for i in range(0, len(line), limit))
+            continue
+        if size + len(line) + 1 > limit:
+            chunks.append("\n".join(buf))
+            buf, size = [], 0
+        buf.append(line)
+        size += len(line) + 1
+    if buf and "".join(buf).strip():
+        chunks.append("\n".join(buf))
+    return chunks
+
+
+# ── Streamed Replies ─────────────────────────────────────────────────────────
+def _live_editor(chat_id, message_id):
+    """
+    on_chunk callback that edits a placeholder message with the partial AI
+    reply at most every TG_STREAM_EDIT_SEC. Partials go out as plain text —
+    half-received HTML tags would be rejected by Telegram.
+    """
+    last = [0.0]
+
+    def on_chunk(text):
+        now = time.time()
+        if now - last[0] < TG_STREAM_EDIT_SEC or len(text) > TG_CHUNK_SIZE:
+            return
+        last[0] = now
+        bot.edit_message_text(text + " ▌", chat_id, message_id)
+
+    return on_chunk
+
+
+def finish_live_reply(chat_id, message_id, text, **kwargs):
+    """
+    Replace the streamed placeholder with the final HTML text, or send it fresh
+    if the edit fails. edit_message_text can't attach a reply keyboard, so with
+    kwargs (reply_markup=…) the placeholder is deleted and the text re-sent.
+    """
+    if message_id is not None and not kwargs and len(text) <= TG_CHUNK_SIZE:
+        try:
+            bot.edit_message_text(text, chat_id, message_id, parse_mode="HTML")
+            return
+        except Exception:
+            pass
+    if message_id is not None:
+        try:
+            bot.delete_message(chat_id, message_id)
+        except Exception:
+            pass
+    for part in split_for_telegram(text):
+        safe_send(chat_id, part, **kwargs)
+
+
 # ── Command Handlers ─────────────────────────────────────────────────────────
+_START_TEXT = "👋 <b>AutoAI Advisory Bot v6.1</b>\n\nType any stock name or symbol for analysis.\nUse menu buttons below."
+_HELP_TEXT = (
+    "📖 <b>Help</b>\n\nType symbol: <code>RELIANCE</code>\nChart: <code>/chart INFY 3mo</code>\n"
+    "Buy: <code>/buy RELIANCE 10 2500</code>\nSell: <code>/sell RELIANCE</code>\nAI: Tap 🤖 AI\n"
+    "Status: <code>/status</code>"
+)
+
 @bot.message_handler(commands=["start"])
 def cmd_start(m):
     state.clear(m.chat.id)
-    safe_send(m.chat.id,
-              "👋 <b>AutoAI Advisory Bot v6.1</b>\n\nType any stock name or symbol for analysis.\nUse menu buttons below.",
-              reply_markup=main_keyboard())
+    safe_send(m.chat.id, _START_TEXT, reply_markup=main_keyboard())
 
 
 @bot.message_handler(commands=["help"])
 def cmd_help(m):
-    safe_send(m.chat.id,
-              "📖 <b>Help</b>\n\nType symbol: <code>RELIANCE</code>\nChart: <code>/chart INFY 3mo</code>\nBuy: <code>/buy RELIANCE 10 2500</code>\nSell: <code>/sell RELIANCE</code>\nAI: Tap 🤖 AI\nStatus: <code>/status</code>")
+    safe_send(m.chat.id, _HELP_TEXT)
 
 
 @bot.message_handler(commands=["status"])
 def cmd_status(m):
     cid = m.chat.id
+    if chat_busy(cid):
+        return
     safe_send(cid, "⏳ Checking status…")
 
     def _run(chat_id=cid):
@@ -615,7 +972,7 @@ def cmd_status(m):
             logger.error(f"Status err: {e}", exc_info=True)
             safe_send(chat_id, f"❌ Status check failed: {e}")
 
-    executor.submit(_run)
+    submit_for_chat(m.chat.id, _run)
 
 
 @bot.message_handler(commands=["chart"])
@@ -631,6 +988,8 @@ def cmd_chart(m):
         per = parts[-1]
         raw_q = " ".join(parts[1:-1])
 
+    if chat_busy(m.chat.id):
+        return
     safe_send(m.chat.id, f"🔍 Looking up <b>{raw_q}</b>…")
 
     def _run(chat_id=m.chat.id, query=raw_q, period=per):
@@ -649,16 +1008,17 @@ def cmd_chart(m):
                     bot.send_photo(chat_id, f, caption=f"<b>📈 {cname}</b>\n\n{meta}", parse_mode="HTML")
             else:
                 safe_send(chat_id, "⚠️ Chart failed, sending text:")
-                safe_send(chat_id, build_adv(sym))
+                send_adv(chat_id, sym)
         except Exception as e:
             logger.error(f"Chart err: {e}", exc_info=True)
             safe_send(chat_id, f"❌ Error: {e}")
 
-    executor.submit(_run)
+    submit_for_chat(m.chat.id, _run)
 
 
-@bot.message_handler(func=lambda m: m.text == "📈 Chart")
 def chart_button(m):
+    if chat_busy(m.chat.id):
+        return
     safe_send(m.chat.id, "📈 Scanning Nifty 250 for best crossover… (~30s)")
 
     def _run(chat_id=m.chat.id):
@@ -676,7 +1036,7 @@ def chart_button(m):
             logger.error(f"Auto chart err: {e}", exc_info=True)
             safe_send(chat_id, f"❌ Error: {e}")
 
-    executor.submit(_run)
+    submit_for_chat(m.chat.id, _run)
 
 
 @bot.message_handler(commands=["buy"])
@@ -715,6 +1075,8 @@ def cmd_sell(m):
 
 @bot.message_handler(commands=["portfolio"])
 def cmd_portfolio(m):
+    if chat_busy(m.chat.id):
+        return
     safe_send(m.chat.id, "⏳ Loading…")
 
     def _run(chat_id=m.chat.id):
@@ -724,7 +1086,7 @@ def cmd_portfolio(m):
             logger.error(f"Portfolio err: {e}", exc_info=True)
             safe_send(chat_id, f"❌ Error: {e}")
 
-    executor.submit(_run)
+    submit_for_chat(m.chat.id, _run)
 
 
 @bot.message_handler(commands=["clear"])
@@ -738,29 +1100,24 @@ def cmd_clear(m):
 
 
 # ── Button Handlers ──────────────────────────────────────────────────────────
-@bot.message_handler(func=lambda m: m.text == "🔙 Menu")
 def back_menu(m):
     state.clear(m.chat.id)
     safe_send(m.chat.id, "📋 Menu", reply_markup=main_keyboard())
 
 
-@bot.message_handler(func=lambda m: m.text == "💼 Portfolio")
 def port_btn(m):
     cmd_portfolio(m)
 
 
-@bot.message_handler(func=lambda m: m.text == "📋 Status")
 def stat_btn(m):
     cmd_status(m)
 
 
-@bot.message_handler(func=lambda m: m.text == "🤖 AI")
 def ai_btn(m):
     state.set(m.chat.id, "ai")
     safe_send(m.chat.id, "🤖 <b>AI Mode</b>\n\nAsk about markets/stocks.", reply_markup=ai_keyboard())
 
 
-@bot.message_handler(func=lambda m: m.text in AI_CHAT_TOPIC_KEYS)
 def ai_topic(m):
     uid = m.chat.id
     if m.text == "🔍 Stock Analysis":
@@ -768,36 +1125,47 @@ def ai_topic(m):
         safe_send(uid, "🔍 Type stock name to analyze.", reply_markup=ai_keyboard())
         return
     tp = AI_CHAT_TOPICS.get(m.text, "")
-    safe_send(uid, "⏳ Fetching…")
+    if chat_busy(uid):
+        return
+    # Same streamed placeholder as free-form chat — first tokens show in ~1s
+    msg_id = None
+    try:
+        msg_id = bot.send_message(uid, "⏳ Fetching…").message_id
+    except Exception:
+        pass
 
-    def _run(chat_id=uid, topic_prompt=tp):
+    def _run(chat_id=uid, topic_prompt=tp, mid=msg_id):
+        on_chunk = _live_editor(chat_id, mid) if mid is not None else None
         try:
-            resp = ai_topic_respond(topic_prompt)
-            safe_send(chat_id, resp or "⚠️ AI unavailable.", reply_markup=ai_keyboard())
+            resp = ai_topic_respond(topic_prompt, on_chunk=on_chunk)
+            finish_live_reply(chat_id, mid, resp or "⚠️ AI unavailable.", reply_markup=ai_keyboard())
         except Exception as e:
             logger.error(f"Topic err: {e}", exc_info=True)
-            safe_send(chat_id, "⚠️ Error.", reply_markup=ai_keyboard())
+            finish_live_reply(chat_id, mid, "⚠️ Error.", reply_markup=ai_keyboard())
 
-    executor.submit(_run)
+    if not submit_for_chat(uid, _run):
+        _drop_placeholder(uid, msg_id)
 
 
-@bot.message_handler(func=lambda m: m.text in ["🏦 Conservative", "⚖️ Moderate", "🚀 Aggressive"])
 def scan_btn(m):
     p = {"🏦 Conservative": "conservative", "⚖️ Moderate": "moderate", "🚀 Aggressive": "aggressive"}[m.text]
+    if chat_busy(m.chat.id):
+        return
     safe_send(m.chat.id, f"⏳ Scanning {m.text}…")
 
     def _run(chat_id=m.chat.id, prof=p):
         try:
-            safe_send(chat_id, build_scan(prof))
+            safe_send(chat_id, shared_scan(f"scan:{prof}", build_scan, prof))
         except Exception as e:
             logger.error(f"Screener err: {e}", exc_info=True)
             safe_send(chat_id, f"❌ Error: {e}")
 
-    executor.submit(_run)
+    submit_for_chat(m.chat.id, _run)
 
 
-@bot.message_handler(func=lambda m: m.text == "📊 Breadth")
 def breadth_btn(m):
+    if chat_busy(m.chat.id):
+        return
     safe_send(m.chat.id, "⏳ Fetching…")
 
     def _run(chat_id=m.chat.id):
@@ -807,12 +1175,13 @@ def breadth_btn(m):
             logger.error(f"Breadth err: {e}", exc_info=True)
             safe_send(chat_id, f"❌ Error: {e}")
 
-    executor.submit(_run)
+    submit_for_chat(m.chat.id, _run)
 
 
-@bot.message_handler(func=lambda m: m.text in ["🎯 Swing (Safe)", "🚀 Swing (Agr)"])
 def swing_btn(m):
     mode = "conservative" if "Safe" in m.text else "aggressive"
+    if chat_busy(m.chat.id):
+        return
     safe_send(m.chat.id, f"⏳ Swing scanning… (~25s)")
 
     def _ping(chat_id=m.chat.id):
@@ -826,27 +1195,18 @@ def swing_btn(m):
 
     def _run(chat_id=m.chat.id, md=mode):
         try:
-            res = get_swing_trades(mode=md)
-            if len(res) <= 3800:
-                safe_send(chat_id, res)
-            else:
-                chunk = ""
-                for line in res.split("\n"):
-                    if len(chunk) + len(line) + 1 > 3800:
-                        safe_send(chat_id, chunk)
-                        chunk = ""
-                    chunk += line + "\n"
-                if chunk.strip():
-                    safe_send(chat_id, chunk)
+            for part in split_for_telegram(shared_scan(f"swing:{md}", get_swing_trades, md)):
+                safe_send(chat_id, part)
         except Exception as e:
             logger.error(f"Swing err: {e}", exc_info=True)
             safe_send(chat_id, f"❌ Error: {e}")
 
-    executor.submit(_run)
+    submit_for_chat(m.chat.id, _run)
 
 
-@bot.message_handler(func=lambda m: m.text == "📰 News")
 def news_btn(m):
+    if chat_busy(m.chat.id):
+        return
     safe_send(m.chat.id, "⏳ Fetching…")
 
     def _run(chat_id=m.chat.id):
@@ -856,15 +1216,40 @@ def news_btn(m):
             logger.error(f"News err: {e}", exc_info=True)
             safe_send(chat_id, f"❌ Error: {e}")
 
-    executor.submit(_run)
+    submit_for_chat(m.chat.id, _run)
 
 
-@bot.message_handler(func=lambda m: m.text == "🔍 Analysis")
 def analysis_btn(m):
     state.set(m.chat.id, "analysis")
     safe_send(m.chat.id, "🔍 Type any stock name or symbol:")
 
 
+# ── Menu dispatch ─────────────────────────────────────────────────────────────
+# One registered handler + one dict lookup per update, instead of telebot
+# evaluating a func=lambda filter per button on every message.
+MENU = {k: ai_topic for k in AI_CHAT_TOPIC_KEYS}
+MENU.update({
+    "📈 Chart":        chart_button,
+    "🔙 Menu":         back_menu,
+    "💼 Portfolio":    port_btn,
+    "📋 Status":       stat_btn,
+    "🤖 AI":           ai_btn,
+    "🏦 Conservative": scan_btn,
+    "⚖️ Moderate":     scan_btn,
+    "🚀 Aggressive":   scan_btn,
+    "📊 Breadth":      breadth_btn,
+    "🎯 Swing (Safe)": swing_btn,
+    "🚀 Swing (Agr)":  swing_btn,
+    "📰 News":         news_btn,
+    "🔍 Analysis":     analysis_btn,
+})
+
+
+@bot.message_handler(func=lambda m: m.text in MENU)
+def menu_dispatch(m):
+    MENU[m.text](m)
+
+
 # ── Catch-all Text Handler ───────────────────────────────────────────────────
 @bot.message_handler(func=lambda m: True, content_types=["text"])
 def handle_text(m):
@@ -876,24 +1261,33 @@ def handle_text(m):
         return
 
     if state.get(uid) == "ai":
-        safe_send(uid, "⏳ Thinking…")
+        if chat_busy(uid):
+            return
+        # The placeholder is edited in place as the reply streams in
+        msg_id = None
         try:
+            msg_id = bot.send_message(uid, "⏳ Thinking…").message_id
             bot.send_chat_action(uid, "typing")
         except Exception:
             pass
 
-        def _ai(chat_id=uid, t=text):
+        def _ai(chat_id=uid, t=text, mid=msg_id):
+            on_chunk = _live_editor(chat_id, mid) if mid is not None else None
             try:
-                resp = ai_chat_respond(chat_id, t)
-                safe_send(chat_id, resp or "⚠️ AI unavailable.", reply_markup=ai_keyboard())
+                resp = ai_chat_respond(chat_id, t, on_chunk=on_chunk)
+                finish_live_reply(chat_id, mid, resp or "⚠️ AI unavailable.", reply_markup=ai_keyboard())
             except Exception as e:
                 logger.error(f"AI err: {e}", exc_info=True)
-                safe_send(chat_id, "⚠️ AI error.", reply_markup=ai_keyboard())
+                finish_live_reply(chat_id, mid, "⚠️ AI error.", reply_markup=ai_keyboard())
 
-        executor.submit(_ai)
+        if not submit_for_chat(uid, _ai):
+            _drop_placeholder(uid, msg_id)
         return
 
     if state.get(uid) == "analysis":
+        if chat_busy(uid):
+            state.clear(uid)
+            return
         safe_send(uid, f"🔍 Looking up <b>{text}</b>…")
 
         def _arun(chat_id=uid, q=text):
@@ -901,9 +1295,9 @@ def handle_text(m):
                 ticker, cname = resolve_symbol(q)
                 if ticker:
                     safe_send(chat_id, f"📊 Analyzing <b>{cname}</b>…")
-                    safe_send(chat_id, build_adv(ticker.replace(".NS", "")))
+                    send_adv(chat_id, ticker.replace(".NS", ""))
                 elif 2 <= len(q.upper().replace(".NS", "")) <= 15:
-                    safe_send(chat_id, build_adv(q))
+                    send_adv(chat_id, q)
                 else:
                     safe_send(chat_id, f"❌ Not found: <b>{q}</b>", reply_markup=main_keyboard())
             except Exception as e:
@@ -912,7 +1306,8 @@ def handle_text(m):
             finally:
                 state.clear(chat_id)
 
-        executor.submit(_arun)
+        if not submit_for_chat(uid, _arun):
+            state.clear(uid)
         return
 
     raw_up = text.upper().replace(".NS", "").replace(".BO", "")
@@ -920,6 +1315,8 @@ def handle_text(m):
     looks_name = " " in text or len(raw_up) > 12
 
     if looks_ticker or looks_name:
+        if chat_busy(uid):
+            return
         safe_send(uid, f"🔍 Looking up <b>{text}</b>…")
 
         def _adv(chat_id=uid, q=text):
@@ -927,16 +1324,16 @@ def handle_text(m):
                 ticker, cname = resolve_symbol(q)
                 if ticker:
                     safe_send(chat_id, f"📊 Analyzing <b>{cname}</b>…")
-                    safe_send(chat_id, build_adv(ticker.replace(".NS", "")))
+                    send_adv(chat_id, ticker.replace(".NS", ""))
                 elif 2 <= len(q.upper().replace(".NS", "")) <= 15:
-                    safe_send(chat_id, build_adv(q))
+                    send_adv(chat_id, q)
                 else:
                     safe_send(chat_id, f"❌ Not found: <b>{q}</b>")
             except Exception as e:
                 logger.error(f"Adv err: {e}", exc_info=True)
                 safe_send(chat_id, "⚠️ Error. Try again.")
 
-        executor.submit(_adv)
+        submit_for_chat(uid, _adv)
     else:
         if text.lower().strip("!.?") in {"hi", "hello", "hey", "hlo", "hii", "gm"}:
             safe_send(uid, "👋 Hello! Type a stock name to analyze.", reply_markup=main_keyboard())
@@ -945,9 +1342,13 @@ def handle_text(m):
 
 
 # ── Flask Webhook Routes ─────────────────────────────────────────────────────
+# Render probes "/" constantly — serialise its constant body once, not per hit
+_INDEX_BODY = json.dumps({"status": "ok", "version": "6.1_zero_error"}).encode()
+
+
 @app.route("/", methods=["GET"])
 def index():
-    return jsonify({"status": "ok", "version": "6.1_zero_error"})
+    return app.response_class(_INDEX_BODY, mimetype="application/json")
 
 
 @app.route("/api/status", methods=["GET"])
@@ -955,9 +1356,9 @@ def api_status():
     return jsonify({"bot": "running", "ai": "available" if ai_available() else "no keys"})
 
 
-def _process_webhook(data_str):
+def _process_webhook(payload):
     try:
-        update = telebot.types.Update.de_json(data_str)
+        update = telebot.types.Update.de_json(payload)
         if update:
             bot.process_new_updates([update])
     except Exception as e:
@@ -966,27 +1367,62 @@ def _process_webhook(data_str):
 
 @app.route(WEBHOOK_PATH, methods=["POST"])
 def webhook():
-    data = request.get_data(as_text=True)
-    try:
-        payload = json.loads(data)
-        uid = payload.get("update_id")
-        if uid is not None:
-            if uid in _processed_updates:
-                return "ok", 200
-            _processed_updates.append(uid)
-    except (json.JSONDecodeError, TypeError):
-        pass
-    executor.submit(_process_webhook, data)
+    # Reject pushes that don't carry the secret registered with set_webhook
+    if WEBHOOK_SECRET and not hmac.compare_digest(
+            request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), WEBHOOK_SECRET):
+        return "forbidden", 403
+    # Parse the body once here and hand the dict on — de_json accepts it as-is
+    payload = request.get_json(force=True, silent=True)
+    if not isinstance(payload, dict):
+        return "ok", 200
+    uid = payload.get("update_id")
+    if uid is not None:
+        if uid in _processed_updates:
+            return "ok", 200
+        _processed_updates.append(uid)
+    # Inline, not via `executor`: with threaded=True process_new_updates only
+    # builds the Update and hands handlers to telebot's pool, and the handlers
+    # push their slow work onto the per-chat queues — an extra hop here just
+    # made updates wait behind analysis jobs in the shared pool.
+    _process_webhook(payload)
     return "ok", 200
 
 
 # ── Runner ───────────────────────────────────────────────────────────────────
 if __name__ == "__main__":
     logger.info("🚀 Starting AutoAI Bot v6.1 Zero-Error Build...")
+    # Nothing slow sits between boot and serving: the numba warm-up (started at
+    # import) keeps compiling in the background — a request that needs a kernel
+    # meanwhile just joins that compile — and the swing prefetch is a daemon.
+    start_prefetch_thread()
     if WEBHOOK_URL:
-        bot.set_webhook(url=f"{WEBHOOK_URL}{WEBHOOK_PATH}")
+        # set_webhook replaces any previous registration — no remove_webhook trip
+        bot.set_webhook(
+            url=f"{WEBHOOK_URL}{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET or None,
+            allowed_updates=TG_ALLOWED_UPDATES,
+            max_connections=TG_HANDLER_THREADS,
+        )
         logger.info(f"Webhook active: {WEBHOOK_URL}{WEBHOOK_PATH}")
-        app.run(host="0.0.0.0", port=int(os.getenv("PORT", 5000)))
+        # threaded=True: a slow webhook/status request never blocks Render's "/" probe
+        app.run(host="0.0.0.0", port=int(os.getenv("PORT", 5000)), threaded=True)
     else:
         logger.info("Running in polling mode...")
-        bot.infinity_polling()
+        # A stale webhook makes getUpdates fail with 409 — clear it first
+        try:
+            bot.remove_webhook()
+        except Exception as e:
+            logger.warning(f"remove_webhook failed: {e}")
+        # FIX: polling mode bound no port, so Render's web-service health check
+        # failed and restarted the dyno. Serve the Flask routes alongside polling.
+        threading.Thread(
+            target=app.run, name="health-http", daemon=True,
+            kwargs={"host": "0.0.0.0", "port": int(os.getenv("PORT", 5000)),
+                    "threaded": True, "use_reloader": False},
+        ).start()
+        # Long-poll near Telegram's cap: an idle bot makes one getUpdates every
+        # ~50s instead of every 20s, over a kept-alive session.
+        bot.infinity_polling(
+            skip_pending=True, timeout=30, long_polling_timeout=TG_LONG_POLL_SEC,
+            allowed_updates=TG_ALLOWED_UPDATES,
+        )
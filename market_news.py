@@ -15,6 +15,9 @@ import logging
 import requests
 from datetime import date, timedelta
 
+from api_utils import NEWS_CACHE, cached, get_http_session
+from config import CACHE_TTL_STOCK_NEWS
+
 logger = logging.getLogger(__name__)
 
 _JUNK_PATTERNS = [
@@ -62,7 +65,7 @@ def _fetch_tavily(query: str, n: int = 6) -> list:
     if not key:
         return []
     try:
-        resp = requests.post(
+        resp = get_http_session().post(
             "https://api.tavily.com/search",
             json={"api_key": key, "query": query, "max_results": n,
                   "search_depth": "advanced", "include_domains": _FINANCIAL_DOMAINS},
@@ -86,7 +89,7 @@ def _fetch_tavily(query: str, n: int = 6) -> list:
 def _fetch_rss(url: str) -> list:
     """FIX 6.0: Multi-format parser — CDATA → plain title → description fallback"""
     try:
-        resp = requests.get(url, headers={"User-Agent": "Mozilla/5.0"}, timeout=TIMEOUT_RSS)
+        resp = get_http_session().get(url, headers={"User-Agent": "Mozilla/5.0"}, timeout=TIMEOUT_RSS)
         if resp.status_code == 429:
             logger.warning(f"RSS rate limited: {url}")
             return []
@@ -142,7 +145,7 @@ def get_market_news(n: int = 5) -> str:
         av_key = os.getenv("ALPHA_VANTAGE_KEY", "").strip()
         if av_key:
             try:
-                r = requests.get(
+                r = get_http_session().get(
                     "https://www.alphavantage.co/query",
                     params={"function": "NEWS_SENTIMENT", "topics": "financial_markets",
                             "limit": n + 3, "apikey": av_key},
@@ -166,6 +169,7 @@ def get_market_news(n: int = 5) -> str:
     return result
 
 
+@cached(NEWS_CACHE, key=lambda symbol, n=2: f"stock_news:{symbol.upper()}:{n}", ttl=CACHE_TTL_STOCK_NEWS)
 def get_stock_news(symbol: str, n: int = 2) -> str:
     """Per-stock news. Tavily → Finnhub → MoneyControl RSS → static fallback."""
     headlines = []
@@ -183,7 +187,7 @@ def get_stock_news(symbol: str, n: int = 2) -> str:
         fh_key = os.getenv("FINNHUB_API_KEY", "").strip()
         if fh_key:
             try:
-                r = requests.get(
+                r = get_http_session().get(
                     "https://finnhub.io/api/v1/company-news",
                     params={"symbol": f"NSE:{symbol}", "from": from_date,
                             "to": to_date, "token": fh_key},
@@ -131,6 +131,12 @@ SECTOR_STOCKS: Dict[str, List[str]] = {
     ],
 }
 
+# symbol → sector, built once; first sector wins as in the old list scan
+SYMBOL_SECTOR: Dict[str, str] = {}
+for _sector, _stocks in SECTOR_STOCKS.items():
+    for _sym in _stocks:
+        SYMBOL_SECTOR.setdefault(_sym, _sector)
+
 PAGE_SIZE = 20
 MAX_STOCKS_PER_MESSAGE = 40   # Tighter limit — Telegram 4096 char max
 
@@ -220,6 +226,8 @@ def fetch_fundamentals_batch(symbols: List[str], batch_size: int = 30) -> Dict[s
     """
     Fetch fundamentals for multiple symbols with rate-limit-safe batching.
     FIX: batch_size reduced 50→30 (safer for Yahoo rate limits).
+    Pacing comes from data_engine's Yahoo token bucket inside batch_quotes,
+    so there is no fixed pause between batches.
     """
     from data_engine import batch_quotes
 
@@ -269,9 +277,6 @@ def fetch_fundamentals_batch(symbols: List[str], batch_size: int = 30) -> Dict[s
         except Exception as e:
             logger.error(f"[Batch {batch_num}] Failed: {e}")
 
-        if i + batch_size < total:
-            time.sleep(2)   # rate-limit pause between batches
-
     logger.info(f"[Complete] Fetched {len(results)}/{total} stocks")
     return results
 
@@ -326,10 +331,7 @@ def load_fundamentals() -> Dict[str, Dict]:
 
 
 def get_stock_sector(symbol: str) -> str:
-    for sector, stocks in SECTOR_STOCKS.items():
-        if symbol in stocks:
-            return sector
-    return "📦 Others"
+    return SYMBOL_SECTOR.get(symbol, "📦 Others")
 
 
 # ── Pagination & Filtering ─────────────────────────────────────────────────────
@@ -10,25 +10,26 @@ Team Sprint Upgrades:
   7. Rich trade card with sector, weekly trend, ATR-based levels
 """
 
-import os, logging
+import os, logging, threading, time
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from datetime import date
 import pandas as pd
 
 logger = logging.getLogger(__name__)
 
-from data_engine import get_hist
+from api_utils import TTLCache, nse_closed_session
+from data_engine import get_hist, get_hist_batch, wait_for_rate_slot, yahoo_v8_hist
+from indicator_kernels import as_f64, ema_last, ema_multi_last, supertrend_dir
 from technical_indicators import (
-    calc_rsi, calc_ema, calc_macd, calc_atr, calc_adx, calc_bollinger,
-    ema_series, rsi_series,
+    calc_ema, calc_atr, swing_indicators,
 )
-from config import RSI_PERIOD, ADX_PERIOD, ATR_PERIOD, HIST_PERIOD_SWING, TG_CHUNK_SIZE
+from config import ATR_PERIOD, HIST_PERIOD_SWING, TG_CHUNK_SIZE, SWING_SCAN_WORKERS, SWING_PREFETCH_SEC, TTL_CACHE_MAX
 
-try:
-    import yfinance as yf
-    _YF_AVAILABLE = True
-except ImportError:
-    _YF_AVAILABLE = False
+# yfinance is heavy to import and only the weekly / sector lookups need it —
+# check it's installed now, import it on first use
+_YF_AVAILABLE = importlib.util.find_spec("yfinance") is not None
 
 
 # ── CANDIDATE UNIVERSE ────────────────────────────────────────────────────────
@@ -70,32 +71,20 @@ def safe_history(ticker, period="6mo", interval="1d"):
 def calc_supertrend(df, period=7, multiplier=3):
     """Returns last Supertrend direction: +1 bullish, -1 bearish"""
     try:
-        h, l, c = df["High"].values, df["Low"].values, df["Close"].values
+        c = as_f64(df["Close"])
         if len(c) < period + 2:
             return 0
-        tr = np.maximum(h[1:]-l[1:], np.maximum(np.abs(h[1:]-c[:-1]), np.abs(l[1:]-c[:-1])))
-        atr = pd.Series(tr).rolling(period).mean().values
-        hl2 = (h[1:] + l[1:]) / 2
-        upper = hl2 + multiplier * atr
-        lower = hl2 - multiplier * atr
-        close = c[1:]
-        direction = np.ones(len(close))
-        for i in range(1, len(close)):
-            if close[i] > upper[i-1]:
-                direction[i] = 1
-            elif close[i] < lower[i-1]:
-                direction[i] = -1
-            else:
-                direction[i] = direction[i-1]
-        return int(direction[-1])
+        return int(supertrend_dir(as_f64(df["High"]), as_f64(df["Low"]), c, period, float(multiplier)))
     except Exception:
         return 0
 
 
 # ── WEEKLY TREND CHECK ────────────────────────────────────────────────────────
 # Cache weekly trend per symbol to avoid 60+ extra yfinance calls per scan
-_WEEKLY_CACHE: dict = {}
 _WEEKLY_CACHE_TTL = 3600   # 1 hour
+# Locked + LRU-bounded: scan workers read/write it concurrently
+_WEEKLY_CACHE     = TTLCache(default_ttl=_WEEKLY_CACHE_TTL, maxsize=TTL_CACHE_MAX)
+_WEEKLY_ALPHAS    = np.array([2.0 / 10, 2.0 / 22])   # weekly EMA9 / EMA21, one pass
 
 def get_weekly_trend(sym):
     """
@@ -105,33 +94,35 @@ def get_weekly_trend(sym):
        0 = sideways / no data
     Fix 7: cache results per symbol — prevents 60 extra yfinance calls per swing scan.
     """
-    import time as _t
     cached = _WEEKLY_CACHE.get(sym)
-    if cached and _t.time() - cached["ts"] < _WEEKLY_CACHE_TTL:
-        return cached["val"]
+    if cached is not None:
+        return cached
     try:
-        if not _YF_AVAILABLE:
-            return 0, "Weekly: N/A"
-        wdf = yf.download(sym, period="6mo", interval="1wk",
-                          progress=False, auto_adjust=True)
-        if isinstance(wdf.columns, pd.MultiIndex):
-            wdf.columns = wdf.columns.get_level_values(0)
-        wdf = wdf.dropna(subset=["Close"])
+        # Yahoo's v8 chart JSON over the shared keep-alive session first (no
+        # yfinance Session/crumb setup, arrays parsed straight into NumPy)
+        wdf = yahoo_v8_hist(sym, period="6mo", interval="1wk")
+        if wdf is None or wdf.empty:
+            if not _YF_AVAILABLE:
+                return 0, "Weekly: N/A"
+            import yfinance as yf
+            # Ticker.history, not yf.download: scans call this from worker threads
+            # and download() shares module-level state between concurrent calls
+            wdf = yf.Ticker(sym).history(period="6mo", interval="1wk", auto_adjust=True)
+            if isinstance(wdf.columns, pd.MultiIndex):
+                wdf.columns = wdf.columns.get_level_values(0)
+            wdf = wdf.dropna(subset=["Close"])
         if len(wdf) < 10:
             return 0, "Weekly: Insufficient data"
-        wc    = wdf["Close"]
-        we9   = wc.ewm(span=9,  adjust=False).mean()
-        we21  = wc.ewm(span=21, adjust=False).mean()
-        wltp  = float(wc.iloc[-1])
-        we9l  = float(we9.iloc[-1])
-        we21l = float(we21.iloc[-1])
+        wc    = as_f64(wdf["Close"])
+        wltp  = float(wc[-1])
+        we9l, we21l = (float(v) for v in ema_multi_last(wc, _WEEKLY_ALPHAS))
         if wltp > we9l > we21l:
             result = +2, "Weekly BULLISH ✓"
         elif wltp < we9l < we21l:
             result = -2, "Weekly BEARISH ✓"
         else:
             result = 0, "Weekly SIDEWAYS"
-        _WEEKLY_CACHE[sym] = {"val": result, "ts": _t.time()}
+        _WEEKLY_CACHE.set(sym, result)
         return result
     except Exception as e:
         logger.debug(f"weekly trend {sym}: {e}")
@@ -158,13 +149,16 @@ def get_sector_bias(sector):
     if not etf or not _YF_AVAILABLE:
         return f"Sector: {sector}"
     try:
+        wait_for_rate_slot()     # shares data_engine's Yahoo budget
+        import yfinance as yf
         sd = yf.download(etf, period="1mo", interval="1d", progress=False, auto_adjust=True)
-        if sd.empty or len(sd) < 5:
+        if isinstance(sd.columns, pd.MultiIndex):
+            sd.columns = sd.columns.get_level_values(0)
+        sc = as_f64(sd["Close"].dropna()) if not sd.empty else np.empty(0)
+        if len(sc) < 5:
             return f"Sector: {sector}"
-        sc    = sd["Close"]
-        se9   = sc.ewm(span=9, adjust=False).mean()
-        sltp  = float(sc.iloc[-1])
-        se9l  = float(se9.iloc[-1])
+        sltp  = float(sc[-1])
+        se9l  = float(ema_last(sc, 2.0 / 10))
         icon  = "↑" if sltp > se9l else "↓"
         return f"Sector {sector}: {icon} {'Bullish' if sltp>se9l else 'Bearish'}"
     except Exception:
@@ -177,48 +171,53 @@ def swing_score(df, side="LONG", sym=None):
     10-check weighted swing scoring. Max ~13 pts.
     Min gate: LONG ≥6, SHORT ≥5.
     """
-    if df.empty or len(df) < 50:
+    feats = swing_features(df, sym)
+    if feats is None:
         return {"score": 0, "details": [], "ltp": None}
+    return score_side(feats, side)
+
+
+def swing_features(df, sym=None):
+    """
+    Everything swing scoring reads from df (and the weekly trend if sym is
+    given), computed once so LONG, SHORT and the watch list all score from the
+    same pass. Returns None when history is too short (<50 bars).
+    """
+    if df.empty or len(df) < 50:
+        return None
 
     close   = df["Close"]
-    ltp     = float(close.iloc[-1])
-    n       = len(close)
-
-    ema50   = float(ema_series(close, min(50,  n-1)).iloc[-1])
-    ema200  = float(ema_series(close, min(200, n-1)).iloc[-1])
-    bb_mid, bb_upper, bb_lower = calc_bollinger(close, 20, 2)
-    adx_last, plus_di, minus_di = calc_adx(df, ADX_PERIOD)
-    rsi_val = calc_rsi(close, RSI_PERIOD)
-    macd_last, signal_last, hist_last = calc_macd(close)
-    vol_avg  = float(df["Volume"].rolling(20).mean().iloc[-1])
-    vol_last = float(df["Volume"].iloc[-1])
-    recent_high = float(close.rolling(20).max().iloc[-1])
-    recent_low  = float(close.rolling(20).min().iloc[-1])
-
-    h, l, c = df["High"], df["Low"], df["Close"]
-    tr      = pd.concat([(h-l),(h-c.shift()).abs(),(l-c.shift()).abs()], axis=1).max(axis=1)
-    atr_val = float(tr.rolling(14).mean().iloc[-1])
-
-    # RSI momentum (slope)
-    rsi_arr   = rsi_series(close, RSI_PERIOD).values
-    rsi_slope = float(rsi_arr[-1] - rsi_arr[-3]) if len(rsi_arr) >= 3 else 0
-
-    # MACD histogram slope
-    try:
-        from technical_indicators import calc_macd as _cm
-        _m, _s, _h = _cm(close)
-    except Exception:
-        _h = hist_last
-    hist_vals = []
-    try:
-        ema12 = close.ewm(span=12, adjust=False).mean()
-        ema26 = close.ewm(span=26, adjust=False).mean()
-        macd_s = ema12 - ema26
-        sig_s  = macd_s.ewm(span=9, adjust=False).mean()
-        hist_s = (macd_s - sig_s).dropna().values
-        hist_vals = hist_s[-3:].tolist() if len(hist_s) >= 3 else []
-    except Exception:
-        hist_vals = []
+    c_arr   = close.to_numpy(dtype=np.float64)
+    ltp     = float(c_arr[-1])
+
+    # One fused pass for EMA50/200, RSI, MACD, Bollinger, ADX and the 3-bar
+    # RSI / MACD-histogram tails used for slopes
+    ind      = swing_indicators(df, 20, 2, tail=3)
+    ema50    = ind["ema50"]
+    ema200   = ind["ema200"]
+    bb_mid, bb_upper, bb_lower = ind["bb_mid"], ind["bb_upper"], ind["bb_lower"]
+    adx_last, plus_di, minus_di = ind["adx"], ind["plus_di"], ind["minus_di"]
+    rsi_val  = ind["rsi"]
+    macd_last, signal_last = ind["macd"], ind["signal"]
+
+    # Last-bar scalars straight from the NumPy buffers — no per-value .iloc / rolling()
+    h_arr    = df["High"].to_numpy(dtype=np.float64)
+    l_arr    = df["Low"].to_numpy(dtype=np.float64)
+    v_arr    = df["Volume"].to_numpy(dtype=np.float64)
+    vol_avg  = float(v_arr[-20:].mean())
+    vol_last = float(v_arr[-1])
+    recent_high = float(c_arr[-20:].max())
+    recent_low  = float(c_arr[-20:].min())
+
+    prev_c  = c_arr[-15:-1]
+    tr      = np.maximum(h_arr[-14:] - l_arr[-14:],
+                         np.maximum(np.abs(h_arr[-14:] - prev_c), np.abs(l_arr[-14:] - prev_c)))
+    atr_val = float(tr.mean())
+
+    # RSI momentum (slope) and MACD histogram slope — last 3 bars of the same pass
+    rsi_3     = ind["rsi_tail"]
+    rsi_slope = float(rsi_3[-1] - rsi_3[0])
+    hist_vals = ind["hist_tail"].tolist()
 
     # Supertrend
     st_dir = calc_supertrend(df)
@@ -228,6 +227,29 @@ def swing_score(df, side="LONG", sym=None):
     if sym:
         wk_score, wk_label = get_weekly_trend(sym)
 
+    return {
+        "ltp": ltp, "c_arr": c_arr, "ema50": ema50, "ema200": ema200,
+        "bb_mid": bb_mid, "bb_upper": bb_upper, "bb_lower": bb_lower,
+        "adx": adx_last, "plus_di": plus_di, "minus_di": minus_di,
+        "rsi": rsi_val, "rsi_slope": rsi_slope, "macd": macd_last, "signal": signal_last,
+        "hist_vals": hist_vals, "volume": vol_last, "avg_volume": vol_avg,
+        "recent_high": recent_high, "recent_low": recent_low, "atr_val": atr_val,
+        "supertrend": st_dir, "weekly_score": wk_score, "weekly_label": wk_label,
+    }
+
+
+def score_side(f, side="LONG", weekly=True):
+    """Score one side from swing_features(); weekly=False ignores the weekly trend check."""
+    ltp, c_arr, ema50, ema200 = f["ltp"], f["c_arr"], f["ema50"], f["ema200"]
+    bb_mid, bb_upper, bb_lower = f["bb_mid"], f["bb_upper"], f["bb_lower"]
+    adx_last, plus_di, minus_di = f["adx"], f["plus_di"], f["minus_di"]
+    rsi_val, rsi_slope, hist_vals = f["rsi"], f["rsi_slope"], f["hist_vals"]
+    macd_last, signal_last = f["macd"], f["signal"]
+    vol_last, vol_avg = f["volume"], f["avg_volume"]
+    recent_high, recent_low, atr_val = f["recent_high"], f["recent_low"], f["atr_val"]
+    st_dir = f["supertrend"]
+    wk_score, wk_label = (f["weekly_score"], f["weekly_label"]) if weekly else (0, "Weekly: skipped")
+
     conditions = []
     score      = 0
 
@@ -287,7 +309,7 @@ def swing_score(df, side="LONG", sym=None):
             conditions.append(f"{wk_label} ⚠ (against daily)")
 
         # ── CHECK 10: HH/HL structure ──
-        closes = close.values
+        closes = c_arr
         if len(closes) >= 20:
             hh = closes[-1] > closes[-10:].max() * 0.98
             if hh:
@@ -339,7 +361,7 @@ def swing_score(df, side="LONG", sym=None):
         elif wk_score > 0:
             conditions.append(f"{wk_label} ⚠ (against short)")
 
-        closes = close.values
+        closes = c_arr
         if len(closes) >= 20:
             ll = closes[-1] < closes[-10:].min() * 1.02
             if ll:
@@ -361,13 +383,16 @@ def swing_score(df, side="LONG", sym=None):
     }
 
 
+_SWING_AI_SYSTEM = "You are a concise Indian equity swing analyst. Use only the exact numbers given. No speculation."
+
+
 def ai_call(prompt, max_tokens=400):
     try:
         from ai_engine import _call_ai
         text, _ = _call_ai(
             [{"role": "user", "content": prompt}],
             max_tokens=max_tokens,
-            system="You are a concise Indian equity swing analyst. Use only the exact numbers given. No speculation.",
+            system=_SWING_AI_SYSTEM,
         )
         return text or ""
     except Exception as e:
@@ -379,6 +404,13 @@ def _display_sym(sym):
     return sym.replace(".NS","")
 
 
+# ATR multiples per side: (icon, stop-loss, target 1, target 2) — team spec 1.2× / 2× / 3.5×
+_SIDE_LEVELS = {
+    "LONG":  ("🟢", -1.2,  2.0,  3.5),
+    "SHORT": ("🔴",  1.2, -2.0, -3.5),
+}
+
+
 def _trade_card(p, side):
     sym     = _display_sym(p["symbol"])
     ltp     = p["ltp"]
@@ -394,16 +426,10 @@ def _trade_card(p, side):
     entry_lo = round(ltp * 0.995, 2)
     entry_hi = round(ltp * 1.005, 2)
 
-    if side == "LONG":
-        sl   = round(ltp - 1.2 * atr_val, 2)   # 1.2× ATR
-        tgt1 = round(ltp + 2.0 * atr_val, 2)   # 2× ATR
-        tgt2 = round(ltp + 3.5 * atr_val, 2)   # 3.5× ATR
-        icon = "🟢"
-    else:
-        sl   = round(ltp + 1.2 * atr_val, 2)
-        tgt1 = round(ltp - 2.0 * atr_val, 2)
-        tgt2 = round(ltp - 3.5 * atr_val, 2)
-        icon = "🔴"
+    icon, k_sl, k_t1, k_t2 = _SIDE_LEVELS.get(side, _SIDE_LEVELS["SHORT"])
+    sl   = round(ltp + k_sl * atr_val, 2)
+    tgt1 = round(ltp + k_t1 * atr_val, 2)
+    tgt2 = round(ltp + k_t2 * atr_val, 2)
 
     risk   = abs(ltp - sl)
     rw1    = abs(tgt1 - ltp)
@@ -442,6 +468,19 @@ def _trade_card(p, side):
     return "\n".join(lines)
 
 
+def _candidate_features(sym, df=None):
+    """swing_features for one candidate (1y daily + weekly trend); None if unusable."""
+    try:
+        if df is None:
+            df = safe_history(sym, period="1y", interval="1d")
+        if df is None or df.empty or len(df) < 60:
+            return None
+        return swing_features(df, sym=sym)
+    except Exception as e:
+        logger.warning(f"swing {sym}: {e}")
+        return None
+
+
 def get_swing_trades(mode="conservative"):
     """
     Scan all CANDIDATES, score each, sort by score desc — no round-robin.
@@ -452,19 +491,21 @@ def get_swing_trades(mode="conservative"):
     today     = date.today().strftime("%d-%b-%Y")
     all_picks = []
 
-    for sym in CANDIDATES:
-        try:
-            df = safe_history(sym, period="1y", interval="1d")
-            if df.empty or len(df) < 60:
-                continue
-            for side, thresh in [("LONG", threshold_long), ("SHORT", threshold_short)]:
-                result = swing_score(df, side, sym=sym)
-                if result["ltp"] and result["score"] >= thresh:
-                    result["symbol"] = sym
-                    result["side"]   = side
-                    all_picks.append(result)
-        except Exception as e:
-            logger.warning(f"swing {sym}: {e}")
+    # Daily history for the whole universe comes from ONE batched download
+    # (cache hits skipped); the weekly trend per candidate is still network-bound,
+    # so run it on a small pool. map() keeps CANDIDATES order for tie-breaks.
+    hist = get_hist_batch(CANDIDATES, period="1y")
+    with ThreadPoolExecutor(max_workers=SWING_SCAN_WORKERS, thread_name_prefix="swing") as pool:
+        feats = pool.map(_candidate_features, CANDIDATES, [hist.get(s) for s in CANDIDATES])
+        feats_by_sym = {sym: f for sym, f in zip(CANDIDATES, feats) if f is not None}
+
+    for sym, feats in feats_by_sym.items():
+        for side, thresh in [("LONG", threshold_long), ("SHORT", threshold_short)]:
+            result = score_side(feats, side)
+            if result["ltp"] and result["score"] >= thresh:
+                result["symbol"] = sym
+                result["side"]   = side
+                all_picks.append(result)
 
     # Sort by score descending — best picks first (team fix: no round-robin)
     all_picks.sort(key=lambda x: x["score"], reverse=True)
@@ -480,13 +521,12 @@ def get_swing_trades(mode="conservative"):
 
     if not long_picks and not short_picks:
         # Watchlist — best approaching stocks
+        # Re-scores the features already computed above (weekly check off, as before)
         watch = []
-        for sym in CANDIDATES:
+        for sym, feats in feats_by_sym.items():
             try:
-                df = safe_history(sym, period="1y", interval="1d")
-                if df.empty or len(df) < 60: continue
                 for side in ["LONG","SHORT"]:
-                    r = swing_score(df, side)
+                    r = score_side(feats, side, weekly=False)
                     if r["ltp"]:
                         r["symbol"] = sym; r["side"] = side
                         watch.append(r)
@@ -517,3 +557,42 @@ def get_swing_trades(mode="conservative"):
 
     lines.append("⚠️ Educational only. Not SEBI-registered advice.")
     return "\n".join(lines)
+
+
+# ── Background prefetch ───────────────────────────────────────────────────────
+def prefetch_universe():
+    """
+    Warm the data_engine history cache and the weekly-trend cache for every
+    candidate. get_hist_batch only downloads what has expired, so a warm
+    cache costs one pass over the keys.
+    """
+    get_hist_batch(CANDIDATES, period="1y")
+    for sym in CANDIDATES:
+        get_weekly_trend(sym)
+
+
+def start_prefetch_thread():
+    """
+    Refresh the swing universe every SWING_PREFETCH_SEC in the background, so
+    a user's swing scan (and a cold start) reads cached frames instead of
+    paying for the downloads itself. Outside NSE hours daily bars can't
+    change, so one refresh per closed session is enough — nights and
+    weekends don't re-download the universe every cycle.
+    """
+    if SWING_PREFETCH_SEC <= 0:
+        return
+
+    def _loop():
+        warm_session = None          # closed session already fetched after its close
+        while True:
+            session = nse_closed_session()
+            if session is None or session != warm_session:
+                try:
+                    prefetch_universe()
+                    warm_session = session
+                except Exception as e:
+                    logger.warning(f"[Swing] prefetch failed: {e}")
+            time.sleep(SWING_PREFETCH_SEC)
+
+    threading.Thread(target=_loop, daemon=True, name="swing-prefetch").start()
+    logger.info(f"[Swing] Prefetching {len(CANDIDATES)} candidates every {SWING_PREFETCH_SEC}s")
@@ -15,6 +15,24 @@ All functions:
 import pandas as pd
 import numpy as np
 from config import RSI_PERIOD, MACD_FAST, MACD_SLOW, MACD_SIGNAL, ATR_PERIOD, ADX_PERIOD
+from indicator_kernels import (
+    as_f64, ema_last, ema_array, ema_multi_last, macd_last, rsi_last,
+    close_stats, adx_last, atr_last, bb_last, swing_stats,
+)
+
+
+def _alpha(span: int) -> float:
+    """EMA smoothing factor for pandas ewm(span=span, adjust=False)."""
+    return 2.0 / (span + 1)
+
+
+# Hoisted so the default MACD path does no per-call arithmetic
+ALPHA_FAST   = _alpha(MACD_FAST)
+ALPHA_SLOW   = _alpha(MACD_SLOW)
+ALPHA_SIGNAL = _alpha(MACD_SIGNAL)
+ALPHA_EMA20  = _alpha(20)
+ALPHA_EMA50  = _alpha(50)
+_ALPHAS_20_50 = np.array([ALPHA_EMA20, ALPHA_EMA50])
 
 
 # ── RSI (Wilder's smoothing — matches TradingView) ────────────────────────────
@@ -26,40 +44,155 @@ def calc_rsi(close: pd.Series, period: int = RSI_PERIOD) -> float:
     """
     if len(close) < period * 2:
         return 50.0
-    delta    = close.diff()
-    gain     = delta.clip(lower=0)
-    loss     = (-delta.clip(upper=0))
-    avg_gain = gain.ewm(com=period - 1, min_periods=period, adjust=False).mean()
-    avg_loss = loss.ewm(com=period - 1, min_periods=period, adjust=False).mean()
-    avg_loss = avg_loss.replace(0, 1e-10)
-    rsi_s    = 100 - (100 / (1 + avg_gain / avg_loss))
-    return round(float(rsi_s.iloc[-1]), 1)
-
-
-def rsi_series(close: pd.Series, period: int = RSI_PERIOD) -> pd.Series:
-    """Full RSI series (for charts/signals over time)."""
-    delta    = close.diff()
-    gain     = delta.clip(lower=0)
-    loss     = (-delta.clip(upper=0))
-    avg_gain = gain.ewm(com=period - 1, min_periods=period, adjust=False).mean()
-    avg_loss = loss.ewm(com=period - 1, min_periods=period, adjust=False).mean()
-    avg_loss = avg_loss.replace(0, 1e-10)
-    return 100 - (100 / (1 + avg_gain / avg_loss))
+    return round(float(rsi_last(as_f64(close), period)), 1)
 
 
 # ── EMA ───────────────────────────────────────────────────────────────────────
 def calc_ema(close: pd.Series, span: int) -> float:
     """Exponential Moving Average — returns scalar (latest value)."""
-    return round(float(close.ewm(span=span, adjust=False).mean().iloc[-1]), 2)
+    return round(float(ema_last(as_f64(close), _alpha(span))), 2)
 
 
 def ema_series(close: pd.Series, span: int) -> pd.Series:
-    return close.ewm(span=span, adjust=False).mean()
+    """Full EMA as a Series on close's index (compiled recurrence, no ewm object)."""
+    return pd.Series(ema_array(as_f64(close), _alpha(span)), index=close.index)
 
 
 # ── SMA ───────────────────────────────────────────────────────────────────────
 def calc_sma(close: pd.Series, window: int) -> float:
-    return round(float(close.rolling(window).mean().iloc[-1]), 2)
+    """Mean of the last `window` closes; NaN if history is shorter (like rolling())."""
+    arr = as_f64(close)
+    if arr.size < window:
+        return float("nan")
+    return round(float(arr[-window:].mean()), 2)
+
+
+# ── Fused close-only indicators ──────────────────────────────────────────────
+def close_indicators(close: pd.Series) -> dict:
+    """
+    RSI, MACD (line/signal/hist), EMA20/50 and SMA20/50/200 from ONE pass over
+    the closes (indicator_kernels.close_stats) instead of 5+ pandas pipelines.
+    Rounded like the individual calc_* functions; RSI is 50.0 below 2×RSI_PERIOD
+    bars, SMAs are None when history is shorter than their window. "trend" is
+    trend_label() from the unrounded EMAs (NEUTRAL below 50 bars).
+    """
+    arr = as_f64(close)
+    if arr.size < 2:
+        last = round(float(arr[-1]), 2) if arr.size else 0.0
+        return {"rsi": 50.0, "macd": 0.0, "signal": 0.0, "hist": 0.0,
+                "ema20": last, "ema50": last, "sma20": None, "sma50": None, "sma200": None,
+                "trend": "NEUTRAL"}
+    rsi, macd, sig, e20, e50, s20, s50, s200 = close_stats(
+        arr, RSI_PERIOD, ALPHA_FAST, ALPHA_SLOW, ALPHA_SIGNAL, ALPHA_EMA20, ALPHA_EMA50,
+    )
+    return {
+        "rsi":    round(float(rsi), 1) if arr.size >= RSI_PERIOD * 2 else 50.0,
+        "macd":   round(float(macd), 2),
+        "signal": round(float(sig), 2),
+        "hist":   round(float(macd - sig), 2),
+        "ema20":  round(float(e20), 2),
+        "ema50":  round(float(e50), 2),
+        "sma20":  None if np.isnan(s20)  else round(float(s20), 2),
+        "sma50":  None if np.isnan(s50)  else round(float(s50), 2),
+        "sma200": None if np.isnan(s200) else round(float(s200), 2),
+        "trend":  trend_from_emas(float(arr[-1]), float(e20), float(e50)) if arr.size >= 50 else "NEUTRAL",
+    }
+
+
+# ── Advisory-card indicators ─────────────────────────────────────────────────
+def adv_indicators(df: pd.DataFrame) -> dict:
+    """
+    Everything the advisory card reads from OHLC history, with High/Low/Close
+    converted to float64 arrays once: close_indicators() keys plus "atr"
+    (calc_atr) and "levels" (price_levels). Requires len(df) >= 1.
+    """
+    close = as_f64(df["Close"])
+    high  = as_f64(df["High"])
+    low   = as_f64(df["Low"])
+    out = close_indicators(close)
+    out["atr"]    = round(float(atr_last(high, low, close, ATR_PERIOD)), 2)
+    out["levels"] = _price_levels(close, high, low)
+    return out
+
+
+# ── Fused swing indicators ───────────────────────────────────────────────────
+def swing_indicators(df: pd.DataFrame, bb_window: int = 20, num_sd: float = 2.0,
+                     tail: int = 3) -> dict:
+    """
+    EMA50/200, RSI, MACD, Bollinger (mid/upper/lower) and ADX/±DI from ONE pass
+    over High/Low/Close (indicator_kernels.swing_stats) — replaces seven separate
+    pandas pipelines in swing_trades.swing_score. Values are rounded exactly as
+    the individual calc_* functions round them; EMAs are left unrounded.
+    "rsi_tail" / "hist_tail" are the last `tail` unrounded RSI and MACD
+    histogram values (oldest first) from the same pass, for slopes.
+    Requires len(df) >= max(bb_window, tail + 1).
+    """
+    close = as_f64(df["Close"])
+    n     = close.size
+    (e50, e200, rsi, macd, sig, mid, upper, lower,
+     adx, pdi, mdi, rsi_t, hist_t) = swing_stats(
+        as_f64(df["High"]), as_f64(df["Low"]), close, RSI_PERIOD, ADX_PERIOD,
+        ALPHA_FAST, ALPHA_SLOW, ALPHA_SIGNAL,
+        _alpha(min(50, n - 1)), _alpha(min(200, n - 1)), bb_window, num_sd, tail,
+    )
+    return {
+        "ema50":    float(e50),
+        "ema200":   float(e200),
+        "rsi":      round(float(rsi), 1) if n >= RSI_PERIOD * 2 else 50.0,
+        "macd":     round(float(macd), 2),
+        "signal":   round(float(sig), 2),
+        "hist":     round(float(macd - sig), 2),
+        "bb_mid":   round(float(mid), 2),
+        "bb_upper": round(float(upper), 2),
+        "bb_lower": round(float(lower), 2),
+        "adx":      round(float(adx), 1),
+        "plus_di":  round(float(pdi), 1),
+        "minus_di": round(float(mdi), 1),
+        "rsi_tail":  rsi_t,
+        "hist_tail": hist_t,
+    }
+
+
+# ── Price levels (SMA / Bollinger / pivots in one NumPy pass) ────────────────
+def price_levels(df: pd.DataFrame, bb_window: int = 20, num_sd: float = 2.0) -> dict:
+    """
+    Deterministic reference levels for AI prompts, so the model cites exact
+    numbers instead of estimating them:
+      sma20/sma50/sma200 — from one cumulative sum over the closes
+      bb_upper/bb_lower  — mean ± num_sd·σ over the last bb_window closes
+      pivot, r1-r3, s1-s3 — classical floor pivots from the prior session's H/L/C
+    Keys whose window is longer than the history are omitted.
+    """
+    return _price_levels(as_f64(df["Close"]), as_f64(df["High"]), as_f64(df["Low"]), bb_window, num_sd)
+
+
+def _price_levels(close: np.ndarray, high: np.ndarray, low: np.ndarray,
+                  bb_window: int = 20, num_sd: float = 2.0) -> dict:
+    n     = close.size
+    out: dict = {}
+    if n == 0:
+        return out
+
+    csum = np.concatenate(([0.0], np.cumsum(close)))
+    for w in (20, 50, 200):
+        if n >= w:
+            out[f"sma{w}"] = round(float((csum[-1] - csum[-1 - w]) / w), 2)
+
+    if n >= bb_window:
+        _, upper, lower = _bollinger_last(close, bb_window, num_sd)
+        out["bb_upper"] = round(upper, 2)
+        out["bb_lower"] = round(lower, 2)
+
+    if n >= 2:
+        h, l, c = float(high[-2]), float(low[-2]), float(close[-2])
+        p = (h + l + c) / 3
+        out.update({
+            "pivot": round(p, 2),
+            "r1": round(2 * p - l, 2), "s1": round(2 * p - h, 2),
+            "r2": round(p + (h - l), 2), "s2": round(p - (h - l), 2),
+            "r3": round(h + 2 * (p - l), 2), "s3": round(l - 2 * (h - p), 2),
+        })
+    return out
 
 
 # ── MACD ──────────────────────────────────────────────────────────────────────
@@ -69,16 +202,20 @@ def calc_macd(close: pd.Series,
               signal: int = MACD_SIGNAL) -> tuple:
     """
     Returns (macd_line, signal_line, histogram) — all scalars.
+    Fast/slow/signal EMAs are computed in one fused pass (indicator_kernels).
     """
-    exp_fast   = close.ewm(span=fast,   adjust=False).mean()
-    exp_slow   = close.ewm(span=slow,   adjust=False).mean()
-    macd_line  = exp_fast - exp_slow
-    signal_line= macd_line.ewm(span=signal, adjust=False).mean()
-    histogram  = macd_line - signal_line
+    arr = as_f64(close)
+    if arr.size == 0:
+        return (0.0, 0.0, 0.0)
+    if (fast, slow, signal) == (MACD_FAST, MACD_SLOW, MACD_SIGNAL):
+        alphas = (ALPHA_FAST, ALPHA_SLOW, ALPHA_SIGNAL)
+    else:
+        alphas = (_alpha(fast), _alpha(slow), _alpha(signal))
+    macd_line, signal_line, histogram = macd_last(arr, *alphas)
     return (
-        round(float(macd_line.iloc[-1]),   2),
-        round(float(signal_line.iloc[-1]), 2),
-        round(float(histogram.iloc[-1]),   2),
+        round(float(macd_line),   2),
+        round(float(signal_line), 2),
+        round(float(histogram),   2),
     )
 
 
@@ -88,14 +225,10 @@ def calc_atr(df: pd.DataFrame, period: int = ATR_PERIOD) -> float:
     Average True Range using Wilder's EMA.
     df must have High, Low, Close columns.
     """
-    h, l, c = df["High"], df["Low"], df["Close"]
-    tr = pd.concat([
-        (h - l),
-        (h - c.shift()).abs(),
-        (l - c.shift()).abs(),
-    ], axis=1).max(axis=1)
-    atr = tr.ewm(com=period - 1, min_periods=period, adjust=False).mean()
-    return round(float(atr.iloc[-1]), 2)
+    c = as_f64(df["Close"])
+    if c.size == 0:
+        return float("nan")
+    return round(float(atr_last(as_f64(df["High"]), as_f64(df["Low"]), c, period)), 2)
 
 
 # ── ADX + DI ──────────────────────────────────────────────────────────────────
@@ -105,24 +238,15 @@ def calc_adx(df: pd.DataFrame, period: int = ADX_PERIOD) -> tuple:
     Returns (adx, plus_di, minus_di) — all scalars.
     ADX > 25 = trending market. +DI > -DI = bullish.
     """
-    high, low, close = df["High"], df["Low"], df["Close"]
-    plus_dm  = high.diff()
-    minus_dm = low.diff().abs()
-    plus_dm  = plus_dm.where((plus_dm > minus_dm)  & (plus_dm > 0),  0.0)
-    minus_dm = minus_dm.where((minus_dm > plus_dm) & (minus_dm > 0), 0.0)
-    tr1 = high - low
-    tr2 = (high - close.shift()).abs()
-    tr3 = (low  - close.shift()).abs()
-    tr  = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-    atr_s    = tr.ewm(com=period - 1,   min_periods=period, adjust=False).mean()
-    plus_di  = 100 * (plus_dm.ewm(com=period - 1,  min_periods=period, adjust=False).mean() / atr_s)
-    minus_di = 100 * (minus_dm.ewm(com=period - 1, min_periods=period, adjust=False).mean() / atr_s)
-    dx       = (abs(plus_di - minus_di) / (plus_di + minus_di + 1e-10)) * 100
-    adx_s    = dx.ewm(com=period - 1, min_periods=period, adjust=False).mean()
+    if len(df) == 0:
+        return (float("nan"), float("nan"), float("nan"))
+    adx, plus_di, minus_di = adx_last(
+        as_f64(df["High"]), as_f64(df["Low"]), as_f64(df["Close"]), period,
+    )
     return (
-        round(float(adx_s.iloc[-1]),    1),
-        round(float(plus_di.iloc[-1]),  1),
-        round(float(minus_di.iloc[-1]), 1),
+        round(float(adx),      1),
+        round(float(plus_di),  1),
+        round(float(minus_di), 1),
     )
 
 
@@ -131,15 +255,20 @@ def calc_bollinger(close: pd.Series, window: int = 20, num_sd: float = 2.0) -> t
     """
     Returns (mid, upper, lower) — all scalars (latest values).
     """
-    mid   = close.rolling(window).mean()
-    std   = close.rolling(window).std()
-    upper = mid + num_sd * std
-    lower = mid - num_sd * std
-    return (
-        round(float(mid.iloc[-1]),   2),
-        round(float(upper.iloc[-1]), 2),
-        round(float(lower.iloc[-1]), 2),
-    )
+    mid, upper, lower = _bollinger_last(as_f64(close), window, num_sd)
+    return round(mid, 2), round(upper, 2), round(lower, 2)
+
+
+def _bollinger_last(arr: np.ndarray, window: int, num_sd: float) -> tuple:
+    """
+    (mid, upper, lower) from the trailing window only — the full rolling
+    mean/std Series was built just to read its last element. Sample σ (ddof=1)
+    like pandas rolling().std(); NaNs when history is shorter than window.
+    """
+    if arr.size < window:
+        return float("nan"), float("nan"), float("nan")
+    mid, upper, lower = bb_last(arr, window, num_sd)
+    return float(mid), float(upper), float(lower)
 
 
 # ── ASI (Accumulation Swing Index) ───────────────────────────────────────────
@@ -150,23 +279,26 @@ def calc_asi(df: pd.DataFrame) -> float:
     """
     if len(df) < 2:
         return 0.0
-    O, H, L, C = df["Open"], df["High"], df["Low"], df["Close"]
-    Cp, Op     = C.shift(1), O.shift(1)
-    A   = (H - Cp).abs()
-    B   = (L - Cp).abs()
-    CD  = (H - L).abs()
-    D   = (Cp - Op).abs()
-    R   = pd.Series(0.0, index=df.index)
+    # Plain float64 arrays, bar t vs t-1 as aligned slices: no shifted Series,
+    # masked assignments or (N,2) concat just to take a row max
+    O, H, L, C = (as_f64(df[k]) for k in ("Open", "High", "Low", "Close"))
+    Cp, Op   = C[:-1], O[:-1]
+    H, L, C, O = H[1:], L[1:], C[1:], O[1:]
+    A   = np.abs(H - Cp)
+    B   = np.abs(L - Cp)
+    CD  = np.abs(H - L)
+    D   = np.abs(Cp - Op)
     cA  = (A >= B) & (A >= CD)
     cB  = (B >= A) & (B >= CD) & ~cA
-    R[cA]       = A[cA]  + 0.5 * B[cA]  + 0.25 * D[cA]
-    R[cB]       = B[cB]  + 0.5 * A[cB]  + 0.25 * D[cB]
-    R[~(cA|cB)] = CD[~(cA|cB)] + 0.25 * D[~(cA|cB)]
-    R    = R.replace(0, 1e-10)
-    K    = pd.concat([A, B], axis=1).max(axis=1)
-    lm   = (Cp * 0.20).replace(0, 1e-10)
-    SI   = 50 * ((C - Cp) + 0.5*(Cp - O) + 0.25*(Cp - Op)) / R * (K / lm)
-    return round(float(SI.cumsum().iloc[-1]), 2)
+    R   = np.where(cA, A + 0.5 * B, np.where(cB, B + 0.5 * A, CD)) + 0.25 * D
+    R[R == 0] = 1e-10
+    K   = np.fmax(A, B)                       # NaN-skipping max, like DataFrame.max
+    lm  = Cp * 0.20
+    lm[lm == 0] = 1e-10
+    SI  = 50 * ((C - Cp) + 0.5 * (Cp - O) + 0.25 * (Cp - Op)) / R * (K / lm)
+    # Series.cumsum().iloc[-1]: NaNs skipped, but a NaN last bar stays NaN
+    total = SI[-1] if np.isnan(SI[-1]) else np.nansum(SI)
+    return round(float(total), 2)
 
 
 # ── Signal Labels ─────────────────────────────────────────────────────────────
@@ -182,9 +314,13 @@ def trend_label(close: pd.Series) -> str:
     """Bull/Bear/Neutral based on EMA20 vs EMA50 vs price."""
     if len(close) < 50:
         return "NEUTRAL"
-    ltp   = float(close.iloc[-1])
-    ema20 = float(close.ewm(span=20, adjust=False).mean().iloc[-1])
-    ema50 = float(close.ewm(span=50, adjust=False).mean().iloc[-1])
+    arr = as_f64(close)
+    e20, e50 = ema_multi_last(arr, _ALPHAS_20_50)
+    return trend_from_emas(float(arr[-1]), float(e20), float(e50))
+
+
+def trend_from_emas(ltp: float, ema20: float, ema50: float) -> str:
+    """trend_label() for callers that already have EMA20/EMA50."""
     if ltp > ema20 > ema50: return "BULLISH"
     if ltp < ema20 < ema50: return "BEARISH"
     return "NEUTRAL"